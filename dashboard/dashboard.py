@@ -1,6 +1,6 @@
 """Streamlit dashboard for plant data"""
 from os import environ
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pandas as pd
 import boto3
@@ -9,6 +9,8 @@ import altair as alt
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 
+from reading_queries import get_readings_since
+
 
 CUSTOM_BACKGROUND = """
     <style>
@@ -92,8 +94,8 @@ if __name__ == "__main__":
                       aws_secret_access_key=environ["AWS_SECRET_ACCESS_KEY"])
 
     with conn:
-        reading_data = pd.read_sql(
-            'SELECT * FROM s_gamma.reading;', conn)
+        reading_data = get_readings_since(
+            conn, datetime.now() - timedelta(hours=24))
 
         st.set_page_config(page_title="Plant Dashboard - LMNH", layout="wide")
 
@@ -4,9 +4,11 @@ from os import environ
 
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, sql
+from sqlalchemy import create_engine
 import s3fs
 
+from reading_queries import delete_readings_before, get_day_range, get_readings
+
 load_dotenv()
 
 
@@ -16,20 +18,14 @@ def get_database_connection(config):
 
 
 def get_todays_data(connection) -> pd.DataFrame:
-    """Returns the entries from reading table for current day"""
-    with connection.connect() as conn:
-
-        conn.execute(sql.text("USE plants"))
-
-        query = sql.text("""SELECT * FROM s_gamma.reading
-                         WHERE CONVERT(DATE, recording_taken) = CONVERT(DATE, GETDATE());""")
-        res = conn.execute(query).fetchall()
-
-        query = sql.text("""DELETE FROM s_gamma.reading;""")
-        conn.execute(query)
-        conn.commit()
-
-        return pd.DataFrame(res)
+    """Returns the entries from reading table for current day, then clears
+    every reading up to the end of the day from the table"""
+    day_start, day_end = get_day_range(datetime.now().date())
+    with connection.begin() as conn:
+        todays_data = get_readings(conn, day_start, day_end)
+        delete_readings_before(conn, day_end)
+
+    return todays_data
 
 
 def write_to_bucket(data: pd.DataFrame) -> None:
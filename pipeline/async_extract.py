@@ -0,0 +1,273 @@
+'''Script to extract the readings information for each plant concurrently
+using asyncio, and stores this in a pandas DataFrame.'''
+
+from collections import deque
+from contextlib import AsyncExitStack
+from os import environ
+from statistics import quantiles
+from time import perf_counter
+import asyncio
+import atexit
+import json
+
+import aiohttp
+import pandas as pd
+
+from http_client import BASE_URL, create_async_session
+from multi_extract import (CYCLE_DEADLINE, parse_changing_plant_details,
+                           missing_reading)
+from plant_reading import PlantReading, readings_to_frame
+from plant_registry import get_plant_ids
+import multi_extract
+
+
+CONCURRENCY_LIMIT = int(environ.get("EXTRACT_CONCURRENCY", 200))
+HEDGE_REQUESTS = environ.get("EXTRACT_HEDGE", "false").lower() == "true"
+MIN_HEDGE_SAMPLES = 20
+
+latency_history = deque(maxlen=1000)
+cycle_latencies = []
+cycle_stats = {"hedged": 0, "missed_deadline": 0}
+
+
+def get_hedge_delay() -> float | None:
+    """Returns the p95 request latency, once enough requests have been seen."""
+
+    if len(latency_history) < MIN_HEDGE_SAMPLES:
+        return None
+    return quantiles(latency_history, n=20)[-1]
+
+
+async def request_plant_details(session: aiohttp.ClientSession,
+                                plant_id: int) -> dict:
+    """Requests a single plant's JSON, recording how long it took."""
+
+    start_time = perf_counter()
+    async with session.get(BASE_URL+str(plant_id)) as response:
+        # Client errors carry the API's error in a JSON body, server errors may not
+        if response.status >= 500:
+            response.raise_for_status()
+        plant_details = await response.json(content_type=None)
+    latency = perf_counter() - start_time
+    latency_history.append(latency)
+    cycle_latencies.append(latency)
+    return plant_details
+
+
+async def request_with_hedge(session: aiohttp.ClientSession, plant_id: int,
+                             hedge_after: float) -> dict:
+    """
+    Sends a duplicate request if the first has not answered after
+    `hedge_after` seconds, and returns whichever answers successfully first.
+    """
+
+    first = asyncio.ensure_future(request_plant_details(session, plant_id))
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+
+    cycle_stats["hedged"] += 1
+    pending = {first, asyncio.ensure_future(
+        request_plant_details(session, plant_id))}
+    try:
+        while True:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [task for task in done if task.exception() is None]
+            if succeeded or not pending:
+                return (succeeded or list(done))[0].result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def fetch_changing_plant_details(session: aiohttp.ClientSession,
+                                       semaphore: asyncio.Semaphore,
+                                       plant_id: int,
+                                       hedge_after: float = None) -> PlantReading | None:
+    """
+    Requests a single plant from the API without blocking the event loop
+    and keeps only the transient reading information, or None if the
+    request failed.
+    """
+
+    plant_reading = None
+    try:
+        async with semaphore:
+            if hedge_after is None:
+                plant_details = await request_plant_details(session, plant_id)
+            else:
+                plant_details = await request_with_hedge(
+                    session, plant_id, hedge_after)
+        if isinstance(plant_details, dict):
+            plant_reading = parse_changing_plant_details(plant_id, plant_details)
+        else:
+            print(plant_id, "Error, Plant not found: " + repr(plant_details))
+    except json.JSONDecodeError as errj:
+        print(plant_id, "Error, Plant not found: " + repr(errj))
+    except aiohttp.ClientResponseError as errh:
+        print("An Http Error occurred: " + repr(errh))
+    except aiohttp.ClientConnectionError as errc:
+        print("An Error Connecting to the API occurred: " + repr(errc))
+    except asyncio.TimeoutError as errt:
+        print("A Timeout Error occurred: " + repr(errt))
+    except aiohttp.ClientError as err:
+        print("An Unknown Error occurred: " + repr(err))
+
+    return plant_reading
+
+
+class ExtractSession:
+    """
+    One event loop and one keep-alive session kept for the life of the
+    process, so each cycle reuses the connections earlier cycles opened
+    instead of paying a new TCP and TLS handshake per plant.
+    """
+
+    def __init__(self, concurrency: int = CONCURRENCY_LIMIT):
+        self.concurrency = concurrency
+        self.runner = None
+        self.session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Returns the session, creating it on the loop's first use."""
+
+        if self.session is None or self.session.closed:
+            self.session = create_async_session(self.concurrency)
+        return self.session
+
+    async def call_with_session(self, extract, args, kwargs):
+        """Awaits extract with the persistent session."""
+
+        return await extract(*args, session=await self.get_session(), **kwargs)
+
+    def run(self, extract, *args, **kwargs):
+        """Runs the coroutine function extract(*args, session=..., **kwargs)
+        to completion on the persistent event loop and returns its result."""
+
+        if self.runner is None:
+            self.runner = asyncio.Runner()
+        return self.runner.run(self.call_with_session(extract, args, kwargs))
+
+    def close(self) -> None:
+        """Closes the session and its connections, then the event loop."""
+
+        if self.runner is None:
+            return
+        if self.session is not None:
+            self.runner.run(self.session.close())
+        self.runner.close()
+        self.runner = None
+        self.session = None
+
+
+EXTRACT_SESSION = ExtractSession()
+atexit.register(EXTRACT_SESSION.close)
+
+
+async def stream_plant_details(plant_ids: list[int],
+                               concurrency: int = CONCURRENCY_LIMIT,
+                               deadline: float = CYCLE_DEADLINE,
+                               hedge: bool = HEDGE_REQUESTS,
+                               session: aiohttp.ClientSession = None):
+    """
+    Yields (plant_id, reading) pairs as soon as each plant's response
+    arrives, keeping up to `concurrency` requests in flight on a single
+    connection pool. Requests still outstanding after `deadline` seconds
+    are cancelled and their plants are yielded as missing. Without a
+    session, one is opened for this cycle only.
+    """
+
+    semaphore = asyncio.Semaphore(concurrency)
+    hedge_after = get_hedge_delay() if hedge else None
+    cycle_stats.update(hedged=0, missed_deadline=0)
+    cycle_latencies.clear()
+
+    if not plant_ids:
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + deadline
+
+    async with AsyncExitStack() as stack:
+        if session is None:
+            session = await stack.enter_async_context(create_async_session(concurrency))
+        tasks = {asyncio.ensure_future(
+            fetch_changing_plant_details(session, semaphore, plant_id, hedge_after)):
+            plant_id for plant_id in plant_ids}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(deadline_at - loop.time(), 0),
+                    return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    yield tasks[task], task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    cycle_stats["missed_deadline"] = len(pending)
+    if pending:
+        print(f"{len(pending)} plants missed the cycle deadline.")
+
+    for task in pending:
+        yield tasks[task], missing_reading(tasks[task])
+
+
+async def extract_plant_details_concurrently(plant_ids: list[int],
+                                             concurrency: int,
+                                             deadline: float = CYCLE_DEADLINE,
+                                             hedge: bool = HEDGE_REQUESTS,
+                                             session: aiohttp.ClientSession = None
+                                             ) -> list[PlantReading]:
+    """
+    Collects every streamed plant reading and returns them in plant_ids order.
+    """
+
+    readings = {}
+    async for plant_id, plant_reading in stream_plant_details(
+            plant_ids, concurrency, deadline, hedge, session):
+        readings[plant_id] = plant_reading
+
+    return [readings[plant_id] for plant_id in plant_ids]
+
+
+def extract_all_plant_details(plant_ids: list[int] = None,
+                              concurrency: int = CONCURRENCY_LIMIT,
+                              deadline: float = CYCLE_DEADLINE,
+                              extract_session: ExtractSession = None) -> pd.DataFrame:
+    """
+    Top level function which extracts every plant on the persistent event
+    loop and session, and returns a Data Frame containing all plant details.
+    """
+
+    if plant_ids is None:
+        plant_ids = get_plant_ids()
+    if extract_session is None:
+        extract_session = EXTRACT_SESSION
+
+    plants_list = extract_session.run(
+        extract_plant_details_concurrently, list(plant_ids), concurrency, deadline)
+
+    print("Extracted plant information from API.")
+    return readings_to_frame(plants_list)
+
+
+if __name__ == '__main__':
+    registered_ids = get_plant_ids()
+
+    start_time = perf_counter()
+    df_pool = multi_extract.extract_all_plant_details(registered_ids)
+    pool_time = perf_counter() - start_time
+
+    start_time = perf_counter()
+    df_plants = extract_all_plant_details(registered_ids)
+    async_time = perf_counter() - start_time
+
+    print(f"Pool time taken: {pool_time} seconds {df_pool.shape}")
+    print(f"Async time taken: {async_time} seconds {df_plants.shape}")
+    print(f"Speedup: {pool_time / async_time:.2f}x")
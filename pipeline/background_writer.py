@@ -0,0 +1,135 @@
+'''Background writer for the concurrent pipeline mode. Transformed batches
+are put on a bounded queue and a dedicated thread loads them, so a slow
+database write no longer delays the next extraction. When the queue is
+full, submit blocks until the writer catches up, so a database that is
+down holds back extraction instead of letting batches pile up in memory.
+The writer keeps its own counters, and the rows and load time written
+since the previous cycle are reported into each cycle's metrics.'''
+
+from os import environ
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from load import update_reading
+from metrics import PipelineMetrics
+
+
+WRITER_QUEUE_SIZE = int(environ.get("WRITER_QUEUE_SIZE", 5))
+WRITER_FLUSH_SECONDS = float(environ.get("WRITER_FLUSH_SECONDS", 30))
+# Marks the end of the queue for the writer thread
+STOP = object()
+
+
+class BackgroundWriter:
+    """Loads queued batches of transformed readings on a dedicated thread."""
+
+    def __init__(self, connection, max_batches: int = WRITER_QUEUE_SIZE,
+                 load=update_reading):
+        self.connection = connection
+        self.load = load
+        self.lock = threading.Lock()
+        self.batches = queue.Queue(maxsize=max_batches)
+        self.thread = threading.Thread(target=self.run, name="background-writer",
+                                       daemon=True)
+        self.batches_written = 0
+        self.batches_failed = 0
+        self.rows_inserted = 0
+        self.rows_failed = 0
+        self.load_seconds = 0.0
+        self.blocked_seconds = 0.0
+        # The counters as of the last report_cycle
+        self.reported_rows = 0
+        self.reported_seconds = 0.0
+
+    def start(self) -> None:
+        """Starts the writer thread."""
+
+        self.thread.start()
+
+    def submit(self, batch: pd.DataFrame) -> None:
+        """Queues a batch for loading, waiting while the queue is full."""
+
+        if batch.empty:
+            return
+        start_time = time.time()
+        self.batches.put(batch)
+        self.blocked_seconds += time.time() - start_time
+
+    def write(self, batch: pd.DataFrame) -> None:
+        """Loads one batch, recording its rows. A failed batch is logged and
+        dropped, so one bad write does not stop the writer."""
+
+        start_time = time.time()
+        try:
+            inserted = self.load(self.connection, batch)
+            with self.lock:
+                self.batches_written += 1
+                self.rows_inserted += inserted
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            print(f"Failed to load a batch of {len(batch)} readings: {error}")
+            with self.lock:
+                self.batches_failed += 1
+                self.rows_failed += len(batch)
+        finally:
+            with self.lock:
+                self.load_seconds += time.time() - start_time
+
+    def report_cycle(self, metrics: PipelineMetrics) -> None:
+        """Adds the rows inserted and the load time since the last report to
+        the metrics' current cycle, as the writer's loads outlive the cycle
+        which queued them."""
+
+        with self.lock:
+            rows = self.rows_inserted - self.reported_rows
+            seconds = self.load_seconds - self.reported_seconds
+            self.reported_rows, self.reported_seconds = self.rows_inserted, self.load_seconds
+        metrics.count("rows_inserted", rows)
+        metrics.add_stage_seconds("load", seconds)
+
+    def run(self) -> None:
+        """Loads batches until the stop marker is taken off the queue."""
+
+        while True:
+            batch = self.batches.get()
+            try:
+                if batch is STOP:
+                    return
+                self.write(batch)
+            finally:
+                self.batches.task_done()
+
+    def stop(self, timeout: float = WRITER_FLUSH_SECONDS) -> bool:
+        """
+        Loads the batches still queued and stops the thread, waiting up to
+        timeout seconds. Returns whether everything queued was written.
+        """
+
+        if not self.thread.is_alive():
+            return self.batches.empty()
+        deadline = time.time() + timeout
+        try:
+            self.batches.put(STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(max(0.0, deadline - time.time()))
+        flushed = not self.thread.is_alive()
+        print(f"Background writer stopped with {self.batches.qsize()} batches unwritten."
+              if not flushed else "Background writer flushed all batches.")
+        return flushed
+
+    def get_stats(self) -> dict:
+        """Returns the queue depth and the writer's running counters."""
+
+        with self.lock:
+            return {
+                "queued_batches": self.batches.qsize(),
+                "batches_written": self.batches_written,
+                "batches_failed": self.batches_failed,
+                "rows_inserted": self.rows_inserted,
+                "rows_failed": self.rows_failed,
+                "load_seconds": round(self.load_seconds, 4),
+                "blocked_seconds": round(self.blocked_seconds, 4)
+            }
@@ -0,0 +1,119 @@
+'''Benchmark driver which runs extractor implementations against the local
+mock plants API at several fleet sizes and reports throughput and
+p50/p95/p99 latency.
+
+    python3 benchmark_extract.py --sizes 51 1000 10000 --extractors pool async
+
+Extractors are given as a name from EXTRACTORS or as "module:function";
+the function is called with a list of plant ids and a deadline keyword.
+Latency is measured by the mock API: "completion" is the time from the
+start of the cycle until each plant was answered (so it includes queueing
+in the extractor), "service" is the time the API spent on each request.'''
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from importlib import import_module
+from os import environ
+from statistics import quantiles
+from time import perf_counter
+import io
+import json
+
+from mock_plant_api import MockConfig, MockPlantAPI, start_in_thread
+
+
+EXTRACTORS = {
+    "pool": "multi_extract:extract_all_plant_details",
+    "async": "async_extract:extract_all_plant_details",
+}
+
+
+def load_extractor(spec: str):
+    """Imports an extractor function from a name in EXTRACTORS or 'module:function'."""
+
+    module_name, function_name = EXTRACTORS.get(spec, spec).split(":")
+    return getattr(import_module(module_name), function_name)
+
+
+def get_percentiles(values: list[float]) -> dict:
+    """Returns the p50, p95 and p99 of the values, in milliseconds."""
+
+    if len(values) < 2:
+        values = values * 2 or [0.0, 0.0]
+    cuts = quantiles(values, n=100)
+    return {"p50_ms": round(cuts[49] * 1000, 1),
+            "p95_ms": round(cuts[94] * 1000, 1),
+            "p99_ms": round(cuts[98] * 1000, 1)}
+
+
+def run_benchmark(extractor, api: MockPlantAPI, plant_count: int,
+                  deadline: float) -> dict:
+    """Runs one extract cycle over plant_count plants and summarises it."""
+
+    api.reset_log()
+    start_time = perf_counter()
+    with redirect_stdout(io.StringIO()):
+        readings = extractor(list(range(plant_count)), deadline=deadline)
+    elapsed_time = perf_counter() - start_time
+
+    served = list(api.request_log)
+    completion = [finish - start_time for _, _, finish in served]
+    service = [finish - arrival for _, arrival, finish in served]
+    valid_readings = int(readings["error"].isnull().sum()) \
+        if "error" in readings.columns else 0
+
+    return {
+        "plants": plant_count,
+        "seconds": round(elapsed_time, 3),
+        "plants_per_second": round(plant_count / elapsed_time, 1),
+        "requests_served": len(served),
+        "valid_readings": valid_readings,
+        "completion": get_percentiles(completion),
+        "service": get_percentiles(service)
+    }
+
+
+def get_arguments():
+    """Parses the benchmark settings from the command line."""
+
+    parser = ArgumentParser(description="Benchmark extractors against the mock plant API")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[51, 1000, 10000])
+    parser.add_argument("--extractors", nargs="+", default=list(EXTRACTORS))
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--deadline", type=float, default=600)
+    parser.add_argument("--latency-median", type=float, default=0.05)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    mock_api = MockPlantAPI(MockConfig(
+        plants=max(args.sizes), latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, malformed_rate=args.malformed_rate))
+    stop_server = start_in_thread(mock_api, args.port)
+
+    # Must be set before the extractors (and http_client) are imported
+    environ["PLANTS_API_URL"] = f"http://127.0.0.1:{args.port}/plants/"
+
+    results = []
+    for extractor_name in args.extractors:
+        extractor_function = load_extractor(extractor_name)
+        for size in args.sizes:
+            result = {"extractor": extractor_name,
+                      **run_benchmark(extractor_function, mock_api, size, args.deadline)}
+            results.append(result)
+            print(f"{extractor_name:>8} {size:>6} plants: "
+                  f"{result['seconds']:>8}s {result['plants_per_second']:>8} plants/s "
+                  f"completion {result['completion']} service {result['service']}")
+
+    stop_server.set()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as results_file:
+            json.dump(results, results_file, indent=2)
@@ -0,0 +1,128 @@
+'''Benchmark for the load which compares the bulk update_reading, in
+append and upsert mode, against the previous per-row loader on the
+SQLite stand-in database.
+
+    python3 benchmark_load.py --rows 51 10000 --latency-ms 1
+
+SQLite runs in process, so without --latency-ms the per-row loader only
+pays for its extra statements and commits. With it, every statement waits
+one simulated round trip, as it would against RDS.'''
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from functools import partial
+from statistics import median
+from time import perf_counter
+import io
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import sql
+
+from load import update_reading, BOTANIST_CACHE
+from sqlite_standin import add_simulated_latency, create_standin_engine
+
+
+def make_transformed_readings(rows: int) -> pd.DataFrame:
+    """Returns rows readings shaped like the transform's output."""
+
+    recording_taken = pd.Timestamp("2023-12-21 10:00:00") \
+        + pd.to_timedelta(np.arange(rows) // 51, unit="min")
+    return pd.DataFrame({
+        "plant_id": np.arange(rows) % 51,
+        "plant_name": pd.Categorical([f"Plant {plant_id % 51}" for plant_id in range(rows)]),
+        "soil_moisture": np.full(rows, 55.25),
+        "temperature": np.full(rows, 12.5),
+        "last_watered": pd.Series(pd.Timestamp("2023-12-20 14:03:04"), index=range(rows)),
+        "recording_taken": recording_taken,
+        "error": [None] * rows,
+        "botanist_name": pd.Categorical(["Carl Linnaeus", "Eliza Andrews"] * (rows // 2)
+                                        + ["Carl Linnaeus"] * (rows % 2)),
+        "botanist_mobile": None,
+        "botanist_email": None,
+    })
+
+
+def update_reading_per_row(connection, new_data: pd.DataFrame) -> int:
+    """The per-row loader update_reading replaced: for each reading, a
+    database switch, a botanist lookup, an insert and a commit."""
+
+    inserted = 0
+    with connection.connect() as conn:
+        for reading in new_data.to_dict('records'):
+            # Stands in for "USE plants", which SQLite does not have
+            conn.execute(sql.text("SELECT 1"))
+            fetched_botanist_query = conn.execute(
+                sql.text("SELECT botanist_id FROM s_gamma.botanist "
+                         "WHERE botanist_name = (:botanist_name);"),
+                {"botanist_name": reading['botanist_name']}).fetchone()
+            try:
+                if not reading['error']:
+                    conn.execute(sql.text(
+                        """INSERT INTO s_gamma.reading
+                        (plant_id, botanist_id, soil_moisture,
+                          temperature, last_watered, recording_taken)
+                        VALUES (:plant, :botanist, :moisture,
+                          :temperature, :watered_at, :recording_at)"""), {
+                        "plant": reading['plant_id'],
+                        "botanist": fetched_botanist_query[0],
+                        "moisture": reading['soil_moisture'],
+                        "temperature": reading['temperature'],
+                        "watered_at": reading['last_watered'].to_pydatetime(),
+                        "recording_at": reading['recording_taken'].to_pydatetime()
+                    })
+                    conn.commit()
+                    inserted += 1
+            except Exception:  # pylint: disable=broad-exception-caught
+                continue
+    return inserted
+
+
+LOADERS = {"per_row": update_reading_per_row, "bulk": update_reading,
+           "upsert": partial(update_reading, load_mode="upsert")}
+
+
+def run_benchmark(rows: int, loader: str, repeats: int, latency: float) -> dict:
+    """Times one loader over a cycle of rows readings, each run on a fresh database."""
+
+    readings = make_transformed_readings(rows)
+    seconds = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            engine = create_standin_engine()
+            BOTANIST_CACHE.clear()
+            if latency:
+                add_simulated_latency(engine, latency)
+            start_time = perf_counter()
+            inserted = LOADERS[loader](engine, readings)
+            seconds.append(perf_counter() - start_time)
+            engine.dispose()
+
+    return {
+        "rows": rows,
+        "inserted": inserted,
+        "seconds": round(median(seconds), 5),
+        "rows_per_second": round(rows / median(seconds))
+    }
+
+
+def get_arguments():
+    """Parses the benchmark settings from the command line."""
+
+    parser = ArgumentParser(description="Benchmark the load stage")
+    parser.add_argument("--rows", nargs="+", type=int, default=[51, 10_000])
+    parser.add_argument("--loaders", nargs="+", choices=list(LOADERS), default=list(LOADERS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=0,
+                        help="Simulated round trip added to every statement")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+
+    for row_count in args.rows:
+        for loader_name in args.loaders:
+            result = run_benchmark(row_count, loader_name, args.repeats,
+                                   args.latency_ms / 1000)
+            print(f"{loader_name:>8} {row_count:>6} rows {result}")
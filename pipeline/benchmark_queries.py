@@ -0,0 +1,112 @@
+'''Benchmark for the reading queries on the SQLite stand-in, comparing the
+previous queries, which filtered on a function of recording_taken or read
+the whole table, with the half-open range queries of reading_queries.py,
+with and without the covering indexes.
+
+    python3 benchmark_queries.py --rows 1000000
+
+The table holds 51 plants read once a minute, so 1M rows is about two
+weeks of readings.'''
+
+from argparse import ArgumentParser
+from contextlib import closing
+from datetime import timedelta
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import sql
+
+from reading_queries import build_readings_query, get_day_range
+from sqlite_standin import create_standin_engine
+
+
+PLANTS = 51
+# The previous queries, in SQLite's dialect: date() stands in for CONVERT(DATE, ...)
+LEGACY_QUERIES = {
+    "day": "SELECT * FROM s_gamma.reading WHERE date(recording_taken) = date(:start);",
+    "plant_day": "SELECT * FROM s_gamma.reading WHERE plant_id = :plant_id "
+                 "AND date(recording_taken) = date(:start);",
+    "last_24_hours": "SELECT * FROM s_gamma.reading;"
+}
+
+
+def fill_readings(engine, rows: int) -> pd.Timestamp:
+    """Inserts rows minute readings of PLANTS plants and returns the last recording time."""
+
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp("2023-12-01")
+    recording_taken = (start + pd.to_timedelta(np.arange(rows) // PLANTS, unit="min")) \
+        .strftime("%Y-%m-%d %H:%M:%S")
+    readings = zip((np.arange(rows) % PLANTS).tolist(), [1] * rows,
+                   np.round(rng.uniform(15, 95, rows), 2).tolist(),
+                   np.round(rng.uniform(5, 30, rows), 2).tolist(),
+                   recording_taken, recording_taken)
+
+    with closing(engine.raw_connection()) as connection:
+        connection.execute("BEGIN")
+        connection.executemany(
+            """INSERT INTO s_gamma.reading (plant_id, botanist_id, soil_moisture,
+            temperature, recording_taken, last_watered) VALUES (?, ?, ?, ?, ?, ?)""",
+            readings)
+        connection.execute("COMMIT")
+        connection.execute("ANALYZE s_gamma")
+    return pd.Timestamp(recording_taken[-1])
+
+
+def time_query(engine, query, parameters: dict, repeats: int) -> tuple[float, int]:
+    """Returns the median seconds to fetch every row of the query, and the row count."""
+
+    seconds = []
+    with engine.connect() as conn:
+        for _ in range(repeats):
+            start_time = perf_counter()
+            rows = conn.execute(query, parameters).fetchall()
+            seconds.append(perf_counter() - start_time)
+    return median(seconds), len(rows)
+
+
+def get_benchmark_queries(last_recording: pd.Timestamp) -> dict:
+    """Returns the legacy and range query, with parameters, of each access pattern."""
+
+    day_start, day_end = get_day_range(last_recording.date() - timedelta(days=1))
+    day = {"start": day_start, "end": day_end}
+    last_24_hours = {"start": last_recording.to_pydatetime() - timedelta(hours=24),
+                     "end": last_recording.to_pydatetime() + timedelta(seconds=1)}
+    return {
+        "day": (day, build_readings_query()),
+        "plant_day": ({**day, "plant_id": 7, "plant_ids": [7]}, build_readings_query([7])),
+        # The dashboard read the whole table, which the nightly export kept to one day
+        "last_24_hours": (last_24_hours, build_readings_query())
+    }
+
+
+def get_arguments():
+    """Parses the benchmark settings from the command line."""
+
+    parser = ArgumentParser(description="Benchmark the reading queries")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+
+    for with_indexes in (False, True):
+        standin = create_standin_engine(indexes=with_indexes)
+        last_recording_taken = fill_readings(standin, args.rows)
+        schema = "covering" if with_indexes else "unique only"
+
+        for name, (query_parameters, range_query) in \
+                get_benchmark_queries(last_recording_taken).items():
+            legacy_parameters = {key: value for key, value in query_parameters.items()
+                                 if key != "plant_ids"}
+            for kind, query, parameters in (
+                    ("legacy", sql.text(LEGACY_QUERIES[name]), legacy_parameters),
+                    ("range", range_query, query_parameters)):
+                seconds, row_count = time_query(standin, query, parameters, args.repeats)
+                print(f"{schema:>11} {name:>13} {kind:>6}: {seconds * 1000:9.2f} ms "
+                      f"{row_count:>8} rows")
+        standin.dispose()
@@ -0,0 +1,203 @@
+'''Benchmark for the transform which cleans synthetic extractor output at
+several sizes and records the time and peak memory of clean_reading_data.
+
+    python3 benchmark_transform.py --sizes plants day --save-baseline
+    python3 benchmark_transform.py --sizes plants day
+
+The first run stores the results in BASELINE_PATH; later runs compare
+against it and exit with status 1 if any size got slower or used more
+memory than the baseline by more than the thresholds. Baselines are only
+comparable on the same machine, so record one on the machine that runs
+the check. The "year" size (51 plants every minute for a year, ~27M
+rows) needs tens of GB of memory and is not run by default.'''
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from statistics import median
+from time import perf_counter
+import io
+import json
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from mock_plant_api import API_ERRORS, BOTANISTS
+from timestamps import LAST_WATERED_FORMAT, LAST_WATERED_CACHE, RECORDING_TAKEN_CACHE
+from transform_readings import clean_reading_data, MAX_TEMPERATURE, MAX_SOIL_MOISTURE
+
+
+PLANTS = 51
+MINUTES_PER_DAY = 1440
+SIZES = {"plants": PLANTS,
+         "day": PLANTS * MINUTES_PER_DAY,
+         "year": PLANTS * MINUTES_PER_DAY * 365}
+BASELINE_PATH = "transform_baseline.json"
+NULL_SHARE = 0.02
+OUT_OF_RANGE_SHARE = 0.05
+ERROR_SHARE = 0.03
+MIN_SECONDS = 0.5
+
+
+def make_readings(rows: int, nested: bool = False, seed: int = 0,
+                  null_share: float = NULL_SHARE,
+                  out_of_range_share: float = OUT_OF_RANGE_SHARE,
+                  error_share: float = ERROR_SHARE) -> pd.DataFrame:
+    """
+    Returns synthetic extractor output: PLANTS plants read once a minute,
+    with the given shares of missing measurements, out-of-range
+    measurements and error rows. Botanists are flattened as the extract
+    does unless nested is True, which gives the raw API's botanist dicts.
+    """
+
+    rng = np.random.default_rng(seed)
+    plant_ids = np.arange(rows) % PLANTS
+    minutes = np.arange(rows) // PLANTS
+
+    soil_moisture = rng.uniform(15, 95, rows)
+    temperature = rng.uniform(5, 30, rows)
+    for values, maximum in ((soil_moisture, MAX_SOIL_MOISTURE), (temperature, MAX_TEMPERATURE)):
+        out_of_range = rng.random(rows) < out_of_range_share
+        values[out_of_range] = np.where(rng.random(out_of_range.sum()) < 0.5,
+                                        -rng.uniform(1, 10, out_of_range.sum()),
+                                        maximum + rng.uniform(1, 10, out_of_range.sum()))
+        values[rng.random(rows) < null_share] = np.nan
+
+    recording_times = pd.Timestamp("2023-12-21") + pd.to_timedelta(np.unique(minutes), unit="min")
+    recording_taken = recording_times.strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object)
+    watered_times = pd.Timestamp("2023-12-20") + pd.to_timedelta(np.arange(PLANTS), unit="h")
+    last_watered = watered_times.strftime(LAST_WATERED_FORMAT).to_numpy(dtype=object)
+    plant_names = np.array([f"Plant {plant_id}" for plant_id in range(PLANTS)], dtype=object)
+    botanists = np.array(BOTANISTS, dtype=object)[plant_ids % len(BOTANISTS)]
+
+    readings = pd.DataFrame({
+        "plant_id": plant_ids,
+        "plant_name": plant_names[plant_ids],
+        "soil_moisture": soil_moisture,
+        "temperature": temperature,
+        "last_watered": last_watered[plant_ids],
+        "recording_taken": recording_taken[minutes],
+        "botanist": botanists,
+        "error": np.full(rows, None, dtype=object)
+    })
+
+    # Error rows keep only their plant_id and the API's error message
+    errors = rng.random(rows) < error_share
+    readings.loc[errors, ["plant_name", "last_watered", "recording_taken",
+                          "botanist"]] = None
+    readings.loc[errors, ["soil_moisture", "temperature"]] = np.nan
+    readings.loc[errors, "error"] = rng.choice(API_ERRORS, errors.sum())
+
+    if not nested:
+        botanists = readings.pop("botanist")
+        for column, key in (("botanist_name", "name"), ("botanist_mobile", "phone"),
+                            ("botanist_email", "email")):
+            readings[column] = [botanist[key] if botanist else None
+                                for botanist in botanists]
+    return readings
+
+
+def clear_timestamp_caches() -> None:
+    """Empties the shared timestamp caches, which would otherwise be warm
+    for every run after the first."""
+
+    LAST_WATERED_CACHE.clear()
+    RECORDING_TAKEN_CACHE.clear()
+
+
+def run_benchmark(readings: pd.DataFrame, backend: str, repeats: int,
+                  min_seconds: float = MIN_SECONDS) -> dict:
+    """
+    Times clean_reading_data over the readings and measures its peak memory.
+    Runs at least repeats times, and until min_seconds have passed, so the
+    median of small sizes is not dominated by noise. The timestamp caches
+    are cleared before every run, so each run parses its timestamps.
+    """
+
+    seconds = []
+    with redirect_stdout(io.StringIO()):
+        while len(seconds) < repeats or sum(seconds) < min_seconds:
+            clear_timestamp_caches()
+            start_time = perf_counter()
+            cleaned = clean_reading_data(readings, backend=backend)
+            seconds.append(perf_counter() - start_time)
+
+        # Measured in a separate run, as tracing allocations slows the transform
+        clear_timestamp_caches()
+        tracemalloc.start()
+        clean_reading_data(readings, backend=backend)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "rows": len(readings),
+        "rows_kept": len(cleaned),
+        "runs": len(seconds),
+        "seconds": round(median(seconds), 5),
+        "best_seconds": round(min(seconds), 5),
+        "rows_per_second": round(len(readings) / median(seconds)),
+        "peak_mb": round(peak_bytes / 1e6, 2)
+    }
+
+
+def find_regressions(results: dict, baseline: dict, time_threshold: float,
+                     memory_threshold: float) -> list[str]:
+    """Returns a description of every result slower or larger than its baseline
+    by more than the threshold. Results missing from the baseline are skipped."""
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric, threshold in (("seconds", time_threshold), ("peak_mb", memory_threshold)):
+            limit = baseline[name][metric] * (1 + threshold)
+            if result[metric] > limit:
+                regressions.append(f"{name} {metric}: {result[metric]} > {round(limit, 5)} "
+                                   f"(baseline {baseline[name][metric]})")
+    return regressions
+
+
+def get_arguments():
+    """Parses the benchmark settings from the command line."""
+
+    parser = ArgumentParser(description="Benchmark the transform stage")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["plants", "day"])
+    parser.add_argument("--backends", nargs="+", default=["pandas"])
+    parser.add_argument("--nested", action="store_true",
+                        help="Use nested botanist dicts as the raw API returns them")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run as the baseline instead of comparing")
+    parser.add_argument("--time-threshold", type=float, default=0.25)
+    parser.add_argument("--memory-threshold", type=float, default=0.10)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+
+    benchmark_results = {}
+    for size in args.sizes:
+        synthetic_readings = make_readings(SIZES[size], nested=args.nested)
+        for backend_name in args.backends:
+            result_name = f"{backend_name}:{size}" + (":nested" if args.nested else "")
+            benchmark_results[result_name] = run_benchmark(
+                synthetic_readings, backend_name, args.repeats)
+            print(f"{result_name:>24} {benchmark_results[result_name]}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(benchmark_results, baseline_file, indent=2)
+        print(f"Saved baseline to {args.baseline}.")
+        sys.exit(0)
+
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline_results = json.load(baseline_file)
+
+    found_regressions = find_regressions(benchmark_results, baseline_results,
+                                         args.time_threshold, args.memory_threshold)
+    for regression in found_regressions:
+        print(f"Regression: {regression}")
+    sys.exit(1 if found_regressions else 0)
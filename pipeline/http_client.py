@@ -0,0 +1,146 @@
+'''Shared HTTP client layer for calls to the plants API.
+Each worker process/thread keeps one persistent keep-alive session with a
+bounded connection pool, so plants reuse connections instead of paying for
+a new TCP and TLS handshake on every request.'''
+
+from os import environ, getpid
+import threading
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+
+BASE_URL = environ.get(
+    "PLANTS_API_URL", 'https://data-eng-plants-api.herokuapp.com/plants/')
+POOL_MAXSIZE = int(environ.get("HTTP_POOL_MAXSIZE", 10))
+USE_GZIP = environ.get("HTTP_GZIP", "true").lower() == "true"
+REQUEST_TIMEOUT = 10
+
+_local = threading.local()
+# (pid, session) pairs, so a forked worker does not count its parent's sessions
+_sessions = []
+_sessions_lock = threading.Lock()
+_async_counters = {"requests": 0, "new_connections": 0, "reused_connections": 0}
+# The latest session stats reported by each Pool worker process, by pid
+_worker_stats = {}
+
+
+def get_headers() -> dict:
+    """Returns the headers sent with every plant API request."""
+
+    headers = {"Connection": "keep-alive"}
+    headers["Accept-Encoding"] = "gzip, deflate" if USE_GZIP else "identity"
+    return headers
+
+
+def create_session() -> requests.Session:
+    """Creates a keep-alive session with a bounded connection pool."""
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE,
+                          pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(get_headers())
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the persistent session for the current worker, creating it on
+    first use. Sessions are never shared across forked processes.
+    """
+
+    if getattr(_local, "pid", None) != getpid():
+        _local.session = create_session()
+        _local.pid = getpid()
+        with _sessions_lock:
+            _sessions.append((_local.pid, _local.session))
+    return _local.session
+
+
+def get_plant(plant_id: int, timeout: int = REQUEST_TIMEOUT) -> requests.Response:
+    """Requests a single plant from the API on the worker's session."""
+
+    return get_session().get(BASE_URL+str(plant_id), timeout=timeout)
+
+
+async def _on_request_start(session, context, params):
+    _async_counters["requests"] += 1
+
+
+async def _on_connection_create(session, context, params):
+    _async_counters["new_connections"] += 1
+
+
+async def _on_connection_reuse(session, context, params):
+    _async_counters["reused_connections"] += 1
+
+
+def create_async_session(concurrency: int,
+                         timeout: int = REQUEST_TIMEOUT) -> aiohttp.ClientSession:
+    """
+    Creates an asyncio session whose keep-alive pool holds at most
+    `concurrency` connections and reports to the shared counters.
+    """
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_connection_create_end.append(_on_connection_create)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuse)
+
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=concurrency),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        headers=get_headers(),
+        auto_decompress=True,
+        trace_configs=[trace_config])
+
+
+def get_session_stats() -> dict:
+    """
+    Returns how many requests the sessions created in this process have
+    sent and how many new connections they needed.
+    """
+
+    stats = {"requests": 0, "new_connections": 0, "reused_connections": 0}
+    with _sessions_lock:
+        sessions = [session for pid, session in _sessions if pid == getpid()]
+
+    for session in sessions:
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                stats["requests"] += pool.num_requests
+                stats["new_connections"] += pool.num_connections
+                stats["reused_connections"] += pool.num_requests - \
+                    pool.num_connections
+
+    return stats
+
+
+def record_worker_stats(pid: int, stats: dict) -> None:
+    """Keeps the latest session stats a worker process reported."""
+
+    with _sessions_lock:
+        _worker_stats[pid] = stats
+
+
+def get_connection_stats() -> dict:
+    """
+    Returns how many requests this process and its Pool workers have sent
+    and how many new connections they needed; reused = requests - new
+    connections.
+    """
+
+    stats = dict(_async_counters)
+    with _sessions_lock:
+        worker_stats = list(_worker_stats.values())
+
+    for session_stats in [get_session_stats()] + worker_stats:
+        for key, value in session_stats.items():
+            stats[key] += value
+
+    return stats
@@ -0,0 +1,77 @@
+'''Script to remember the last recording_taken seen for every plant, so
+samples the API has not refreshed since the previous poll are dropped
+before they are transformed and loaded again.'''
+
+import pandas as pd
+
+from load import get_last_recordings
+from plant_reading import PlantReading
+from timestamps import RECORDING_TAKEN_CACHE
+
+
+class LastSeenIndex:
+    """Maps plant_id to the last recording_taken timestamp seen for it."""
+
+    def __init__(self, last_recordings: dict = None):
+        self.last_recordings = {} if last_recordings is None else last_recordings
+        self.suppressed_last_cycle = 0
+        self.suppressed_total = 0
+
+    def load_from_database(self, connection) -> None:
+        """Warms the index with the latest reading of every plant in the database."""
+
+        self.last_recordings.update(get_last_recordings(connection))
+
+    def start_cycle(self) -> None:
+        """Resets the per-cycle count of suppressed duplicates."""
+
+        self.suppressed_last_cycle = 0
+
+    def is_new_reading(self, reading: PlantReading | None) -> bool:
+        """
+        Returns False if the reading repeats the plant's last seen sample,
+        otherwise remembers it and returns True. Readings without a
+        recording time (errors, failed requests) are always passed on.
+        """
+
+        if reading is None or reading.recording_taken is None:
+            return True
+
+        recording_taken = RECORDING_TAKEN_CACHE.parse_value(reading.recording_taken)
+        if self.last_recordings.get(reading.plant_id) == recording_taken:
+            self.suppressed_last_cycle += 1
+            self.suppressed_total += 1
+            return False
+
+        self.last_recordings[reading.plant_id] = recording_taken
+        return True
+
+    def drop_unchanged_readings(self, readings: pd.DataFrame) -> pd.DataFrame:
+        """Removes readings whose recording_taken matches the last one seen."""
+
+        self.start_cycle()
+        if readings.empty:
+            return readings
+
+        recording_taken = pd.Series(
+            RECORDING_TAKEN_CACHE.parse(readings['recording_taken'].to_numpy()),
+            index=readings.index)
+        last_seen = readings['plant_id'].map(self.last_recordings)
+        unchanged = recording_taken.notnull() & (recording_taken == last_seen)
+
+        changed = ~unchanged & recording_taken.notnull()
+        self.last_recordings.update(
+            zip(readings.loc[changed, 'plant_id'], recording_taken[changed]))
+
+        self.suppressed_last_cycle = int(unchanged.sum())
+        self.suppressed_total += self.suppressed_last_cycle
+        return readings[~unchanged]
+
+    def get_stats(self) -> dict:
+        """Returns the duplicate counters and the number of plants indexed."""
+
+        return {
+            "indexed_plants": len(self.last_recordings),
+            "suppressed_last_cycle": self.suppressed_last_cycle,
+            "suppressed_total": self.suppressed_total
+        }
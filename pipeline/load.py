@@ -4,56 +4,316 @@ Script to load clean data onto RDS database, connecting to
 the database and sending INSERT queries to the database.
 """
 
+from functools import lru_cache
 from os import environ
+import threading
 
 import pandas as pd
 from sqlalchemy import create_engine, sql
+from sqlalchemy.exc import SQLAlchemyError
+
+from reading_queries import get_latest_recordings
+from sql_limits import get_max_rows, get_staging_table
+
+
+READING_PARAMETERS = ("plant", "botanist", "moisture",
+                      "temperature", "watered_at", "recording_at")
+MAX_BATCH_SIZE = get_max_rows(len(READING_PARAMETERS))
+# Fail fast when the database is unreachable, rather than after pymssql's 60 s
+DB_LOGIN_TIMEOUT = int(environ.get("DB_LOGIN_TIMEOUT", 10))
+LOAD_BATCH_SIZE = min(int(environ.get("LOAD_BATCH_SIZE", 300)), MAX_BATCH_SIZE)
+# "append" inserts every reading; "upsert" skips readings already stored
+LOAD_MODE = environ.get("LOAD_MODE", "append")
+READING_COLUMNS = ("plant_id, botanist_id, soil_moisture, "
+                   "temperature, last_watered, recording_taken")
 
 
 def get_database_connection():
     """Returns a live database connection."""
-    return create_engine(f"""mssql+pymssql://{environ['DB_USER']}:{environ['DB_PASSWORD']}@{environ['DB_HOST']}/plants""")
+    return create_engine(f"""mssql+pymssql://{environ['DB_USER']}:{environ['DB_PASSWORD']}@{environ['DB_HOST']}/plants""",
+                         connect_args={"login_timeout": DB_LOGIN_TIMEOUT})
 
 
-def update_reading(connection, new_data: pd.DataFrame) -> None:
-    """Function to insert records of plant health for each plant into the
-    reading table in the plant database."""
+def get_last_recordings(connection) -> dict:
+    """Returns the latest recording_taken stored for each plant in the reading table."""
 
     with connection.connect() as conn:
+        rows = get_latest_recordings(conn)
+
+    return {plant_id: pd.Timestamp(recording_taken)
+            for plant_id, recording_taken in rows if recording_taken is not None}
+
+
+class DimensionCache:
+    """
+    In-memory map from a dimension table's natural key to its id, so the
+    load resolves a whole cycle with one vectorised map instead of a query
+    per reading. The table is read once and re-read only when a key is
+    missing; keys still missing are inserted in bulk if the cache has
+    insert_columns, a map from table column to readings column.
+    """
+
+    def __init__(self, table: str, key_column: str, id_column: str,
+                 insert_columns: dict = None):
+        self.table = table
+        self.key_column = key_column
+        self.id_column = id_column
+        self.insert_columns = insert_columns or {}
+        # Reentrant, so a load can hold it for its whole transaction
+        self.lock = threading.RLock()
+        self.ids = {}
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def refresh(self, conn) -> None:
+        """Reloads every key and id from the table."""
+
+        with self.lock:
+            rows = conn.execute(sql.text(
+                f"SELECT {self.key_column}, {self.id_column} FROM {self.table};")).fetchall()
+            self.ids = dict(rows)
+            self.loaded = True
+            self.refreshes += 1
+
+    def clear(self) -> None:
+        """Forgets the cached ids, e.g. after a rollback of inserted keys."""
+
+        with self.lock:
+            self.ids = {}
+            self.loaded = False
+
+    def insert_missing(self, conn, readings: pd.DataFrame, keys: set) -> None:
+        """Inserts one row per missing key, taking the other columns from
+        the key's first reading."""
+
+        first_readings = readings[readings[self.key_column].isin(list(keys))] \
+            .drop_duplicates(self.key_column)
+        rows = []
+        for reading in first_readings.to_dict('records'):
+            row = {self.key_column: reading[self.key_column]}
+            for column, source in self.insert_columns.items():
+                value = reading.get(source)
+                row[column] = None if pd.isnull(value) else value
+            rows.append(row)
+
+        columns = list(rows[0])
+        conn.execute(sql.text(
+            f"INSERT INTO {self.table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + column for column in columns)});"), rows)
+        print(f"Inserted {len(rows)} new rows into {self.table}.")
+
+    def resolve(self, conn, readings: pd.DataFrame) -> pd.Series:
+        """
+        Returns the id of each reading's key, aligned with readings, with
+        NaN where the key is missing or could not be resolved.
+        """
+
+        with self.lock:
+            if not self.loaded:
+                self.refresh(conn)
+
+            keys = readings[self.key_column].astype(object)
+            ids = keys.map(self.ids)
+            missing = ids.isna() & keys.notna()
+            self.misses += int(missing.sum())
+            self.hits += int(ids.notna().sum())
+            if not missing.any():
+                return ids
+
+            self.refresh(conn)
+            unknown = set(keys[missing]) - set(self.ids)
+            if unknown and self.insert_columns:
+                self.insert_missing(conn, readings, unknown)
+                self.refresh(conn)
+            return keys.map(self.ids)
+
+    def get_stats(self) -> dict:
+        """Returns the hit, miss and refresh counters and the number of cached keys."""
+
+        with self.lock:
+            return {
+                "cached_keys": len(self.ids),
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes
+            }
+
+
+# Shared by every cycle, as botanists rarely change
+BOTANIST_CACHE = DimensionCache(
+    "s_gamma.botanist", "botanist_name", "botanist_id",
+    {"botanist_phone": "botanist_mobile", "botanist_email": "botanist_email"})
+
+
+@lru_cache(maxsize=8)
+def get_insert_query(row_count: int, table: str = "s_gamma.reading") -> sql.expression.TextClause:
+    """Returns an INSERT of row_count readings in one multi-row VALUES
+    statement, with the parameters of row i suffixed _i."""
+
+    values = ",\n".join(
+        "(" + ", ".join(f":{name}_{row}" for name in READING_PARAMETERS) + ")"
+        for row in range(row_count))
+    return sql.text(f"INSERT INTO {table} ({READING_COLUMNS}) VALUES {values}")
+
+
+def insert_readings(conn, rows: list[dict], table: str = "s_gamma.reading") -> None:
+    """Inserts the rows with a single statement, so one round trip."""
+
+    parameters = {f"{name}_{row}": value
+                  for row, reading in enumerate(rows) for name, value in reading.items()}
+    conn.execute(get_insert_query(len(rows), table), parameters)
+
+
+def to_parameters(values: pd.Series) -> list:
+    """Returns a column as Python values for the driver, with NaN/NaT as None."""
+
+    if values.dtype.kind == 'M':
+        return [None if pd.isnull(value) else value.to_pydatetime()
+                for value in values]
+    values = values.astype(object)
+    return values.where(values.notna(), None).tolist()
+
+
+def build_reading_rows(new_data: pd.DataFrame, botanists: pd.Series) -> list[dict]:
+    """
+    Returns the insert parameters of every reading to load, given each
+    reading's botanist_id. Erroneous readings are skipped, as are readings
+    without a botanist_id.
+    """
+
+    no_error = ~new_data['error'].fillna('').astype(bool).to_numpy()
+    known_botanist = botanists.notna().to_numpy()
+
+    unknown = int((no_error & ~known_botanist).sum())
+    if unknown:
+        print(f"Skipped {unknown} readings with an unknown botanist.")
+
+    readings = new_data[no_error & known_botanist]
+    columns = [
+        to_parameters(readings['plant_id']),
+        to_parameters(botanists[no_error & known_botanist].astype(int)),
+        to_parameters(readings['soil_moisture']),
+        to_parameters(readings['temperature']),
+        to_parameters(readings['last_watered']),
+        to_parameters(readings['recording_taken'])
+    ]
+    return [dict(zip(READING_PARAMETERS, row)) for row in zip(*columns)]
+
+
+def insert_rows_one_by_one(conn, rows: list[dict], table: str = "s_gamma.reading") -> int:
+    """Inserts the rows of a failed batch each in its own savepoint, so only
+    the failing rows are skipped. Returns the number of rows inserted."""
+
+    inserted = 0
+    for row in rows:
+        try:
+            with conn.begin_nested():
+                insert_readings(conn, [row], table)
+            inserted += 1
+        except SQLAlchemyError as error:
+            print(f"Skipped reading for plant {row['plant']}: {error.__class__.__name__}")
+    return inserted
+
+
+def append_readings(conn, rows: list[dict], batch_size: int,
+                    table: str = "s_gamma.reading") -> int:
+    """Inserts the rows batch_size at a time, each batch in a savepoint. A
+    batch that fails is retried row by row to isolate the failing rows."""
+
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        try:
+            with conn.begin_nested():
+                insert_readings(conn, batch, table)
+            inserted += len(batch)
+        except SQLAlchemyError:
+            inserted += insert_rows_one_by_one(conn, batch, table)
+    return inserted
+
+
+def upsert_readings(conn, rows: list[dict], batch_size: int) -> int:
+    """
+    Stages the rows in a temp table and merges them into the reading table
+    with one INSERT ... SELECT, skipping readings whose (plant_id,
+    recording_taken) is already stored. Returns the number of rows inserted.
+    """
+
+    staging_table = get_staging_table(conn.dialect.name, "reading_staging")
+
+    # A reading repeated within the cycle would violate the unique index
+    unique_rows = {}
+    for row in rows:
+        unique_rows.setdefault((row['plant'], row['recording_at']), row)
+    rows = list(unique_rows.values())
+
+    conn.execute(sql.text(f"DROP TABLE IF EXISTS {staging_table};"))
+    conn.execute(sql.text(
+        f"""CREATE TABLE {staging_table} (
+            plant_id INT, botanist_id INT,
+            soil_moisture DECIMAL(4,2), temperature DECIMAL(4,2),
+            last_watered DATETIME2(2), recording_taken DATETIME2(2));"""))
+    # A reading the staging table rejects, e.g. a value overflowing its
+    # column, is skipped like a failing row of the append mode
+    staged = append_readings(conn, rows, batch_size, staging_table)
+    if staged < len(rows):
+        print(f"Skipped {len(rows) - staged} readings the staging table rejected.")
+
+    merge_query = sql.text(
+        f"""INSERT INTO s_gamma.reading ({READING_COLUMNS})
+        SELECT {READING_COLUMNS} FROM {staging_table} AS staged
+        WHERE NOT EXISTS (
+            SELECT 1 FROM s_gamma.reading AS stored
+            WHERE stored.plant_id = staged.plant_id
+            AND stored.recording_taken = staged.recording_taken);""")
+    try:
+        with conn.begin_nested():
+            inserted = conn.execute(merge_query).rowcount
+    except SQLAlchemyError:
+        # Isolate the failing rows; the unique index rejects stored readings
+        inserted = insert_rows_one_by_one(conn, rows)
+    conn.execute(sql.text(f"DROP TABLE {staging_table};"))
+
+    if staged > inserted:
+        print(f"Skipped {staged - inserted} readings already in the reading table.")
+    return inserted
+
+
+def update_reading(connection, new_data: pd.DataFrame,
+                   batch_size: int = LOAD_BATCH_SIZE,
+                   botanist_cache: DimensionCache = BOTANIST_CACHE,
+                   load_mode: str = LOAD_MODE) -> int:
+    """
+    Inserts the readings into the reading table in one transaction,
+    batch_size rows per multi-row INSERT. Botanist ids come from the
+    botanist cache, which adds botanists not yet in the table. In upsert
+    mode, readings already stored are skipped, so a retried or overlapping
+    load does not duplicate them. Returns the number of rows inserted.
+    """
+
+    if load_mode not in ("append", "upsert"):
+        raise ValueError(f"Unknown load mode: {load_mode}")
+    if new_data.empty:
+        return 0
+
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    # Held until the transaction ends, so a load on another thread (the
+    # background writer or spool replayer) cannot miss a botanist inserted
+    # here but not yet committed, and insert it again
+    with botanist_cache.lock:
+        try:
+            with connection.begin() as conn:
+                botanist_ids = botanist_cache.resolve(conn, new_data)
+                rows = build_reading_rows(new_data, botanist_ids)
+                if load_mode == "upsert":
+                    inserted = upsert_readings(conn, rows, batch_size)
+                else:
+                    inserted = append_readings(conn, rows, batch_size)
+        except SQLAlchemyError:
+            # Botanists inserted in the rolled back transaction no longer exist
+            botanist_cache.clear()
+            raise
 
-        plant_data = new_data.values.tolist()
-
-        for reading in plant_data:
-
-            plant_id = reading[0]
-
-            conn.execute(sql.text("USE plants"))
-
-            botanist_id_query = sql.text(
-                "SELECT botanist_id FROM s_gamma.botanist WHERE botanist_name = (:botanist_name);")
-
-            fetched_botanist_query = conn.execute(botanist_id_query,
-                                                  {"botanist_name": reading[6]}).fetchone()
-
-            error = reading[-1]
-            try:
-                # Do not insert erroneous transactions
-                if not error:
-                    botanist_id = fetched_botanist_query[0]
-                    insert_query = sql.text(
-                        """INSERT INTO s_gamma.reading
-                        (plant_id, botanist_id, soil_moisture,
-                          temperature, last_watered, recording_taken)
-                        VALUES (:plant, :botanist, :moisture,
-                          :temperature, :watered_at, :recording_at)""")
-                    conn.execute(insert_query, {
-                        "plant": plant_id,
-                        "botanist": botanist_id,
-                        "moisture": reading[2],
-                        "temperature": reading[3],
-                        "watered_at": reading[4],
-                        "recording_at": reading[5]
-                    })
-                    conn.commit()
-            except Exception:
-                continue
+    return inserted
@@ -1,39 +1,63 @@
 """Seeds the database with initial static data"""
+from functools import cache
 from os import environ
 import csv
 
-import requests
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, MetaData, Table
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.sql import text
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from http_client import get_connection_stats
+from plant_snapshot import get_plant_payloads
+from static_linker import link_static_tables
+from static_seed import (DIMENSION_COLUMNS, SEED_CSV, SEED_WORKERS,
+                         StaticSeeder, get_seed_rows)
 
 
 load_dotenv()
-BASE_URL = 'https://data-eng-plants-api.herokuapp.com/plants/'
 DATABASE_URI = f"mssql+pymssql://{environ['DB_USER']}:{environ['DB_PASSWORD']}@{environ['DB_HOST']}/plants"
-MAX_PLANT_NUM = 51
+
+
+@cache
+def get_engine() -> Engine:
+    """Returns the pooled engine shared by every seeding step."""
+
+    return create_engine(DATABASE_URI, pool_size=SEED_WORKERS, pool_pre_ping=True)
+
+
+@cache
+def get_seeder() -> StaticSeeder:
+    """Returns the seeder, with the static tables reflected once."""
+
+    return StaticSeeder(get_engine(), tables=list(DIMENSION_COLUMNS) + ["plant"])
+
+
+@cache
+def read_seed_data(data: str) -> pd.DataFrame:
+    """Reads the static data CSV, once per file."""
+
+    return pd.read_csv(data)
 
 
 def get_db_connection():
     """Connects to the remote database"""
 
-    engine = create_engine(DATABASE_URI)
-    conn = engine.connect()
+    conn = get_engine().connect()
 
     return conn
 
 
-def get_raw_data() -> list[dict]:
-    """"Returns all raw data about plants."""
+def get_raw_data(payloads: dict[int, dict] = None) -> list[dict]:
+    """"Returns all raw data about plants, from the plant snapshot."""
+
+    if payloads is None:
+        payloads = get_plant_payloads()
 
     plants_list = []
-    for plant_id in range(MAX_PLANT_NUM):
+    for plant_details in payloads.values():
         try:
             plant_dict = {}
-            plant_details = requests.get(
-                BASE_URL+str(plant_id), timeout=10).json()
             plant_dict["plant_id"] = plant_details.get("plant_id")
 
             plant_dict['plant_name'] = plant_details.get('name')
@@ -92,8 +116,8 @@ def get_raw_data() -> list[dict]:
                 plant_dict['small_url'] = None
                 plant_dict['thumbnail'] = None
             plants_list.append(plant_dict)
-        except requests.exceptions.JSONDecodeError:
-            print(plant_id, "plant not found")
+        except AttributeError:
+            print(plant_details.get("plant_id"), "plant not found")
 
     return plants_list
 
@@ -118,63 +142,15 @@ def write_to_csv(details_list: list, filename: str):
 def populate_db_table(table: str, column_list: list[str], data: str) -> None:
     '''Seeds a specified table in the database, with the specified table columns.'''
 
-    # Get the data
-    df = pd.read_csv(data)
-    rows = df[column_list].drop_duplicates().values.tolist()
-
-    # Remove invalid rows
-    rows = [lst for lst in rows if not all(
-        isinstance(item, float) for item in lst)]
-
-    # Get ready to insert data
-    engine = create_engine(DATABASE_URI)
-    metadata = MetaData(schema='s_gamma')
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    db_table = Table(table, metadata, autoload_with=engine)
-
-    # Insert the data into the database table
-    for row in rows:
-        row_dict = {column: row[index]
-                    for index, column in enumerate(column_list)}
-        insert_statement = db_table.insert().values(**row_dict)
-        session.execute(insert_statement)
-
-    # End the session once finished
-    session.commit()
-    session.close()
+    rows = get_seed_rows(read_seed_data(data), column_list)
+    get_seeder().seed_table(table, rows)
 
 
 def populate_plant_table(table: str, column_list: list[str], data: str) -> None:
     '''Seeds a specified table in the database, with the specified table columns.'''
 
-    # Get the data
-    df = pd.read_csv(data)
-    rows = df[column_list].values.tolist()
-
-    for row in rows:
-        if isinstance(row[1], float):
-            row[1] = None
-        if isinstance(row[0], float):
-            row[0] = None
-
-    # Get ready to insert data
-    engine = create_engine(DATABASE_URI)
-    metadata = MetaData(schema='s_gamma')
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    db_table = Table(table, metadata, autoload_with=engine)
-
-    # Insert the data into the database table
-    for row in rows:
-        row_dict = {column: row[index]
-                    for index, column in enumerate(column_list)}
-        insert_statement = db_table.insert().values(**row_dict)
-        session.execute(insert_statement)
-
-    # End the session once finished
-    session.commit()
-    session.close()
+    rows = get_seed_rows(read_seed_data(data), column_list, distinct=False)
+    get_seeder().seed_table(table, rows)
 
 
 """"
@@ -186,159 +162,18 @@ def populate_plant_table(table: str, column_list: list[str], data: str) -> None:
 """
 
 
-def license_id_in_image_table() -> None:
-    '''Inserts all license_ids into the image table.'''
-
-    pairs = []
-    for plant_id in range(MAX_PLANT_NUM):
-        try:
-            plant_details = requests.get(BASE_URL+str(plant_id),
-                                         timeout=10).json()
-
-            if 'images' in plant_details.keys():
-                if 'license_name' in plant_details['images'].keys() \
-                        and 'medium_url' in plant_details['images'].keys():
-                    pairs.append([plant_details['images']['license_name'],
-                                 plant_details['images']['medium_url']])
-
-        except requests.exceptions.JSONDecodeError:
-            continue
-        except AttributeError:
-            continue
-
-    # remove duplicates
-    pairs = [list(item) for item in set(tuple(row) for row in pairs)]
-    new_pairs = []
-    conn = get_db_connection()
-
-    with conn:
-        query = text(
-            '''select license_id from s_gamma.license where license_name = :value''')
-        for pair in pairs:
-            res = conn.execute(query, {'value': pair[0]})
-            for row in res:
-                new_pairs.append([row[0], pair[1]])
-
-        for pair in new_pairs:
-
-            query = text(
-                '''update s_gamma.image set license_id = :new_value 
-                where medium_url = :condition_value''')
-            params = {'new_value': pair[0], 'condition_value': pair[1]}
-            res = conn.execute(query, params)
-            conn.commit()
-
-
-def image_id_in_plant_table() -> None:
-    '''Inserts all image_ids into the plant table.'''
-
-    pairs = []
-    for plant_id in range(MAX_PLANT_NUM):
-        try:
-            plant_details = requests.get(BASE_URL+str(plant_id),
-                                         timeout=10).json()
-
-            if 'images' in plant_details.keys():
-                if 'license_name' in plant_details['images'].keys() \
-                        and 'medium_url' in plant_details['images'].keys():
-                    pairs.append([plant_details['name'],
-                                 plant_details['images']['medium_url']])
-
-        except requests.exceptions.JSONDecodeError:
-            continue
-        except AttributeError:
-            continue
-
-    # remove duplicates
-    pairs = [list(item) for item in set(tuple(row) for row in pairs)]
-    new_pairs = []
-
-    conn = get_db_connection()
-
-    with conn:
-        query = text(
-            '''select image_id from s_gamma.image where medium_url = :value''')
-        for pair in pairs:
-            res = conn.execute(query, {'value': pair[1]})
-            for row in res:
-
-                new_pairs.append([row[0], pair[0]])
-        for pair in new_pairs:
-            query = text(
-                '''update s_gamma.plant set image_id = :new_value 
-                where plant_name = :condition_value''')
-            params = {'new_value': pair[0], 'condition_value': pair[1]}
-            res = conn.execute(query, params)
-            conn.commit()
-
-
-def origin_id_in_plant_table() -> None:
-    '''Inserts all origin_ids into the plant table.'''
-
-    triples = []
-    for plant_id in range(MAX_PLANT_NUM):
-        try:
-            plant_details = requests.get(BASE_URL+str(plant_id),
-                                         timeout=10).json()
-
-            plant_name = plant_details.get("name", None)
-            latitude = plant_details.get("origin_location", [None])[0]
-            longitude = plant_details.get("origin_location", [None, None])[1]
-
-            triples.append([plant_name, latitude, longitude])
-
-        except requests.exceptions.JSONDecodeError:
-            continue
-        except AttributeError:
-            continue
-
-    # remove duplicates
-    triples = [list(item) for item in set(tuple(row) for row in triples)]
-    new_pairs = []
-
-    conn = get_db_connection()
-
-    with conn:
-        query = text(
-            '''select origin_id from s_gamma.origin 
-            where latitude = :value1 and longitude = :value2''')
-        for triple in triples:
-            res = conn.execute(
-                query, {'value1': triple[1], 'value2': triple[2]})
-            for row in res:
-                new_pairs.append([row[0], triple[0]])
-
-        for pair in new_pairs:
-
-            query = text(
-                '''update s_gamma.plant set origin_id = :new_value
-                where plant_name = :condition_value''')
-            params = {'new_value': pair[0], 'condition_value': pair[1]}
-            res = conn.execute(query, params)
-            conn.commit()
-
-
 def main():
     '''Seeds all the data in the database tables.'''
 
-    populate_db_table('origin', ['country_code', 'latitude',
-                      'longitude', 'location', 'region'], 'master_plant.csv')
-
-    populate_db_table(
-        'botanist', ['botanist_name', 'botanist_phone', 'botanist_email'], 'master_plant.csv')
-
-    populate_db_table(
-        'license', ['license_name', 'license_url', 'license'], 'master_plant.csv')
-
-    populate_db_table(
-        'image', ['medium_url', 'regular_url', 'original_url',
-                  'small_url', 'thumbnail'], 'master_plant.csv')
-
-    license_id_in_image_table()
+    # The CSV is read once and the dimension tables are seeded concurrently
+    seeded = get_seeder().seed_dimensions(read_seed_data(SEED_CSV))
+    print(f"Seeded static tables: {seeded}")
 
-    image_id_in_plant_table()
+    # Every foreign key is set from the same snapshot, in one transaction
+    updated = link_static_tables(get_engine(), get_plant_payloads())
+    print(f"Linked static tables: {updated}")
 
-    origin_id_in_plant_table()
+    print(f"Plant API connections: {get_connection_stats()}")
 
 
 if __name__ == "__main__":
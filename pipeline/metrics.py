@@ -0,0 +1,167 @@
+'''Per-cycle pipeline metrics: stage durations, per-plant request latency
+histograms, row counts and cycle overruns. Each cycle is written as one
+JSON log line, and the running totals can be served in Prometheus text
+format on METRICS_PORT.'''
+
+from contextlib import contextmanager
+from copy import deepcopy
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import environ
+import bisect
+import json
+import threading
+import time
+
+
+CYCLE_SECONDS = 60
+METRICS_PORT = environ.get("METRICS_PORT")
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_COUNTERS = ("rows_extracted", "rows_errored", "rows_duplicate",
+                "rows_dropped_validation", "rows_anomalous", "rows_inserted",
+                "plants_skipped")
+
+
+class PipelineMetrics:
+    """Collects the current cycle's metrics and the running totals across cycles."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cycle = {}
+        self.cycle_start_time = None
+        self.totals = {"cycles": 0, "cycle_overruns": 0,
+                       **{name: 0 for name in ROW_COUNTERS}}
+        self.stage_seconds = {}
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+    def start_cycle(self) -> None:
+        """Starts timing a new cycle with empty counters."""
+
+        with self.lock:
+            self.cycle_start_time = time.time()
+            self.cycle = {"stages": {}, "latency": {},
+                          **{name: 0 for name in ROW_COUNTERS}}
+
+    @contextmanager
+    def time_stage(self, stage: str):
+        """Adds the time spent inside the block to the stage's duration."""
+
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.add_stage_seconds(stage, time.time() - start_time)
+
+    def add_stage_seconds(self, stage: str, duration: float) -> None:
+        """Adds time spent elsewhere, such as on the writer thread, to the stage's duration."""
+
+        with self.lock:
+            self.cycle["stages"][stage] = round(
+                self.cycle["stages"].get(stage, 0) + duration, 4)
+            self.stage_seconds[stage] = self.stage_seconds.get(
+                stage, 0) + duration
+
+    def count(self, name: str, value: int) -> None:
+        """Adds to one of the cycle's counters."""
+
+        with self.lock:
+            self.cycle[name] = self.cycle.get(name, 0) + int(value)
+
+    def set_value(self, name: str, value) -> None:
+        """Records a value such as cache or connection stats for this cycle."""
+
+        with self.lock:
+            self.cycle[name] = value
+
+    def observe_latencies(self, latencies: list[float]) -> None:
+        """Adds per-plant request latencies to the cycle and cumulative histograms."""
+
+        cycle_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        for latency in latencies:
+            cycle_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+        with self.lock:
+            for index, bucket_count in enumerate(cycle_buckets):
+                self.latency_buckets[index] += bucket_count
+            self.latency_sum += sum(latencies)
+            self.latency_count += len(latencies)
+            self.cycle["latency"] = {
+                f"le_{bound}": bucket_count
+                for bound, bucket_count in zip(LATENCY_BUCKETS + ("inf",), cycle_buckets)}
+            self.cycle["latency"]["max"] = round(max(latencies, default=0), 4)
+
+    def end_cycle(self) -> dict:
+        """Finishes the cycle, updating the totals, and returns its metrics."""
+
+        duration = time.time() - self.cycle_start_time
+        with self.lock:
+            self.cycle["timestamp"] = datetime.now(timezone.utc).isoformat()
+            self.cycle["cycle_seconds"] = round(duration, 4)
+            self.cycle["overrun"] = duration > CYCLE_SECONDS
+
+            self.totals["cycles"] += 1
+            self.totals["cycle_overruns"] += self.cycle["overrun"]
+            for name in ROW_COUNTERS:
+                self.totals[name] += self.cycle[name]
+            self.cycle["cycle_overruns_total"] = self.totals["cycle_overruns"]
+            # A copy, so logging it cannot race with stages still recording
+            return deepcopy(self.cycle)
+
+    def to_prometheus(self) -> str:
+        """Returns the running totals in the Prometheus text exposition format."""
+
+        with self.lock:
+            lines = []
+            for name, value in self.totals.items():
+                lines.append(f"# TYPE plant_pipeline_{name}_total counter")
+                lines.append(f"plant_pipeline_{name}_total {value}")
+
+            lines.append("# TYPE plant_pipeline_stage_seconds_total counter")
+            for stage, seconds in self.stage_seconds.items():
+                lines.append(
+                    f'plant_pipeline_stage_seconds_total{{stage="{stage}"}} {seconds}')
+
+            lines.append("# TYPE plant_pipeline_request_latency_seconds histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS + ("+Inf",), self.latency_buckets):
+                cumulative += bucket_count
+                lines.append(
+                    f'plant_pipeline_request_latency_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"plant_pipeline_request_latency_seconds_sum {self.latency_sum}")
+            lines.append(f"plant_pipeline_request_latency_seconds_count {self.latency_count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def log_cycle(cycle_metrics: dict) -> None:
+    """Writes a cycle's metrics as a single structured JSON log line."""
+
+    print(json.dumps({"event": "pipeline_cycle", **cycle_metrics}, default=str))
+
+
+def start_metrics_server(metrics: PipelineMetrics, port: int) -> ThreadingHTTPServer:
+    """Serves the metrics in Prometheus text format on /metrics from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Responds to scrapes of /metrics."""
+
+        def do_GET(self):
+            """Returns the current metrics."""
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,180 @@
+'''Local stand-in for the plants API, serving the payload shapes documented
+in extract_response_plan.md for a configurable number of plants, with
+configurable latency, API errors, timeouts and malformed responses.
+
+Run it on its own with:
+    python3 mock_plant_api.py --plants 1000 --latency-median 0.1
+and point the pipeline at it with PLANTS_API_URL=http://127.0.0.1:5555/plants/'''
+
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from time import perf_counter
+import asyncio
+import random
+import threading
+
+from aiohttp import web
+
+
+API_ERRORS = ['plant sensor fault', 'plant on loan to another museum']
+NOT_FOUND_ERROR = 'plant not found'
+MALFORMED_BODY = '<html><body>Application error</body></html>'
+BOTANISTS = [
+    {"email": "carl.linnaeus@lnhm.co.uk", "name": "Carl Linnaeus",
+     "phone": "(146)994-1635x35992"},
+    {"email": "gertrude.jekyll@lnhm.co.uk", "name": "Gertrude Jekyll",
+     "phone": "001-481-273-3691x127"},
+    {"email": "eliza.andrews@lnhm.co.uk", "name": "Eliza Andrews",
+     "phone": "(846)669-6651x75948"},
+]
+IMAGES = {
+    "license": 451,
+    "license_name": "CC0 1.0 Universal (CC0 1.0) Public Domain Dedication",
+    "license_url": "https://creativecommons.org/publicdomain/zero/1.0/",
+    "medium_url": "https://perenual.com/storage/image/upgrade_access.jpg",
+    "original_url": "https://perenual.com/storage/image/upgrade_access.jpg",
+    "regular_url": "https://perenual.com/storage/image/upgrade_access.jpg",
+    "small_url": "https://perenual.com/storage/image/upgrade_access.jpg",
+    "thumbnail": "https://perenual.com/storage/image/upgrade_access.jpg"
+}
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock API; rates are per request, latencies in seconds."""
+
+    plants: int = 51
+    latency_median: float = 0.05
+    latency_sigma: float = 0.5
+    error_rate: float = 0.05
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 15
+    malformed_rate: float = 0.0
+    seed: int = 0
+
+
+def make_plant_payload(plant_id: int, rng: random.Random) -> dict:
+    """Returns a full plant response, missing images and scientific names for some plants."""
+
+    now = datetime.now()
+    payload = {
+        "botanist": BOTANISTS[plant_id % len(BOTANISTS)],
+        "last_watered": (now - timedelta(hours=plant_id % 24)).replace(
+            minute=0, second=0).strftime('%a, %d %b %Y %H:%M:%S GMT'),
+        "name": f"Plant {plant_id}",
+        "origin_location": ["22.88783", "84.13864", "Jashpurnagar", "IN", "Asia/Kolkata"],
+        "plant_id": plant_id,
+        "recording_taken": now.strftime('%Y-%m-%d %H:%M:%S'),
+        "soil_moisture": rng.uniform(-5, 105),
+        "temperature": rng.uniform(-2, 42)
+    }
+    if plant_id % 3:
+        payload["images"] = IMAGES
+        payload["scientific_name"] = [f"Plantus {plant_id}"]
+    return payload
+
+
+class MockPlantAPI:
+    """aiohttp application serving /plants/{plant_id} and recording request timings."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.request_log = []
+
+    def reset_log(self) -> None:
+        """Clears the recorded requests before a new benchmark run."""
+
+        self.request_log = []
+
+    async def handle_plant(self, request: web.Request) -> web.Response:
+        """Serves one plant after a sampled latency, or an error/malformed body."""
+
+        start_time = perf_counter()
+        plant_id = int(request.match_info["plant_id"])
+        config = self.config
+
+        roll = self.rng.random()
+        if roll < config.timeout_rate:
+            await asyncio.sleep(config.timeout_seconds)
+        else:
+            await asyncio.sleep(self.rng.lognormvariate(0, config.latency_sigma)
+                                * config.latency_median)
+
+        # Each outcome takes its own slice of the roll, so a timed out
+        # request is answered normally once the client has given up on it
+        malformed_below = config.timeout_rate + config.malformed_rate
+        if plant_id >= config.plants:
+            response = web.json_response(
+                {"error": NOT_FOUND_ERROR, "plant_id": plant_id}, status=404)
+        elif roll < config.timeout_rate:
+            response = web.json_response(make_plant_payload(plant_id, self.rng))
+        elif roll < malformed_below:
+            response = web.Response(text=MALFORMED_BODY, status=503,
+                                    content_type="text/html")
+        elif roll < malformed_below + config.error_rate:
+            response = web.json_response(
+                {"error": self.rng.choice(API_ERRORS), "plant_id": plant_id}, status=400)
+        else:
+            response = web.json_response(make_plant_payload(plant_id, self.rng))
+
+        self.request_log.append((plant_id, start_time, perf_counter()))
+        return response
+
+    def create_app(self) -> web.Application:
+        """Returns the aiohttp application for the mock API."""
+
+        app = web.Application()
+        app.router.add_get("/plants/{plant_id}", self.handle_plant)
+        return app
+
+
+def start_in_thread(api: MockPlantAPI, port: int) -> threading.Event:
+    """
+    Serves the mock API from a daemon thread with its own event loop.
+    Returns an event which stops the server when set.
+    """
+
+    stop_event = threading.Event()
+    started = threading.Event()
+
+    async def serve():
+        runner = web.AppRunner(api.create_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port, backlog=4096).start()
+        started.set()
+        while not stop_event.is_set():
+            await asyncio.sleep(0.1)
+        await runner.cleanup()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return stop_event
+
+
+def get_arguments():
+    """Parses the mock API behaviour from the command line."""
+
+    parser = ArgumentParser(description="Local stand-in for the plants API")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--plants", type=int, default=51)
+    parser.add_argument("--latency-median", type=float, default=0.05)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-seconds", type=float, default=15)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    mock_config = MockConfig(
+        plants=args.plants, latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate, timeout_seconds=args.timeout_seconds,
+        malformed_rate=args.malformed_rate, seed=args.seed)
+    web.run_app(MockPlantAPI(mock_config).create_app(),
+                host="127.0.0.1", port=args.port, backlog=4096)
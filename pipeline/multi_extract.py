@@ -1,36 +1,57 @@
 '''Script to extract the readings information for each plant and stores
 this in a pandas DataFrame.'''
 
+from os import environ, getpid
 from time import perf_counter
-from multiprocessing import Pool
+from multiprocessing import Pool, TimeoutError as PoolTimeoutError
+import atexit
 import requests
 
 import pandas as pd
 
+from http_client import get_plant, get_session_stats, record_worker_stats
+from plant_reading import PlantReading, readings_to_frame
+from plant_registry import get_plant_ids
 
-BASE_URL = 'https://data-eng-plants-api.herokuapp.com/plants/'
-MAX_PLANT_NUM = 51
 
+CYCLE_DEADLINE = float(environ.get("EXTRACT_DEADLINE", 45))
+DEADLINE_ERROR = 'reading missed cycle deadline'
+POOL_WORKERS = int(environ.get("EXTRACT_POOL_WORKERS", 4))
 
-def extract_changing_plant_details(plant_id: int) -> dict:
+
+def parse_changing_plant_details(plant_id: int, plant_details: dict) -> PlantReading:
+    """
+    Keeps only the transient fields of a plant API response,
+    flattening the botanist as the record is built.
+    """
+
+    botanist = plant_details.get("botanist")
+    if not isinstance(botanist, dict):
+        botanist = {}
+
+    return PlantReading(
+        plant_id=plant_id,
+        plant_name=plant_details.get("name"),
+        soil_moisture=plant_details.get("soil_moisture"),
+        temperature=plant_details.get("temperature"),
+        last_watered=plant_details.get("last_watered"),
+        recording_taken=plant_details.get("recording_taken"),
+        botanist_name=botanist.get("name"),
+        botanist_mobile=botanist.get("phone"),
+        botanist_email=botanist.get("email"),
+        error=plant_details.get("error"))
+
+
+def extract_changing_plant_details(plant_id: int) -> PlantReading | None:
     """
     Extracts only the necessary information for each plant reading
-    at a fixed point in time and stores this in a dictionary.
+    at a fixed point in time, or None if the request failed.
     """
 
+    plant_reading = None
     try:
-        plant_dict = {}
-        plant_details = requests.get(
-            BASE_URL+str(plant_id), timeout=10).json()
-        plant_dict["soil_moisture"] = plant_details.get("soil_moisture")
-        plant_dict["last_watered"] = plant_details.get("last_watered")
-        plant_dict["recording_taken"] = plant_details.get(
-            "recording_taken")
-        plant_dict["botanist"] = plant_details.get("botanist")
-        plant_dict["temperature"] = plant_details.get("temperature")
-        plant_dict["error"] = plant_details.get("error")
-        plant_dict["plant_id"] = plant_id
-        plant_dict["plant_name"] = plant_details.get("name")
+        plant_details = get_plant(plant_id).json()
+        plant_reading = parse_changing_plant_details(plant_id, plant_details)
     except requests.exceptions.JSONDecodeError as errj:
         print(plant_id, "Error, Plant not found: " + repr(errj))
     except requests.exceptions.HTTPError as errh:
@@ -43,24 +64,90 @@ def extract_changing_plant_details(plant_id: int) -> dict:
         print("An Unknown Error occurred: " + repr(err))
 
     print("Extracted plant information from API.")
-    return plant_dict
+    return plant_reading
 
 
-def extract_all_plant_details() -> pd.DataFrame:
+def missing_reading(plant_id: int) -> PlantReading:
+    """Returns the reading recorded for a plant that missed the cycle deadline."""
+
+    return PlantReading(plant_id=plant_id, error=DEADLINE_ERROR)
+
+
+def extract_plant_with_id(plant_id: int) -> tuple[int, PlantReading | None, int, dict]:
+    """Extracts a plant reading, keeping its id even if the request failed,
+    with the worker's pid and session stats for the parent to record."""
+
+    return plant_id, extract_changing_plant_details(plant_id), getpid(), get_session_stats()
+
+
+class ExtractPool:
+    """
+    Worker processes kept for the life of the process, so each worker's
+    keep-alive session outlives the cycle instead of the Pool, and its
+    connections, being rebuilt every cycle.
+    """
+
+    def __init__(self, workers: int = POOL_WORKERS):
+        self.workers = workers
+        self.pool = None
+
+    def get_pool(self) -> Pool:
+        """Returns the Pool, starting its workers on first use."""
+
+        if self.pool is None:
+            self.pool = Pool(self.workers)
+        return self.pool
+
+    def close(self) -> None:
+        """Stops the workers, if they were started."""
+
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+EXTRACT_POOL = ExtractPool()
+atexit.register(EXTRACT_POOL.close)
+
+
+def extract_all_plant_details(plant_ids: list[int] = None,
+                              deadline: float = CYCLE_DEADLINE,
+                              extract_pool: ExtractPool = None) -> pd.DataFrame:
     """
     Top level function which implements multiprocessing and returns a Data Frame
-    containing all plant details.
+    containing all plant details. Plants still outstanding after `deadline`
+    seconds are marked as missing rather than holding up the cycle.
     """
-    plants_list = []
+    plants = {}
+
+    if plant_ids is None:
+        plant_ids = get_plant_ids()
+    plant_ids = list(plant_ids)
+    if extract_pool is None:
+        extract_pool = EXTRACT_POOL
+    deadline_at = perf_counter() + deadline
+
+    # Implement multiprocessing, handing out one plant at a time so a
+    # hung plant only holds up its own worker, until its request times out
+    results = extract_pool.get_pool().imap_unordered(extract_plant_with_id, plant_ids)
+    try:
+        for _ in plant_ids:
+            plant_id, plant_reading, worker_pid, worker_stats = results.next(
+                timeout=max(deadline_at - perf_counter(), 0))
+            plants[plant_id] = plant_reading
+            record_worker_stats(worker_pid, worker_stats)
+    except PoolTimeoutError:
+        print(f"{len(plant_ids) - len(plants)} plants missed the cycle deadline.")
+        # The workers would go on to extract the expired plants in the next
+        # cycle, so they are stopped and started afresh on the next get_pool
+        extract_pool.close()
 
-    # Implement multiprocessing
-    with Pool(4) as p:
-        result_list = p.map(extract_changing_plant_details,
-                            range(MAX_PLANT_NUM))
-        plants_list.extend(result_list)
+    plants_list = [plants[plant_id] if plant_id in plants
+                   else missing_reading(plant_id) for plant_id in plant_ids]
 
     # Turn into data frame
-    return pd.DataFrame(plants_list)
+    return readings_to_frame(plants_list)
 
 
 if __name__ == '__main__':
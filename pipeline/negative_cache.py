@@ -0,0 +1,96 @@
+'''Script to remember which plants are returning steady-state API errors,
+so they can be skipped on later cycles with an exponential backoff
+that depends on the kind of error.'''
+
+import time
+
+import pandas as pd
+
+from multi_extract import DEADLINE_ERROR
+
+
+# (first backoff, maximum backoff) in seconds for each error class
+BACKOFF_SECONDS = {
+    'plant not found': (60 * 60, 24 * 60 * 60),
+    'plant sensor fault': (2 * 60, 30 * 60),
+    'plant on loan to another museum': (30 * 60, 12 * 60 * 60),
+}
+DEFAULT_BACKOFF_SECONDS = (5 * 60, 60 * 60)
+
+
+class NegativeCache:
+    """
+    Tracks the error class, consecutive error count and next re-probe time
+    of every plant whose last reading was an API error.
+    """
+
+    def __init__(self, backoff: dict = None):
+        self.backoff = BACKOFF_SECONDS if backoff is None else backoff
+        self.entries = {}
+        self.skipped_last_cycle = 0
+        self.skipped_total = 0
+
+    def get_backoff(self, error: str, failures: int) -> float:
+        """Returns the backoff after `failures` consecutive errors of a class."""
+
+        first, maximum = self.backoff.get(error, DEFAULT_BACKOFF_SECONDS)
+        return min(first * 2 ** (failures - 1), maximum)
+
+    def filter_plant_ids(self, plant_ids: list[int], now: float = None) -> list[int]:
+        """Returns the plant ids that are due to be polled, counting the skips."""
+
+        now = time.time() if now is None else now
+        due_ids = [plant_id for plant_id in plant_ids
+                   if plant_id not in self.entries
+                   or self.entries[plant_id]["retry_at"] <= now]
+
+        self.skipped_last_cycle = len(plant_ids) - len(due_ids)
+        self.skipped_total += self.skipped_last_cycle
+        return due_ids
+
+    def record_error(self, plant_id: int, error: str, now: float = None) -> None:
+        """Schedules the next re-probe of a plant that returned an error."""
+
+        now = time.time() if now is None else now
+        entry = self.entries.get(plant_id)
+        failures = entry["failures"] + 1 \
+            if entry is not None and entry["error"] == error else 1
+
+        self.entries[plant_id] = {
+            "error": error,
+            "failures": failures,
+            "retry_at": now + self.get_backoff(error, failures)
+        }
+
+    def record_readings(self, readings: pd.DataFrame, now: float = None) -> None:
+        """
+        Updates the cache from a cycle's extracted readings. Plants that
+        answered without an error are cleared; rows without a plant id
+        (failed requests) and plants that missed the cycle deadline are
+        transient and are not cached.
+        """
+
+        if readings.empty or "plant_id" not in readings.columns:
+            return
+
+        now = time.time() if now is None else now
+        readings = readings[readings["plant_id"].notnull()]
+        errors = readings["error"] if "error" in readings.columns \
+            else pd.Series(None, index=readings.index)
+
+        for plant_id, error in zip(readings["plant_id"].astype(int), errors):
+            if error == DEADLINE_ERROR:
+                continue
+            if pd.isnull(error):
+                self.entries.pop(plant_id, None)
+            else:
+                self.record_error(plant_id, error, now)
+
+    def get_stats(self) -> dict:
+        """Returns the skip counters and the number of plants backing off."""
+
+        return {
+            "cached_plants": len(self.entries),
+            "skipped_last_cycle": self.skipped_last_cycle,
+            "skipped_total": self.skipped_total
+        }
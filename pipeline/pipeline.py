@@ -1,46 +1,343 @@
 """Pipeline script which combines extract, transform, load"""
+from functools import partial
+from os import environ
+import asyncio
+import signal
+import threading
 import time
 from dotenv import load_dotenv
+import aiohttp
+import pandas as pd
 
 
-from multi_extract import extract_all_plant_details
-from transform_readings import clean_reading_data
-from load import get_database_connection, update_reading
+from async_extract import (extract_all_plant_details, stream_plant_details,
+                           cycle_latencies, cycle_stats, EXTRACT_SESSION)
+from http_client import get_connection_stats
+from transform_readings import (clean_reading_data, clean_reading_record,
+                                READING_COLUMNS, VALIDATION_RULES)
+from load import get_database_connection, update_reading, BOTANIST_CACHE
+from plant_registry import get_plant_ids, refresh_registry
+from negative_cache import NegativeCache
+from last_seen import LastSeenIndex
+from plant_reading import readings_to_frame
+from timestamps import LAST_WATERED_CACHE, RECORDING_TAKEN_CACHE
+from rolling_stats import RollingStats, MEASUREMENTS
+from background_writer import BackgroundWriter
+from spool import Spool, SpoolReplayer, SPOOL_DIR
+from metrics import (PipelineMetrics, CYCLE_SECONDS, METRICS_PORT, log_cycle,
+                     start_metrics_server)
 
+DISCOVERY_INTERVAL_CYCLES = int(environ.get("DISCOVERY_INTERVAL_CYCLES", 60))
+GAP_PROBE_CYCLES = int(environ.get("GAP_PROBE_CYCLES", 1440))
+PIPELINE_MODE = environ.get("PIPELINE_MODE", "batch")
+MICRO_BATCH_SIZE = int(environ.get("MICRO_BATCH_SIZE", 50))
+MICRO_BATCH_SECONDS = float(environ.get("MICRO_BATCH_SECONDS", 1))
+ROLLING_CHECKPOINT_CYCLES = int(environ.get("ROLLING_CHECKPOINT_CYCLES", 5))
+SPOOL_ENABLED = environ.get("SPOOL_ENABLED", "false").lower() == "true"
+# Set by SIGTERM, which ECS sends before stopping the task
+SHUTDOWN = threading.Event()
+
+
+def record_extract_metrics(metrics: PipelineMetrics, plants_df: pd.DataFrame) -> None:
+    """Records the rows and per-plant request latencies of an extract."""
+
+    metrics.count("rows_extracted", len(plants_df))
+    if "error" in plants_df.columns:
+        metrics.count("rows_errored", plants_df["error"].notnull().sum())
+    metrics.observe_latencies(cycle_latencies)
+    metrics.set_value("extract", dict(cycle_stats))
+    metrics.set_value("connections", get_connection_stats())
+
+
+def record_timestamp_cache_metrics(metrics: PipelineMetrics) -> None:
+    """Records how often timestamp strings were served from the parse cache."""
+
+    metrics.set_value("timestamp_cache", {
+        "last_watered": LAST_WATERED_CACHE.get_stats(),
+        "recording_taken": RECORDING_TAKEN_CACHE.get_stats()})
+
+
+def add_rolling_stats(metrics: PipelineMetrics, rolling_stats: RollingStats,
+                      readings: pd.DataFrame) -> pd.DataFrame:
+    """Updates the per-plant statistics, returning the readings with their
+    z-scores and anomaly flags, and records the anomalous plants."""
+
+    with metrics.time_stage("rolling_stats"):
+        readings = rolling_stats.update(readings)
+    metrics.count("rows_anomalous", rolling_stats.anomalies_last_cycle)
+
+    anomalous = readings[[f"{measurement}_anomaly" for measurement in MEASUREMENTS]].any(axis=1)
+    if anomalous.any():
+        metrics.set_value("anomalous_plants",
+                          metrics.cycle.get("anomalous_plants", [])
+                          + readings.loc[anomalous, "plant_id"].tolist())
+    return readings
+
+
+def load_readings(connection, readings: pd.DataFrame, spool: Spool = None) -> int:
+    """Loads the readings, through the write-ahead spool if there is one.
+    Returns the number of rows inserted."""
+
+    if spool is None:
+        return update_reading(connection, readings)
+    return spool.load(connection, readings, update_reading)
+
+
+def main(connection, plant_ids: list[int] = None,
+         error_cache: NegativeCache = None, last_seen: LastSeenIndex = None,
+         metrics: PipelineMetrics = None, rolling_stats: RollingStats = None,
+         writer: BackgroundWriter = None, spool: Spool = None) -> dict:
+    """Calls the pipeline functions, ensuring it is called every 60 seconds.
+    With a background writer, the load is queued for the writer's thread
+    instead of run here. Returns the cycle's metrics."""
+    if metrics is None:
+        metrics = PipelineMetrics()
+        metrics.start_cycle()
+
+    # Skip plants that are backing off after an API error
+    if error_cache is not None and plant_ids is not None:
+        plant_ids = error_cache.filter_plant_ids(plant_ids)
+        metrics.count("plants_skipped", error_cache.skipped_last_cycle)
 
-def main(connection):
-    """Calls the pipeline functions, ensuring it is called every 60 seconds"""
     # Extract
-    start_extract_time = time.time()
-    plants_df = extract_all_plant_details()
-    end_extract_time = time.time()
-    print(f"Extract time: {end_extract_time - start_extract_time}")
+    with metrics.time_stage("extract"):
+        plants_df = extract_all_plant_details(plant_ids)
+    record_extract_metrics(metrics, plants_df)
+
+    if error_cache is not None:
+        error_cache.record_readings(plants_df)
+
+    # Drop samples the API has not refreshed since the last poll
+    if last_seen is not None:
+        with metrics.time_stage("deduplicate"):
+            plants_df = last_seen.drop_unchanged_readings(plants_df)
+        metrics.count("rows_duplicate", last_seen.suppressed_last_cycle)
 
     # Transform
-    start_transform_time = time.time()
-    transformed_df = clean_reading_data(plants_df)
-    end_transform_time = time.time()
-    print(f"Transform time: {end_transform_time - start_transform_time}")
+    VALIDATION_RULES.start_cycle()
+    with metrics.time_stage("transform"):
+        transformed_df = clean_reading_data(plants_df)
+    metrics.count("rows_dropped_validation", len(plants_df) - len(transformed_df))
+    metrics.set_value("validation_rejections", VALIDATION_RULES.get_rejection_counts())
+    record_timestamp_cache_metrics(metrics)
+
+    # Running statistics and anomaly flags per plant
+    if rolling_stats is not None:
+        transformed_df = add_rolling_stats(metrics, rolling_stats, transformed_df)
 
     # Load
-    start_load_time = time.time()
-    update_reading(connection, transformed_df)
-    end_load_time = time.time()
-    print(f"Load time: {end_load_time - start_load_time}")
+    if writer is not None:
+        with metrics.time_stage("enqueue"):
+            writer.submit(transformed_df)
+        writer.report_cycle(metrics)
+        metrics.set_value("writer", writer.get_stats())
+    else:
+        with metrics.time_stage("load"):
+            metrics.count("rows_inserted", load_readings(connection, transformed_df, spool))
+    metrics.set_value("botanist_cache", BOTANIST_CACHE.get_stats())
+    if spool is not None:
+        metrics.set_value("spool", spool.get_stats())
+
+    return metrics.cycle
+
+
+async def flush_micro_batch(connection, batch: list[dict], metrics: PipelineMetrics,
+                            rolling_stats: RollingStats = None, spool: Spool = None) -> None:
+    """Loads a micro-batch of cleaned readings without blocking extraction."""
+
+    if batch:
+        batch_df = pd.DataFrame(batch, columns=READING_COLUMNS)
+        if rolling_stats is not None:
+            batch_df = add_rolling_stats(metrics, rolling_stats, batch_df)
+        with metrics.time_stage("load"):
+            inserted = await asyncio.to_thread(load_readings, connection, batch_df, spool)
+        metrics.count("rows_inserted", inserted)
+        metrics.set_value("botanist_cache", BOTANIST_CACHE.get_stats())
+        if spool is not None:
+            metrics.set_value("spool", spool.get_stats())
+
+
+async def stream_cycle(connection, plant_ids: list[int],
+                       error_cache: NegativeCache = None,
+                       last_seen: LastSeenIndex = None,
+                       metrics: PipelineMetrics = None,
+                       rolling_stats: RollingStats = None,
+                       spool: Spool = None,
+                       session: aiohttp.ClientSession = None) -> None:
+    """
+    Cleans each reading as soon as its API response arrives and loads
+    the cleaned readings in micro-batches of MICRO_BATCH_SIZE, or
+    every MICRO_BATCH_SECONDS, whichever comes first. A partial batch
+    is flushed on time even while no further response arrives.
+    """
+
+    if metrics is None:
+        metrics = PipelineMetrics()
+        metrics.start_cycle()
+
+    raw_readings = []
+    batch = []
+    loop = asyncio.get_running_loop()
+    flush_at = loop.time() + MICRO_BATCH_SECONDS
+    VALIDATION_RULES.start_cycle()
+    if last_seen is not None:
+        last_seen.start_cycle()
+
+    stream = stream_plant_details(plant_ids, session=session)
+    next_reading = asyncio.ensure_future(anext(stream))
+    try:
+        while True:
+            timeout = max(flush_at - loop.time(), 0) if batch else None
+            done, _ = await asyncio.wait({next_reading}, timeout=timeout)
+            if not done:
+                await flush_micro_batch(connection, batch, metrics, rolling_stats, spool)
+                batch = []
+                flush_at = loop.time() + MICRO_BATCH_SECONDS
+                continue
+
+            try:
+                _, reading = next_reading.result()
+            except StopAsyncIteration:
+                break
+            next_reading = asyncio.ensure_future(anext(stream))
+
+            raw_readings.append(reading)
+            if last_seen is not None and not last_seen.is_new_reading(reading):
+                continue
+
+            cleaned_reading = clean_reading_record(reading)
+            if cleaned_reading is not None:
+                batch.append(cleaned_reading)
+            elif reading is not None:
+                metrics.count("rows_dropped_validation", 1)
+
+            if len(batch) >= MICRO_BATCH_SIZE or loop.time() >= flush_at:
+                await flush_micro_batch(connection, batch, metrics, rolling_stats, spool)
+                batch = []
+                flush_at = loop.time() + MICRO_BATCH_SECONDS
+    finally:
+        next_reading.cancel()
+        await asyncio.gather(next_reading, return_exceptions=True)
+        await stream.aclose()
+
+    await flush_micro_batch(connection, batch, metrics, rolling_stats, spool)
+
+    plants_df = readings_to_frame(raw_readings)
+    record_extract_metrics(metrics, plants_df)
+    metrics.set_value("validation_rejections", VALIDATION_RULES.get_rejection_counts())
+    record_timestamp_cache_metrics(metrics)
+    if last_seen is not None:
+        metrics.count("rows_duplicate", last_seen.suppressed_last_cycle)
+    if error_cache is not None:
+        error_cache.record_readings(plants_df)
+
+
+def main_streaming(connection, plant_ids: list[int] = None,
+                   error_cache: NegativeCache = None,
+                   last_seen: LastSeenIndex = None,
+                   metrics: PipelineMetrics = None,
+                   rolling_stats: RollingStats = None,
+                   spool: Spool = None) -> dict:
+    """Streams readings from extract to load, instead of one stage at a time.
+    Returns the cycle's metrics."""
+    if metrics is None:
+        metrics = PipelineMetrics()
+        metrics.start_cycle()
+
+    if plant_ids is None:
+        plant_ids = get_plant_ids()
+
+    # Skip plants that are backing off after an API error
+    if error_cache is not None:
+        plant_ids = error_cache.filter_plant_ids(plant_ids)
+        metrics.count("plants_skipped", error_cache.skipped_last_cycle)
+
+    with metrics.time_stage("stream"):
+        # On the persistent loop, so the API connections outlive the cycle
+        EXTRACT_SESSION.run(stream_cycle, connection, plant_ids, error_cache,
+                            last_seen, metrics, rolling_stats, spool)
+
+    return metrics.cycle
+
+
+def get_next_start(previous_start: float, now: float,
+                   period: float = CYCLE_SECONDS) -> float:
+    """Returns the next start time on the fixed schedule of one cycle every
+    period seconds. Slots that have already passed are skipped rather than
+    run back to back, so readings stay evenly spaced."""
+
+    next_start = previous_start + period
+    if now > next_start:
+        next_start += ((now - next_start) // period + 1) * period
+    return next_start
+
+
+def request_shutdown(signal_number, _) -> None:
+    """Stops the main loop after the current cycle."""
+
+    print(f"Received signal {signal_number}, shutting down after this cycle.")
+    SHUTDOWN.set()
 
 
 if __name__ == "__main__":
 
     load_dotenv()
+    signal.signal(signal.SIGTERM, request_shutdown)
     db_connection = get_database_connection()
+    plant_error_cache = NegativeCache()
+    last_seen_index = LastSeenIndex()
+    last_seen_index.load_from_database(db_connection)
+    pipeline_metrics = PipelineMetrics()
+    plant_rolling_stats = RollingStats()
+    plant_rolling_stats.load()
+    if METRICS_PORT:
+        start_metrics_server(pipeline_metrics, int(METRICS_PORT))
+    cycle = 0
+
+    load_spool = None
+    if SPOOL_ENABLED:
+        load_spool = Spool()
+        spool_replayer = SpoolReplayer(load_spool, db_connection)
+        spool_replayer.start()
+        print(f"Spooling loads to {SPOOL_DIR}.")
+
+    if PIPELINE_MODE == "streaming":
+        run_cycle = partial(main_streaming, spool=load_spool)
+    elif PIPELINE_MODE == "concurrent":
+        background_writer = BackgroundWriter(
+            db_connection, load=partial(load_readings, spool=load_spool))
+        background_writer.start()
+        run_cycle = partial(main, writer=background_writer, spool=load_spool)
+    else:
+        run_cycle = partial(main, spool=load_spool)
+
+    registered_ids = []
+    start_time = time.time()
+    while not SHUTDOWN.is_set():
+        pipeline_metrics.start_cycle()
+        # Look for newly installed sensors every DISCOVERY_INTERVAL_CYCLES,
+        # and every cycle while discovery has not found any plants
+        reprobe_gaps = cycle % GAP_PROBE_CYCLES == 0 and cycle > 0
+        if not registered_ids or reprobe_gaps or cycle % DISCOVERY_INTERVAL_CYCLES == 0:
+            with pipeline_metrics.time_stage("discovery"):
+                registered_ids = refresh_registry(reprobe_gaps=reprobe_gaps)
+        cycle += 1
+        run_cycle(db_connection, registered_ids, plant_error_cache,
+                  last_seen_index, pipeline_metrics, plant_rolling_stats)
+        log_cycle(pipeline_metrics.end_cycle())
+        if cycle % ROLLING_CHECKPOINT_CYCLES == 0:
+            plant_rolling_stats.save()
 
-    while True:
-        start_time = time.time()
-        print(main(db_connection))
-        end_time = time.time()
+        if PIPELINE_MODE == "concurrent":
+            # Extract on a fixed schedule, as the load no longer delays it
+            start_time = get_next_start(start_time, time.time())
+        else:
+            # An overrunning cycle is followed straight away by the next
+            start_time = max(start_time + CYCLE_SECONDS, time.time())
+        SHUTDOWN.wait(max(0.0, start_time - time.time()))
 
-        elapsed_time = end_time - start_time
-        print(f"Total time: {elapsed_time} secs")
-        if elapsed_time > 60:
-            continue
-        time.sleep(60 - elapsed_time)
+    if PIPELINE_MODE == "concurrent":
+        background_writer.stop()
+    if SPOOL_ENABLED:
+        spool_replayer.stop()
+    plant_rolling_stats.save()
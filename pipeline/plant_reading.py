@@ -0,0 +1,56 @@
+'''Compact record for a single plant reading, and conversion of a cycle's
+readings straight into a typed pandas DataFrame.'''
+
+from dataclasses import dataclass, fields
+from operator import attrgetter
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(slots=True)
+class PlantReading:
+    """One plant's transient reading, with the botanist already flattened."""
+
+    plant_id: int
+    plant_name: str | None = None
+    soil_moisture: float | None = None
+    temperature: float | None = None
+    last_watered: str | None = None
+    recording_taken: str | None = None
+    botanist_name: str | None = None
+    botanist_mobile: str | None = None
+    botanist_email: str | None = None
+    error: str | None = None
+
+    def __reduce__(self):
+        # Pickle as a flat tuple of values rather than a field name -> value state
+        return (PlantReading, get_reading_values(self))
+
+
+READING_FIELDS = [field.name for field in fields(PlantReading)]
+get_reading_values = attrgetter(*READING_FIELDS)
+READING_DTYPES = {
+    'plant_id': np.int64,
+    'soil_moisture': np.float64,
+    'temperature': np.float64,
+}
+
+
+def readings_to_frame(readings: list[PlantReading]) -> pd.DataFrame:
+    """
+    Builds a DataFrame column by column with explicit dtypes, skipping
+    failed requests (None), instead of inferring it from a list of dicts.
+    """
+
+    readings = [reading for reading in readings if reading is not None]
+
+    columns = {}
+    for name in READING_FIELDS:
+        values = [getattr(reading, name) for reading in readings]
+        dtype = READING_DTYPES.get(name, object)
+        if dtype is np.float64:
+            values = [np.nan if value is None else value for value in values]
+        columns[name] = np.array(values, dtype=dtype)
+
+    return pd.DataFrame(columns, columns=READING_FIELDS)
@@ -0,0 +1,143 @@
+'''Script to discover which plant ids exist in the API and keep them in a
+small persisted registry, so each cycle only polls real plants.'''
+
+from concurrent.futures import ThreadPoolExecutor
+from os import environ, replace
+import json
+
+import requests
+
+from http_client import get_plant
+
+
+REGISTRY_PATH = environ.get("PLANT_REGISTRY_PATH", "plant_registry.json")
+MAX_CONSECUTIVE_MISSES = int(environ.get("DISCOVERY_MAX_MISSES", 10))
+DISCOVERY_WORKERS = int(environ.get("DISCOVERY_WORKERS", 16))
+NOT_FOUND_ERROR = 'plant not found'
+
+
+def probe_plant_id(plant_id: int) -> bool:
+    """
+    Returns True if the API knows the plant id. Plants reporting any error
+    other than 'plant not found' (sensor fault, on loan) still exist.
+    """
+
+    try:
+        plant_details = get_plant(plant_id).json()
+    except requests.exceptions.JSONDecodeError:
+        return False
+
+    return plant_details.get("error") != NOT_FOUND_ERROR
+
+
+def probe_plant_ids(plant_ids: range | list[int], probe) -> set[int]:
+    """Probes a block of plant ids concurrently and returns those that exist."""
+
+    if not plant_ids:
+        return set()
+
+    with ThreadPoolExecutor(DISCOVERY_WORKERS) as executor:
+        hits = executor.map(probe, plant_ids)
+        return {plant_id for plant_id, hit in zip(plant_ids, hits) if hit}
+
+
+def discover_plant_ids(known_ids: set[int], probe=probe_plant_id,
+                       max_misses: int = MAX_CONSECUTIVE_MISSES) -> set[int]:
+    """
+    Gallops past the highest known plant id, doubling the step while plants
+    keep answering, and stops after max_misses consecutive misses at offsets
+    1, 2, 4, ... from the last plant found. Ids skipped over by a successful
+    gallop are probed concurrently before being added.
+    """
+
+    found = set(known_ids)
+    frontier = max(found) if found else -1
+    offset = 1
+    misses = 0
+
+    while misses < max_misses:
+        candidate = frontier + offset
+
+        if probe(candidate):
+            found.add(candidate)
+            found.update(probe_plant_ids(range(frontier + 1, candidate), probe))
+            frontier = candidate
+            offset *= 2
+            misses = 0
+        elif offset > 2 ** misses:
+            # Overshot the end of a run of plants, restart from the frontier
+            offset = 1
+        else:
+            misses += 1
+            offset *= 2
+
+    return found
+
+
+def probe_gaps(known_ids: set[int], probe=probe_plant_id) -> set[int]:
+    """
+    Re-probes the unregistered ids below the highest known plant, as a
+    plant that was missing or briefly not found when it was passed over
+    would otherwise never be polled. Returns those that now exist.
+    """
+
+    if not known_ids:
+        return set()
+    return probe_plant_ids([plant_id for plant_id in range(max(known_ids))
+                            if plant_id not in known_ids], probe)
+
+
+def load_registry(path: str = REGISTRY_PATH) -> set[int]:
+    """Returns the known plant ids, or an empty set if nothing is stored yet."""
+
+    try:
+        with open(path, encoding="utf-8") as registry_file:
+            return set(json.load(registry_file)["plant_ids"])
+    except FileNotFoundError:
+        return set()
+
+
+def save_registry(plant_ids: set[int], path: str = REGISTRY_PATH) -> None:
+    """Atomically writes the known plant ids to the registry file."""
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as registry_file:
+        json.dump({"plant_ids": sorted(plant_ids)}, registry_file)
+    replace(temp_path, path)
+
+
+def refresh_registry(path: str = REGISTRY_PATH, probe=probe_plant_id,
+                     reprobe_gaps: bool = False) -> list[int]:
+    """
+    Runs discovery from the stored registry and saves any new plants,
+    re-probing the gaps between known plants if reprobe_gaps is set.
+    If the API cannot be reached the stored registry is kept as it is.
+    """
+
+    known_ids = load_registry(path)
+    try:
+        plant_ids = discover_plant_ids(known_ids, probe)
+        if reprobe_gaps:
+            plant_ids |= probe_gaps(plant_ids, probe)
+    except requests.exceptions.RequestException as err:
+        print("Plant discovery failed, keeping registry: " + repr(err))
+        return sorted(known_ids)
+
+    if plant_ids != known_ids:
+        save_registry(plant_ids, path)
+        print(f"Discovered {len(plant_ids - known_ids)} new plants.")
+
+    return sorted(plant_ids)
+
+
+def get_plant_ids(path: str = REGISTRY_PATH) -> list[int]:
+    """Returns the registered plant ids, running discovery on first use."""
+
+    plant_ids = load_registry(path)
+    if not plant_ids:
+        return refresh_registry(path)
+    return sorted(plant_ids)
+
+
+if __name__ == '__main__':
+    print(refresh_registry())
@@ -0,0 +1,137 @@
+'''Snapshot of the raw plant API payloads for seeding the static tables.
+Each plant is fetched once, concurrently, and its JSON is kept on disk in
+SNAPSHOT_DIR with a manifest of content hashes, so every seeding step
+reads the same payloads and reruns do not sweep the API again.'''
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from hashlib import sha256
+from os import environ, makedirs, path, replace
+import json
+
+import requests
+
+from http_client import get_plant
+from plant_registry import get_plant_ids
+
+
+SNAPSHOT_DIR = environ.get("PLANT_SNAPSHOT_DIR", "plant_snapshot")
+SNAPSHOT_WORKERS = int(environ.get("PLANT_SNAPSHOT_WORKERS", 16))
+SNAPSHOT_REFRESH = environ.get("PLANT_SNAPSHOT_REFRESH", "false").lower() == "true"
+MANIFEST_NAME = "manifest.json"
+
+
+def fetch_payload(plant_id: int) -> bytes | None:
+    """Returns the raw JSON the API serves for a plant, or None if the
+    response is not JSON."""
+
+    response = get_plant(plant_id)
+    try:
+        response.json()
+    except requests.exceptions.JSONDecodeError:
+        return None
+    return response.content
+
+
+def write_atomically(file_path: str, content: bytes) -> None:
+    """Writes a file through a temporary file, so readers never see half of it."""
+
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "wb") as snapshot_file:
+        snapshot_file.write(content)
+    replace(temp_path, file_path)
+
+
+class PlantSnapshot:
+    """The cached payload of each plant, keyed by plant_id, with its sha256."""
+
+    def __init__(self, snapshot_dir: str = SNAPSHOT_DIR):
+        self.snapshot_dir = snapshot_dir
+        self.hashes = {}
+        self.taken_at = None
+        manifest_path = path.join(snapshot_dir, MANIFEST_NAME)
+        if path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+            self.hashes = {int(plant_id): digest
+                           for plant_id, digest in manifest["sha256"].items()}
+            self.taken_at = manifest["taken_at"]
+
+    def get_payload_path(self, plant_id: int) -> str:
+        """Returns the path of a plant's cached payload."""
+
+        return path.join(self.snapshot_dir, f"{plant_id}.json")
+
+    def read_payload(self, plant_id: int) -> bytes | None:
+        """Returns a plant's cached payload, or None if it is missing or
+        does not match its hash."""
+
+        try:
+            with open(self.get_payload_path(plant_id), "rb") as payload_file:
+                payload = payload_file.read()
+        except FileNotFoundError:
+            return None
+        if sha256(payload).hexdigest() != self.hashes.get(plant_id):
+            print(f"Snapshot of plant {plant_id} does not match its hash.")
+            return None
+        return payload
+
+    def update(self, plant_ids: list[int], fetch=fetch_payload,
+               workers: int = SNAPSHOT_WORKERS, refresh: bool = SNAPSHOT_REFRESH) -> dict:
+        """
+        Fetches the plants missing from the snapshot, or every plant if
+        refresh, and saves the payloads and manifest. Returns how many
+        payloads were fetched, and how many of those were new or changed.
+        """
+
+        to_fetch = [plant_id for plant_id in plant_ids
+                    if refresh or self.read_payload(plant_id) is None]
+        with ThreadPoolExecutor(workers) as executor:
+            payloads = list(executor.map(fetch, to_fetch))
+
+        makedirs(self.snapshot_dir, exist_ok=True)
+        changed = 0
+        for plant_id, payload in zip(to_fetch, payloads):
+            if payload is None:
+                print(plant_id, "plant not found")
+                continue
+            digest = sha256(payload).hexdigest()
+            # Written even if unchanged, as the cached file may be damaged
+            write_atomically(self.get_payload_path(plant_id), payload)
+            changed += digest != self.hashes.get(plant_id)
+            self.hashes[plant_id] = digest
+
+        if to_fetch:
+            self.taken_at = datetime.now(timezone.utc).isoformat()
+            manifest = {"taken_at": self.taken_at,
+                        "sha256": {str(plant_id): digest
+                                   for plant_id, digest in sorted(self.hashes.items())}}
+            write_atomically(path.join(self.snapshot_dir, MANIFEST_NAME),
+                             json.dumps(manifest, indent=2).encode("utf-8"))
+        return {"fetched": len(to_fetch), "changed": changed}
+
+    def get_payloads(self, plant_ids: list[int] = None) -> dict[int, dict]:
+        """Returns the decoded payload of each plant in the snapshot, or of
+        the given plants, in plant_id order."""
+
+        if plant_ids is None:
+            plant_ids = sorted(self.hashes)
+        payloads = {}
+        for plant_id in plant_ids:
+            payload = self.read_payload(plant_id)
+            if payload is not None:
+                payloads[plant_id] = json.loads(payload)
+        return payloads
+
+
+def get_plant_payloads(plant_ids: list[int] = None, snapshot_dir: str = SNAPSHOT_DIR,
+                       fetch=fetch_payload) -> dict[int, dict]:
+    """Returns every plant's payload, fetching only plants not yet in the snapshot."""
+
+    if plant_ids is None:
+        plant_ids = get_plant_ids()
+    snapshot = PlantSnapshot(snapshot_dir)
+    counts = snapshot.update(plant_ids, fetch)
+    print(f"Plant snapshot: fetched {counts['fetched']} payloads, "
+          f"{counts['changed']} new or changed.")
+    return snapshot.get_payloads(plant_ids)
@@ -0,0 +1,82 @@
+'''Read queries on s_gamma.reading, shared by the pipeline, the nightly S3
+export and the dashboard. Time filters are half-open ranges on the raw
+recording_taken column (start <= recording_taken < end), never functions
+of it, so SQL Server can seek the recording_taken indexes instead of
+converting and scanning every row.'''
+
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+from sqlalchemy import sql
+
+
+READING_COLUMNS = ("reading_id", "plant_id", "botanist_id", "soil_moisture",
+                   "temperature", "recording_taken", "last_watered")
+
+
+def get_day_range(day: date) -> tuple[datetime, datetime]:
+    """Returns the half-open range [midnight, next midnight) of a day."""
+
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def build_readings_query(plant_ids: list[int] = None,
+                         bounded: bool = True) -> sql.expression.TextClause:
+    """Returns the query for readings in [:start, :end), or from :start on if
+    not bounded, optionally of some plants."""
+
+    end_filter = "AND recording_taken < :end" if bounded else ""
+    plant_filter = "AND plant_id IN :plant_ids" if plant_ids is not None else ""
+    query = sql.text(
+        f"""SELECT {', '.join(READING_COLUMNS)} FROM s_gamma.reading
+        WHERE recording_taken >= :start {end_filter}
+        {plant_filter};""")
+    if plant_ids is not None:
+        query = query.bindparams(sql.bindparam("plant_ids", expanding=True))
+    return query
+
+
+def get_readings(conn, start: datetime, end: datetime = None,
+                 plant_ids: list[int] = None) -> pd.DataFrame:
+    """Returns the readings recorded from start up to, but not including,
+    end, or every reading from start on if end is None."""
+
+    parameters = {"start": start}
+    if end is not None:
+        parameters["end"] = end
+    if plant_ids is not None:
+        parameters["plant_ids"] = list(plant_ids)
+    query = build_readings_query(plant_ids, bounded=end is not None)
+    rows = conn.execute(query, parameters).fetchall()
+    return pd.DataFrame(rows, columns=list(READING_COLUMNS))
+
+
+def get_readings_for_day(conn, day: date) -> pd.DataFrame:
+    """Returns the readings recorded on a day."""
+
+    return get_readings(conn, *get_day_range(day))
+
+
+def get_readings_since(conn, start: datetime, end: datetime = None) -> pd.DataFrame:
+    """Returns the readings recorded from start until end. Without an end the
+    range is open, so readings stamped ahead of this machine's clock, e.g.
+    in the API's local time, are still returned."""
+
+    return get_readings(conn, start, end)
+
+
+def get_latest_recordings(conn) -> list[tuple]:
+    """Returns each plant's latest recording_taken, read from the
+    (plant_id, recording_taken) index."""
+
+    return conn.execute(sql.text(
+        """SELECT plant_id, MAX(recording_taken) FROM s_gamma.reading
+        GROUP BY plant_id;""")).fetchall()
+
+
+def delete_readings_before(conn, end: datetime) -> int:
+    """Deletes the readings recorded before end, returning how many."""
+
+    return conn.execute(sql.text(
+        "DELETE FROM s_gamma.reading WHERE recording_taken < :end;"), {"end": end}).rowcount
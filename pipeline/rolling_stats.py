@@ -0,0 +1,185 @@
+'''Running per-plant statistics kept between the transform and the load, so
+plants drifting dry or overheating can be flagged without querying the
+reading table. For each measurement every plant has an exponentially
+weighted mean and variance, updated in O(1) per reading, and a ring
+buffer of its last ROLLING_WINDOW readings for the sliding min/max. The
+state lives in numpy arrays indexed by plant_id and is checkpointed to
+ROLLING_STATS_PATH so a restart carries on where it left off.'''
+
+from os import environ, path, replace
+
+import numpy as np
+import pandas as pd
+
+
+ROLLING_STATS_PATH = environ.get("ROLLING_STATS_PATH", "rolling_stats.npz")
+EWMA_ALPHA = float(environ.get("ROLLING_EWMA_ALPHA", 0.05))
+ROLLING_WINDOW = int(environ.get("ROLLING_WINDOW", 60))
+ANOMALY_Z_SCORE = float(environ.get("ANOMALY_Z_SCORE", 4))
+# Readings needed before a plant's statistics are trusted to flag anomalies
+MIN_ANOMALY_SAMPLES = 30
+MEASUREMENTS = ("soil_moisture", "temperature")
+INITIAL_CAPACITY = 64
+
+
+def grow_array(name: str, values: np.ndarray, capacity: int) -> np.ndarray:
+    """Returns the state array padded to capacity rows, with empty windows as NaN."""
+
+    fill = np.nan if name.endswith("_window") else 0
+    grown = np.full((capacity, *values.shape[1:]), fill, dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+class RollingStats:
+    """Per-plant EWMA mean/variance and sliding-window min/max for each measurement."""
+
+    def __init__(self, alpha: float = EWMA_ALPHA, window: int = ROLLING_WINDOW,
+                 z_score_threshold: float = ANOMALY_Z_SCORE,
+                 min_samples: int = MIN_ANOMALY_SAMPLES):
+        self.alpha = alpha
+        self.window = window
+        self.z_score_threshold = z_score_threshold
+        self.min_samples = min_samples
+        self.state = {}
+        for measurement in MEASUREMENTS:
+            self.state[f"{measurement}_mean"] = np.zeros(INITIAL_CAPACITY)
+            self.state[f"{measurement}_variance"] = np.zeros(INITIAL_CAPACITY)
+            self.state[f"{measurement}_count"] = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+            self.state[f"{measurement}_window"] = np.full((INITIAL_CAPACITY, window), np.nan)
+        self.anomalies_last_cycle = 0
+
+    @property
+    def capacity(self) -> int:
+        """Returns the number of plant ids the arrays can currently hold."""
+
+        return len(self.state[f"{MEASUREMENTS[0]}_mean"])
+
+    def ensure_capacity(self, plant_count: int) -> None:
+        """Grows every array by doubling until plant ids below plant_count fit."""
+
+        if plant_count <= self.capacity:
+            return
+
+        new_capacity = self.capacity
+        while new_capacity < plant_count:
+            new_capacity *= 2
+        for name, values in self.state.items():
+            self.state[name] = grow_array(name, values, new_capacity)
+
+    def update_measurement(self, measurement: str, plant_ids: np.ndarray,
+                           values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Adds one reading for each of the (distinct) plants and returns the
+        readings' z-scores against the plants' statistics before the update,
+        and whether each is an anomaly.
+        """
+
+        mean = self.state[f"{measurement}_mean"]
+        variance = self.state[f"{measurement}_variance"]
+        count = self.state[f"{measurement}_count"]
+        window = self.state[f"{measurement}_window"]
+
+        previous_mean = mean[plant_ids]
+        previous_variance = variance[plant_ids]
+        previous_count = count[plant_ids]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z_scores = (values - previous_mean) / np.sqrt(previous_variance)
+        z_scores[(previous_count < 2) | (previous_variance == 0)] = np.nan
+        anomalies = (previous_count >= self.min_samples) \
+            & (np.abs(z_scores) > self.z_score_threshold)
+
+        # Incremental EWMA mean and variance; the first reading seeds the mean
+        difference = np.where(previous_count == 0, 0, values - previous_mean)
+        increment = self.alpha * difference
+        mean[plant_ids] = np.where(previous_count == 0, values, previous_mean + increment)
+        variance[plant_ids] = (1 - self.alpha) * (previous_variance + difference * increment)
+        window[plant_ids, previous_count % self.window] = values
+        count[plant_ids] = previous_count + 1
+
+        return z_scores, anomalies
+
+    def update(self, readings: pd.DataFrame) -> pd.DataFrame:
+        """
+        Updates the statistics with the readings and returns them with a
+        z-score and anomaly flag column per measurement. Readings of the same
+        plant are applied in order, one round of distinct plants at a time.
+        """
+
+        plant_ids = readings['plant_id'].to_numpy(dtype=float, na_value=np.nan)
+        known = ~np.isnan(plant_ids) & (plant_ids >= 0)
+        plant_ids = np.where(known, plant_ids, -1).astype(np.intp)
+        self.ensure_capacity(int(plant_ids.max(initial=-1)) + 1)
+
+        # Rank of each reading among its plant's readings in this frame
+        occurrence = pd.Series(plant_ids).groupby(plant_ids).cumcount().to_numpy()
+        order = np.argsort(occurrence, kind="stable")
+        round_starts = np.searchsorted(occurrence[order], np.arange(occurrence.max(initial=0) + 2))
+
+        columns = {}
+        self.anomalies_last_cycle = 0
+        for measurement in MEASUREMENTS:
+            values = readings[measurement].to_numpy(dtype=float, na_value=np.nan)
+            z_scores = np.full(len(readings), np.nan)
+            anomalies = np.zeros(len(readings), dtype=bool)
+
+            for start, end in zip(round_starts[:-1], round_starts[1:]):
+                rows = order[start:end]
+                rows = rows[known[rows] & ~np.isnan(values[rows])]
+                z_scores[rows], anomalies[rows] = self.update_measurement(
+                    measurement, plant_ids[rows], values[rows])
+
+            columns[f"{measurement}_z_score"] = np.round(z_scores, 2)
+            columns[f"{measurement}_anomaly"] = anomalies
+            self.anomalies_last_cycle += int(anomalies.sum())
+
+        return readings.assign(**columns)
+
+    def get_plant_stats(self, plant_id: int) -> dict:
+        """Returns a plant's current mean, standard deviation and window min/max."""
+
+        stats = {}
+        for measurement in MEASUREMENTS:
+            count = int(self.state[f"{measurement}_count"][plant_id]) \
+                if plant_id < self.capacity else 0
+            if not count:
+                continue
+            window = self.state[f"{measurement}_window"][plant_id]
+            stats[measurement] = {
+                "count": count,
+                "mean": float(self.state[f"{measurement}_mean"][plant_id]),
+                "std": float(np.sqrt(self.state[f"{measurement}_variance"][plant_id])),
+                "window_min": float(np.nanmin(window)),
+                "window_max": float(np.nanmax(window))
+            }
+        return stats
+
+    def save(self, stats_path: str = ROLLING_STATS_PATH) -> None:
+        """Atomically writes the statistics to a checkpoint file."""
+
+        temp_path = stats_path + ".tmp"
+        with open(temp_path, "wb") as stats_file:
+            np.savez(stats_file, alpha=self.alpha, window=self.window, **self.state)
+        replace(temp_path, stats_path)
+
+    def load(self, stats_path: str = ROLLING_STATS_PATH) -> None:
+        """
+        Restores the statistics from a checkpoint, if there is one. Windows
+        are dropped if ROLLING_WINDOW has changed since it was written, but
+        the means and variances are kept.
+        """
+
+        if not path.exists(stats_path):
+            return
+
+        with np.load(stats_path) as checkpoint:
+            for name in self.state:
+                if name.endswith("_window") and int(checkpoint["window"]) != self.window:
+                    continue
+                self.state[name] = checkpoint[name]
+
+        # Windows dropped above are still at the initial capacity
+        capacity = max(len(values) for values in self.state.values())
+        for name, values in self.state.items():
+            self.state[name] = grow_array(name, values, capacity)
+        print(f"Loaded rolling statistics for {capacity} plant ids from {stats_path}.")
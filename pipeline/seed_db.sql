@@ -107,6 +107,39 @@ GO
 -- ALTER TABLE s_gamma.reading ALTER COLUMN last_watered datetime2(6);
 -- GO
 
+-- keep only the first stored copy of each reading, as databases loaded
+-- before the unique index below may hold retried samples more than once
+WITH duplicate_reading AS (
+    SELECT ROW_NUMBER() OVER (
+        PARTITION BY plant_id, recording_taken ORDER BY reading_id) AS copy_number
+    FROM s_gamma.reading
+    WHERE plant_id IS NOT NULL AND recording_taken IS NOT NULL
+)
+DELETE FROM duplicate_reading WHERE copy_number > 1;
+GO
+
+-- natural key of a reading, so retried loads cannot store a sample twice
+CREATE UNIQUE INDEX ux_reading_plant_recording
+    ON s_gamma.reading (plant_id, recording_taken)
+    WHERE plant_id IS NOT NULL AND recording_taken IS NOT NULL;
+GO
+
+-- covering indexes for the reading queries in reading_queries.py: per-plant
+-- history and latest readings, and time ranges across all plants
+CREATE INDEX ix_reading_plant_recording
+    ON s_gamma.reading (plant_id, recording_taken)
+    INCLUDE (botanist_id, soil_moisture, temperature, last_watered);
+GO
+
+CREATE INDEX ix_reading_recording
+    ON s_gamma.reading (recording_taken)
+    INCLUDE (plant_id, botanist_id, soil_moisture, temperature, last_watered);
+GO
+
+-- botanist id lookups by name in the load
+CREATE INDEX ix_botanist_name ON s_gamma.botanist (botanist_name);
+GO
+
 -- Sample inserts so other parts of pipeline can be tested
 INSERT INTO s_gamma.botanist VALUES ('Carl Linnaeus', '(146)994-1635x35992', 'carl.linnaeus@lnhm.co.uk') -- plant 0
 INSERT INTO s_gamma.botanist VALUES ('Gertrude Jekyll', '001-481-273-3691x127', 'gertrude.jekyll@lnhm.co.uk') -- plant 1
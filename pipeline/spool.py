@@ -0,0 +1,399 @@
+'''Local write-ahead spool for the load. Every batch is written to a segment
+file in SPOOL_DIR before the database write is attempted, and the segment
+is deleted once the write succeeds. If the database is down the segment
+stays, later batches are spooled without trying the database, and a
+background replayer drains the spool in large upsert batches once the
+database is back. Readings are therefore neither lost nor left waiting
+on a database that is not answering.
+
+A segment is a sequence of records, each a (length, crc32) header and a
+columnar batch: fixed-width numpy columns, and string columns as their
+distinct values plus int32 codes. A record cut short by a crash fails
+its length or checksum and is ignored. A segment that cannot be decoded,
+e.g. one written by another version, is moved to UNREADABLE_DIR rather
+than retried forever, as is one the database keeps rejecting on its own.'''
+
+from functools import partial
+from os import environ, fsync, listdir, makedirs, path, remove, rename
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+
+from load import update_reading
+
+
+SPOOL_DIR = environ.get("SPOOL_DIR", "spool")
+SPOOL_MAX_BYTES = int(environ.get("SPOOL_MAX_BYTES", 100_000_000))
+SPOOL_REPLAY_ROWS = int(environ.get("SPOOL_REPLAY_ROWS", 10_000))
+SPOOL_REPLAY_SECONDS = float(environ.get("SPOOL_REPLAY_SECONDS", 10))
+
+RECORD_HEADER = struct.Struct("<II")
+BATCH_HEADER = struct.Struct("<4sHI")
+MAGIC = b"RDSP"
+VERSION = 1
+# The columns the load needs, with how each is packed
+SPOOL_COLUMNS = {
+    "plant_id": "<i8",
+    "soil_moisture": "<f8",
+    "temperature": "<f8",
+    "last_watered": "datetime",
+    "recording_taken": "datetime",
+    "botanist_name": "string",
+    "botanist_mobile": "string",
+    "botanist_email": "string"
+}
+PENDING_SUFFIX = ".pending"
+SEGMENT_SUFFIX = ".spool"
+# Set aside within the spool directory, for inspection
+UNREADABLE_DIR = "unreadable"
+# Raised by decode_batch for a record it cannot unpack
+DECODE_ERRORS = (ValueError, struct.error)
+# Errors caused by the readings themselves, which retrying will not fix
+DATA_ERRORS = (DataError, IntegrityError)
+SPOOL_MAX_REPLAY_ATTEMPTS = int(environ.get("SPOOL_MAX_REPLAY_ATTEMPTS", 3))
+
+
+def encode_strings(values: pd.Series) -> bytes:
+    """Packs a string column as its distinct values followed by int32 codes."""
+
+    codes, uniques = pd.factorize(values.astype(object))
+    encoded = [value.encode("utf-8") for value in uniques]
+    parts = [struct.pack("<I", len(encoded))]
+    for value in encoded:
+        parts.append(struct.pack("<I", len(value)))
+        parts.append(value)
+    parts.append(codes.astype("<i4").tobytes())
+    return b"".join(parts)
+
+
+def decode_strings(payload: memoryview, offset: int, rows: int) -> tuple[np.ndarray, int]:
+    """Unpacks a string column, returning it with missing values as None
+    and the offset after it."""
+
+    (unique_count,) = struct.unpack_from("<I", payload, offset)
+    offset += 4
+    uniques = []
+    for _ in range(unique_count):
+        (length,) = struct.unpack_from("<I", payload, offset)
+        offset += 4
+        uniques.append(bytes(payload[offset:offset + length]).decode("utf-8"))
+        offset += length
+    codes = np.frombuffer(payload, dtype="<i4", count=rows, offset=offset)
+    # Code -1 (missing) indexes the appended None
+    values = np.array(uniques + [None], dtype=object)[codes]
+    return values, offset + 4 * rows
+
+
+def encode_batch(batch: pd.DataFrame) -> bytes:
+    """Packs the load columns of a batch of readings into one record payload."""
+
+    parts = [BATCH_HEADER.pack(MAGIC, VERSION, len(batch))]
+    for column, kind in SPOOL_COLUMNS.items():
+        values = batch[column] if column in batch else pd.Series([None] * len(batch))
+        if kind == "string":
+            parts.append(encode_strings(values))
+        elif kind == "datetime":
+            parts.append(np.asarray(pd.to_datetime(values), dtype="datetime64[ns]")
+                         .view("<i8").tobytes())
+        elif kind == "<f8":
+            parts.append(values.to_numpy(dtype=kind, na_value=np.nan).tobytes())
+        else:
+            parts.append(values.to_numpy(dtype=kind).tobytes())
+    return b"".join(parts)
+
+
+def decode_batch(payload: bytes) -> pd.DataFrame:
+    """Unpacks a record payload into a frame of readings ready to load."""
+
+    payload = memoryview(payload)
+    magic, version, rows = BATCH_HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unknown spool record format: {magic!r} version {version}")
+
+    offset = BATCH_HEADER.size
+    columns = {}
+    for column, kind in SPOOL_COLUMNS.items():
+        if kind == "string":
+            columns[column], offset = decode_strings(payload, offset, rows)
+            continue
+        values = np.frombuffer(payload, dtype="<i8" if kind == "datetime" else kind,
+                               count=rows, offset=offset)
+        columns[column] = values.view("datetime64[ns]") if kind == "datetime" else values
+        offset += 8 * rows
+
+    readings = pd.DataFrame(columns)
+    readings["error"] = None
+    return readings
+
+
+def write_segment(segment_path: str, batch: pd.DataFrame) -> int:
+    """Durably writes a batch as a one-record segment, returning its size in bytes."""
+
+    payload = encode_batch(batch)
+    with open(segment_path, "wb") as segment_file:
+        segment_file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        segment_file.write(payload)
+        segment_file.flush()
+        fsync(segment_file.fileno())
+    return RECORD_HEADER.size + len(payload)
+
+
+def read_segment(segment_path: str) -> list[pd.DataFrame]:
+    """Returns the batches in a segment, stopping at a torn or corrupt record."""
+
+    with open(segment_path, "rb") as segment_file:
+        data = segment_file.read()
+
+    batches = []
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, checksum = RECORD_HEADER.unpack_from(data, offset)
+        payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            print(f"Ignored a damaged record at byte {offset} of {segment_path}.")
+            break
+        batches.append(decode_batch(payload))
+        offset += RECORD_HEADER.size + length
+    return batches
+
+
+class Spool:
+    """Segment files of batches not yet confirmed written to the database."""
+
+    def __init__(self, directory: str = SPOOL_DIR, max_bytes: int = SPOOL_MAX_BYTES,
+                 replay_rows: int = SPOOL_REPLAY_ROWS,
+                 max_replay_attempts: int = SPOOL_MAX_REPLAY_ATTEMPTS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.replay_rows = replay_rows
+        self.max_replay_attempts = max_replay_attempts
+        # Data errors per segment, until the segment loads or is set aside
+        self.replay_failures = {}
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.rows_spooled = 0
+        self.rows_replayed = 0
+        self.rows_evicted = 0
+        self.segments_unreadable = 0
+        self.replay_seconds = 0.0
+        self.last_replay_error = None
+        makedirs(directory, exist_ok=True)
+        self.recover()
+
+    def recover(self) -> None:
+        """Queues segments left pending by a crash for replay, as their write
+        may not have committed."""
+
+        for name in listdir(self.directory):
+            if name.endswith(PENDING_SUFFIX):
+                pending_path = path.join(self.directory, name)
+                rename(pending_path, pending_path[:-len(PENDING_SUFFIX)] + SEGMENT_SUFFIX)
+
+    def get_segments(self) -> list[str]:
+        """Returns the paths of the segments awaiting replay, oldest first."""
+
+        return sorted(path.join(self.directory, name) for name in listdir(self.directory)
+                      if name.endswith(SEGMENT_SUFFIX))
+
+    def get_size(self) -> int:
+        """Returns the bytes used by every segment in the spool."""
+
+        return sum(path.getsize(path.join(self.directory, name))
+                   for name in listdir(self.directory)
+                   if path.isfile(path.join(self.directory, name)))
+
+    def append(self, batch: pd.DataFrame) -> str:
+        """Writes a batch to a new pending segment and returns its path."""
+
+        with self.lock:
+            self.sequence += 1
+            segment_path = path.join(self.directory,
+                                     f"{time.time_ns():020d}-{self.sequence:06d}{PENDING_SUFFIX}")
+            write_segment(segment_path, batch)
+            self.rows_spooled += len(batch)
+        return segment_path
+
+    def acknowledge(self, segment_path: str) -> None:
+        """Deletes a pending segment once its batch is in the database."""
+
+        remove(segment_path)
+
+    def release(self, segment_path: str) -> None:
+        """Hands a pending segment to the replayer, then evicts the oldest
+        segments if the spool is over max_bytes."""
+
+        with self.lock:
+            rename(segment_path, segment_path[:-len(PENDING_SUFFIX)] + SEGMENT_SUFFIX)
+            segments = self.get_segments()
+            size = self.get_size()
+            while size > self.max_bytes and len(segments) > 1:
+                oldest = segments.pop(0)
+                size -= path.getsize(oldest)
+                try:
+                    self.rows_evicted += sum(len(batch) for batch in read_segment(oldest))
+                except DECODE_ERRORS:
+                    print(f"Could not count the readings in {oldest}.")
+                remove(oldest)
+                print(f"Spool over {self.max_bytes} bytes, dropped {oldest}.")
+
+    def set_aside(self, segment_path: str, error: Exception) -> None:
+        """Moves a segment that cannot be decoded or loaded out of the replay queue."""
+
+        unreadable_dir = path.join(self.directory, UNREADABLE_DIR)
+        makedirs(unreadable_dir, exist_ok=True)
+        rename(segment_path, path.join(unreadable_dir, path.basename(segment_path)))
+        self.segments_unreadable += 1
+        print(f"Moved unreadable spool segment {segment_path} to {unreadable_dir}: {error!r}")
+
+    def load(self, connection, batch: pd.DataFrame, load=update_reading) -> int:
+        """
+        Spools the batch, then loads it unless older batches are still
+        waiting for replay, so readings reach the database in order. A
+        batch that fails to load is kept for the replayer. Returns the
+        number of rows inserted now.
+        """
+
+        if batch.empty:
+            return 0
+
+        backlog = bool(self.get_segments())
+        segment_path = self.append(batch)
+        if backlog:
+            self.release(segment_path)
+            return 0
+
+        try:
+            inserted = load(connection, batch)
+        except SQLAlchemyError as error:
+            print(f"Database write failed, spooled {len(batch)} readings: "
+                  f"{error.__class__.__name__}")
+            self.release(segment_path)
+            return 0
+        self.acknowledge(segment_path)
+        return inserted
+
+    def replay(self, connection, load=None) -> int:
+        """
+        Loads the spooled segments, oldest first, up to replay_rows readings
+        per write, stopping at the first failure. Segments are upserted, as
+        a crash may have left readings both spooled and stored. After a data
+        error segments are retried one per write, and one that fails
+        max_replay_attempts times is set aside. Returns the number of
+        readings replayed.
+        """
+
+        if load is None:
+            load = partial(update_reading, load_mode="upsert")
+
+        replayed = 0
+        segments = self.get_segments()
+        self.replay_failures = {segment_path: failures
+                                for segment_path, failures in self.replay_failures.items()
+                                if segment_path in segments}
+        while segments:
+            batches, taken, rows = [], [], 0
+            with self.lock:
+                while segments and rows < self.replay_rows:
+                    segment_path = segments.pop(0)
+                    if not path.exists(segment_path):
+                        continue
+                    try:
+                        batches.extend(read_segment(segment_path))
+                    except DECODE_ERRORS as error:
+                        self.set_aside(segment_path, error)
+                        continue
+                    taken.append(segment_path)
+                    rows = sum(len(batch) for batch in batches)
+                    # Isolate the segment behind an earlier data error
+                    if self.replay_failures:
+                        break
+            if not taken:
+                break
+
+            start_time = time.time()
+            try:
+                if rows:
+                    load(connection, pd.concat(batches, ignore_index=True))
+            except SQLAlchemyError as error:
+                self.last_replay_error = error.__class__.__name__
+                print(f"Spool replay failed, {len(self.get_segments())} segments waiting: "
+                      f"{self.last_replay_error}")
+                if not isinstance(error, DATA_ERRORS):
+                    break
+                for segment_path in taken:
+                    self.replay_failures[segment_path] = \
+                        self.replay_failures.get(segment_path, 0) + 1
+                if len(taken) > 1 or self.replay_failures[taken[0]] < self.max_replay_attempts:
+                    break
+                with self.lock:
+                    if path.exists(taken[0]):
+                        self.set_aside(taken[0], error)
+                del self.replay_failures[taken[0]]
+                continue
+            self.replay_seconds += time.time() - start_time
+            self.last_replay_error = None
+
+            with self.lock:
+                for segment_path in taken:
+                    self.replay_failures.pop(segment_path, None)
+                    if path.exists(segment_path):
+                        remove(segment_path)
+            self.rows_replayed += rows
+            replayed += rows
+
+        if replayed:
+            print(f"Replayed {replayed} spooled readings.")
+        return replayed
+
+    def get_stats(self) -> dict:
+        """Returns the spool depth and the spooling and replay counters."""
+
+        return {
+            "segments": len(self.get_segments()),
+            "bytes": self.get_size(),
+            "rows_spooled": self.rows_spooled,
+            "rows_replayed": self.rows_replayed,
+            "rows_evicted": self.rows_evicted,
+            "segments_unreadable": self.segments_unreadable,
+            "replay_rows_per_second": round(self.rows_replayed / self.replay_seconds)
+            if self.replay_seconds else None,
+            "last_replay_error": self.last_replay_error
+        }
+
+
+class SpoolReplayer:
+    """Replays the spool on a background thread every interval seconds."""
+
+    def __init__(self, spool: Spool, connection, interval: float = SPOOL_REPLAY_SECONDS):
+        self.spool = spool
+        self.connection = connection
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="spool-replayer", daemon=True)
+
+    def start(self) -> None:
+        """Starts the replayer thread."""
+
+        self.thread.start()
+
+    def run(self) -> None:
+        """Replays the spool until stopped. An unexpected error is logged and
+        the replay retried, as the spool is never drained once the thread dies."""
+
+        while not self.stopped.wait(self.interval):
+            try:
+                self.spool.replay(self.connection)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                self.spool.last_replay_error = error.__class__.__name__
+                print(f"Spool replay failed: {error!r}")
+
+    def stop(self, timeout: float = None) -> None:
+        """Stops the replayer after any replay in progress."""
+
+        self.stopped.set()
+        self.thread.join(timeout)
@@ -0,0 +1,23 @@
+'''Limits SQL Server puts on a single statement, and the names of the
+session-scoped staging tables used by the set-based loads. Shared by the
+reading load, the static seed and the static linker.'''
+
+
+# SQL Server accepts at most 2100 parameters in one statement, and at most
+# 1000 rows in one VALUES list
+MAX_PARAMETERS = 2100
+MAX_VALUES_ROWS = 1000
+# Session-scoped temp tables, so concurrent loads do not share a staging table
+STAGING_PREFIXES = {"mssql": "#", "sqlite": "temp."}
+
+
+def get_max_rows(column_count: int) -> int:
+    """Returns the most rows of column_count values one INSERT can carry."""
+
+    return max(min(MAX_PARAMETERS // column_count, MAX_VALUES_ROWS), 1)
+
+
+def get_staging_table(dialect: str, name: str) -> str:
+    """Returns the name of a staging table private to the connection's session."""
+
+    return STAGING_PREFIXES[dialect] + name
@@ -0,0 +1,129 @@
+'''SQLite stand-in for the plants database, for tests and load benchmarks
+that cannot reach SQL Server. The s_gamma schema is an attached in-memory
+database, so the pipeline's schema-qualified queries run unchanged, and
+the tables mirror seed_db.sql (after its ALTERs).'''
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+
+SCHEMA_STATEMENTS = [
+    """CREATE TABLE s_gamma.origin (
+        origin_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        country_code VARCHAR(100) NOT NULL,
+        latitude DECIMAL(7,5) NOT NULL,
+        longitude DECIMAL(8,5) NOT NULL,
+        location VARCHAR(50) NOT NULL,
+        region VARCHAR(50) NOT NULL
+    )""",
+    """CREATE TABLE s_gamma.botanist (
+        botanist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        botanist_name VARCHAR(50) NOT NULL,
+        botanist_phone VARCHAR(25),
+        botanist_email VARCHAR(50)
+    )""",
+    """CREATE TABLE s_gamma.license (
+        license_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        license_name VARCHAR(100),
+        license_url TEXT,
+        license SMALLINT
+    )""",
+    """CREATE TABLE s_gamma.image (
+        image_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        medium_url NVARCHAR(150),
+        regular_url TEXT,
+        original_url TEXT,
+        small_url TEXT,
+        thumbnail TEXT,
+        license_id INT REFERENCES license (license_id)
+    )""",
+    """CREATE TABLE s_gamma.plant (
+        plant_id INTEGER PRIMARY KEY,
+        plant_name VARCHAR(100),
+        scientific_name VARCHAR(100),
+        origin_id INT REFERENCES origin (origin_id),
+        image_id INT REFERENCES image (image_id)
+    )""",
+    """CREATE TABLE s_gamma.reading (
+        reading_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plant_id INT NULL REFERENCES plant (plant_id),
+        botanist_id INT NULL REFERENCES botanist (botanist_id),
+        soil_moisture DECIMAL(4,2) NULL,
+        temperature DECIMAL(4,2) NULL,
+        recording_taken DATETIME NULL,
+        last_watered DATETIME NULL
+    )""",
+    """CREATE UNIQUE INDEX s_gamma.ux_reading_plant_recording
+        ON reading (plant_id, recording_taken)""",
+]
+
+# SQLite has no INCLUDE, so the covering columns trail the key columns
+INDEX_STATEMENTS = [
+    """CREATE INDEX s_gamma.ix_reading_plant_recording
+        ON reading (plant_id, recording_taken,
+                    botanist_id, soil_moisture, temperature, last_watered)""",
+    """CREATE INDEX s_gamma.ix_reading_recording
+        ON reading (recording_taken,
+                    plant_id, botanist_id, soil_moisture, temperature, last_watered)""",
+    """CREATE INDEX s_gamma.ix_botanist_name ON botanist (botanist_name)""",
+]
+
+# The sample botanists inserted by seed_db.sql
+SAMPLE_BOTANISTS = [
+    ("Carl Linnaeus", "(146)994-1635x35992", "carl.linnaeus@lnhm.co.uk"),
+    ("Gertrude Jekyll", "001-481-273-3691x127", "gertrude.jekyll@lnhm.co.uk"),
+    ("Eliza Andrews", "(846)669-6651x75948", "eliza.andrews@lnhm.co.uk"),
+]
+
+
+def create_standin_engine(plant_count: int = 51, foreign_keys: bool = True,
+                          indexes: bool = True) -> Engine:
+    """
+    Returns an engine for a fresh in-memory database with the s_gamma
+    tables, the sample botanists and plant_count plants (ids from 0).
+    The reading query indexes are left out if indexes is False. All
+    connections share one SQLite connection, so the data persists.
+    """
+
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def attach_schema(dbapi_connection, _):
+        # Let SQLAlchemy issue BEGIN itself, so savepoints work with pysqlite
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS s_gamma")
+        dbapi_connection.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+
+    @event.listens_for(engine, "begin")
+    def begin_transaction(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    with engine.begin() as conn:
+        for statement in SCHEMA_STATEMENTS + (INDEX_STATEMENTS if indexes else []):
+            conn.execute(text(statement))
+        conn.execute(text("""INSERT INTO s_gamma.botanist
+                          (botanist_name, botanist_phone, botanist_email)
+                          VALUES (:name, :phone, :email)"""),
+                     [{"name": name, "phone": phone, "email": email}
+                      for name, phone, email in SAMPLE_BOTANISTS])
+        if plant_count:
+            conn.execute(text("""INSERT INTO s_gamma.plant (plant_id, plant_name)
+                              VALUES (:plant_id, :plant_name)"""),
+                         [{"plant_id": plant_id, "plant_name": f"Plant {plant_id}"}
+                          for plant_id in range(plant_count)])
+
+    return engine
+
+
+def add_simulated_latency(engine: Engine, seconds: float) -> None:
+    """Sleeps for a network round trip before every statement sent to the database,
+    so loaders can be compared as if the database were remote."""
+
+    # pylint: disable=import-outside-toplevel
+    from time import sleep
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def wait_for_round_trip(*_):
+        sleep(seconds)
@@ -0,0 +1,114 @@
+'''Set-based resolution of the foreign keys between the static tables.
+The (plant name, license name, image url, origin latitude/longitude) of
+every plant is bulk-loaded into a staging table, then each relationship is
+resolved with a single UPDATE ... JOIN, all in one transaction, instead of
+one SELECT and one UPDATE per plant.'''
+
+from sqlalchemy import sql
+
+from sql_limits import get_max_rows, get_staging_table
+
+
+LINK_COLUMNS = ("plant_name", "license_name", "medium_url", "latitude", "longitude")
+MAX_LINK_ROWS = get_max_rows(len(LINK_COLUMNS))
+
+# (table, foreign key, match of table to link, source of the key, match of source to link).
+# A key matching several source rows takes the highest id, as the row-by-row
+# procedure did by updating with each match in turn.
+LINKS = (
+    ("image", "license_id", "target.medium_url = link.medium_url",
+     "SELECT license_name, MAX(license_id) AS license_id "
+     "FROM s_gamma.license GROUP BY license_name",
+     "source.license_name = link.license_name"),
+    ("plant", "image_id", "target.plant_name = link.plant_name",
+     "SELECT medium_url, MAX(image_id) AS image_id "
+     "FROM s_gamma.image GROUP BY medium_url",
+     "source.medium_url = link.medium_url"),
+    ("plant", "origin_id", "target.plant_name = link.plant_name",
+     "SELECT latitude, longitude, MAX(origin_id) AS origin_id "
+     "FROM s_gamma.origin GROUP BY latitude, longitude",
+     "source.latitude = link.latitude AND source.longitude = link.longitude"),
+)
+
+
+def get_link_rows(payloads: dict[int, dict]) -> list[dict]:
+    """
+    Returns the distinct link columns of the plants' payloads. The image
+    url and license name are only kept for images with both, as before.
+    """
+
+    rows = set()
+    for plant_details in payloads.values():
+        images = plant_details.get("images")
+        has_license = isinstance(images, dict) \
+            and "license_name" in images and "medium_url" in images
+        origin = plant_details.get("origin_location") or [None, None]
+        rows.add((plant_details.get("name"),
+                  images["license_name"] if has_license else None,
+                  images["medium_url"] if has_license else None,
+                  origin[0], origin[1] if len(origin) > 1 else None))
+
+    return [dict(zip(LINK_COLUMNS, row)) for row in sorted(rows, key=str)]
+
+
+def build_link_query(dialect: str, link: tuple, staging_table: str) -> sql.expression.TextClause:
+    """Returns the UPDATE ... JOIN setting one foreign key from the staging table."""
+
+    table, column, target_match, source, source_match = link
+    if dialect == "mssql":
+        return sql.text(
+            f"""UPDATE target SET {column} = source.{column}
+            FROM s_gamma.{table} AS target
+            JOIN {staging_table} AS link ON {target_match}
+            JOIN ({source}) AS source ON {source_match};""")
+    # SQLite names the target in the UPDATE clause and joins it in WHERE
+    return sql.text(
+        f"""UPDATE s_gamma.{table} AS target SET {column} = source.{column}
+        FROM {staging_table} AS link
+        JOIN ({source}) AS source ON {source_match}
+        WHERE {target_match};""")
+
+
+def stage_link_rows(conn, rows: list[dict], staging_table: str) -> None:
+    """Creates the staging table and fills it with multi-row INSERTs. The
+    coordinates are declared as in origin, so they are rounded alike and
+    still match when the API gives more than five decimals."""
+
+    conn.execute(sql.text(f"DROP TABLE IF EXISTS {staging_table};"))
+    conn.execute(sql.text(
+        f"""CREATE TABLE {staging_table} (
+            plant_name VARCHAR(100), license_name VARCHAR(100), medium_url NVARCHAR(150),
+            latitude DECIMAL(7,5), longitude DECIMAL(8,5));"""))
+    for start in range(0, len(rows), MAX_LINK_ROWS):
+        batch = rows[start:start + MAX_LINK_ROWS]
+        values = ", ".join(
+            "(" + ", ".join(f":{column}_{index}" for column in LINK_COLUMNS) + ")"
+            for index in range(len(batch)))
+        conn.execute(sql.text(f"INSERT INTO {staging_table} ({', '.join(LINK_COLUMNS)}) "
+                              f"VALUES {values};"),
+                     {f"{column}_{index}": row[column]
+                      for index, row in enumerate(batch) for column in LINK_COLUMNS})
+
+
+def link_static_tables(connection, payloads: dict[int, dict]) -> dict:
+    """
+    Sets image.license_id, plant.image_id and plant.origin_id from the
+    plants' payloads in one transaction. Returns the number of rows each
+    foreign key was set on.
+    """
+
+    rows = get_link_rows(payloads)
+    if not rows:
+        return {}
+
+    updated = {}
+    with connection.begin() as conn:
+        staging_table = get_staging_table(conn.dialect.name, "plant_link")
+        stage_link_rows(conn, rows, staging_table)
+        for link in LINKS:
+            table, column = link[:2]
+            query = build_link_query(conn.dialect.name, link, staging_table)
+            updated[f"{table}.{column}"] = conn.execute(query).rowcount
+        conn.execute(sql.text(f"DROP TABLE {staging_table};"))
+
+    return updated
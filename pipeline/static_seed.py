@@ -0,0 +1,99 @@
+'''Bulk seeding of the static tables from master_plant.csv. The CSV is read
+once, the tables are reflected once into shared metadata, and each table
+is filled with multi-row INSERTs over one pooled engine. The dimension
+tables do not depend on each other when seeded (their links are set
+afterwards by static_linker.py), so they are seeded concurrently.'''
+
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+from threading import Lock
+
+import pandas as pd
+from sqlalchemy import MetaData, Table
+from sqlalchemy.engine import Engine
+
+from sql_limits import get_max_rows
+
+
+SEED_CSV = environ.get("SEED_CSV", "master_plant.csv")
+SEED_WORKERS = int(environ.get("SEED_WORKERS", 4))
+DIMENSION_COLUMNS = {
+    "origin": ["country_code", "latitude", "longitude", "location", "region"],
+    "botanist": ["botanist_name", "botanist_phone", "botanist_email"],
+    "license": ["license_name", "license_url", "license"],
+    "image": ["medium_url", "regular_url", "original_url", "small_url", "thumbnail"],
+}
+
+
+def get_seed_rows(data: pd.DataFrame, column_list: list[str],
+                  distinct: bool = True) -> list[dict]:
+    """
+    Returns the rows of the columns as dicts, with missing values as None.
+    If distinct, duplicate rows and rows of only numbers or missing
+    values are left out, as dimension tables hold each value once.
+    """
+
+    rows = data[column_list]
+    if distinct:
+        rows = rows.drop_duplicates()
+        rows = rows[[not all(isinstance(item, float) for item in row)
+                     for row in rows.values.tolist()]]
+    rows = rows.astype(object).where(rows.notna(), None)
+    return rows.to_dict("records")
+
+
+class StaticSeeder:
+    """Seeds tables of a schema over one engine, reflecting each table once."""
+
+    def __init__(self, engine: Engine, schema: str = "s_gamma",
+                 tables: list[str] = None):
+        self.engine = engine
+        self.metadata = MetaData(schema=schema)
+        self.lock = Lock()
+        self.inserted = {}
+        if tables:
+            self.metadata.reflect(engine, only=tables)
+
+    def get_table(self, table: str) -> Table:
+        """Returns the reflected table, reflecting it on first use."""
+
+        with self.lock:
+            return Table(table, self.metadata, autoload_with=self.engine)
+
+    def seed_table(self, table: str, rows: list[dict]) -> int:
+        """Inserts the rows in one transaction, as many per INSERT as the
+        parameter limit allows. Returns the number of rows inserted."""
+
+        if not rows:
+            return 0
+
+        db_table = self.get_table(table)
+        batch_size = get_max_rows(len(rows[0]))
+        with self.engine.begin() as conn:
+            for start in range(0, len(rows), batch_size):
+                conn.execute(db_table.insert().values(rows[start:start + batch_size]))
+
+        with self.lock:
+            self.inserted[table] = self.inserted.get(table, 0) + len(rows)
+        return len(rows)
+
+    def seed_dimensions(self, data: pd.DataFrame,
+                        dimensions: dict[str, list[str]] = None,
+                        workers: int = SEED_WORKERS) -> dict:
+        """Seeds each dimension table from its columns of the data,
+        concurrently. Returns the number of rows inserted per table."""
+
+        if dimensions is None:
+            dimensions = DIMENSION_COLUMNS
+        tables = list(dimensions)
+        with ThreadPoolExecutor(workers) as executor:
+            counts = executor.map(
+                lambda table: self.seed_table(table, get_seed_rows(data, dimensions[table])),
+                tables)
+            return dict(zip(tables, counts))
+
+    def get_stats(self) -> dict:
+        """Returns the number of rows inserted per table."""
+
+        with self.lock:
+            return dict(self.inserted)
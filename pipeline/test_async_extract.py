@@ -0,0 +1,214 @@
+"""
+Testing suite for the asyncio extract script, using a fake client session
+in place of the plant API.
+"""
+
+import asyncio
+from collections import deque
+import json
+
+import aiohttp
+import pandas as pd
+
+from async_extract import (fetch_changing_plant_details,
+                           extract_plant_details_concurrently)
+import async_extract
+from multi_extract import DEADLINE_ERROR
+from plant_reading import PlantReading, READING_FIELDS
+from test_extract_script import sample_data
+
+
+class FakeResponse:
+    """Stands in for an aiohttp response with a fixed JSON body."""
+
+    def __init__(self, body, status: int = 200):
+        self.body = body
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        """Raises as aiohttp does for an error status."""
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=self.status)
+
+    async def json(self, content_type=None):
+        """Returns the body, or raises if it is an exception."""
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+class FakeSession:
+    """Stands in for an aiohttp session, recording peak concurrency."""
+
+    def __init__(self, bodies: dict):
+        self.bodies = bodies
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, url):
+        """Returns a fake response for the plant id at the end of the url."""
+        plant_id = int(url.rsplit("/", 1)[-1])
+        body = self.bodies[plant_id]
+        if isinstance(body, FakeResponse):
+            return body
+        return FakeResponse(body)
+
+
+def test_fetch_returns_only_essential_values():
+    """A successful response should be reduced to the transient reading."""
+
+    session = FakeSession({0: sample_data})
+    result = asyncio.run(fetch_changing_plant_details(
+        session, asyncio.Semaphore(1), 0))
+
+    assert result.recording_taken == sample_data["recording_taken"]
+    assert result.plant_name == sample_data["name"]
+    assert result.botanist_name == sample_data["botanist"]["name"]
+
+
+def test_fetch_json_error_returns_empty(capsys):
+    """A malformed body should produce an empty reading and a console message."""
+
+    session = FakeSession({3: json.JSONDecodeError("JSONDecodeError", "", 1)})
+    result = asyncio.run(fetch_changing_plant_details(
+        session, asyncio.Semaphore(1), 3))
+
+    assert result is None
+    assert "Error, Plant not found: " in capsys.readouterr().out
+
+
+def test_fetch_timeout_returns_empty(capsys):
+    """A timed out request should produce an empty reading and a console message."""
+
+    session = FakeSession({3: asyncio.TimeoutError()})
+    result = asyncio.run(fetch_changing_plant_details(
+        session, asyncio.Semaphore(1), 3))
+
+    assert result is None
+    assert "A Timeout Error occurred: " in capsys.readouterr().out
+
+
+def test_fetch_empty_error_response_returns_empty(capsys):
+    """A server error with an empty body should be a failed request, not a crash."""
+
+    session = FakeSession({3: FakeResponse(None, status=503)})
+    result = asyncio.run(fetch_changing_plant_details(
+        session, asyncio.Semaphore(1), 3))
+
+    assert result is None
+    assert "An Http Error occurred: " in capsys.readouterr().out
+
+
+def test_fetch_empty_body_returns_empty(capsys):
+    """A successful response without a JSON object should be a failed request."""
+
+    session = FakeSession({3: None})
+    result = asyncio.run(fetch_changing_plant_details(
+        session, asyncio.Semaphore(1), 3))
+
+    assert result is None
+    assert "Error, Plant not found: " in capsys.readouterr().out
+
+
+def test_concurrency_is_bounded_by_semaphore(monkeypatch):
+    """No more than the configured number of requests should be in flight."""
+
+    session = FakeSession({})
+
+    async def slow_fetch(session, semaphore, plant_id, hedge_after=None):
+        async with semaphore:
+            session.in_flight += 1
+            session.max_in_flight = max(session.max_in_flight, session.in_flight)
+            await asyncio.sleep(0.01)
+            session.in_flight -= 1
+        return {"plant_id": plant_id}
+
+    class FakeClientSession:
+        """Returns the shared fake session as an async context manager."""
+
+        def __init__(self, concurrency):
+            self.concurrency = concurrency
+
+        async def __aenter__(self):
+            return session
+
+        async def __aexit__(self, *args):
+            return False
+
+    monkeypatch.setattr(async_extract, "fetch_changing_plant_details", slow_fetch)
+    monkeypatch.setattr(async_extract, "create_async_session", FakeClientSession)
+    result = asyncio.run(extract_plant_details_concurrently(list(range(20)), 5))
+
+    assert [reading["plant_id"] for reading in result] == list(range(20))
+    assert session.max_in_flight == 5
+
+
+def test_dataframe_contract_matches_pool_path(monkeypatch):
+    """The extracted frame should have the columns the transform stage expects."""
+
+    async def fake_fetch(session, semaphore, plant_id, hedge_after=None):
+        return async_extract.parse_changing_plant_details(plant_id, sample_data)
+
+    monkeypatch.setattr(async_extract, "fetch_changing_plant_details", fake_fetch)
+    extract_session = async_extract.ExtractSession()
+    try:
+        result = async_extract.extract_all_plant_details(
+            [0, 1], extract_session=extract_session)
+    finally:
+        extract_session.close()
+
+    assert isinstance(result, pd.DataFrame)
+    assert list(result.columns) == READING_FIELDS
+    assert list(result["plant_id"]) == [0, 1]
+    assert result["temperature"].dtype == "float64"
+
+
+def test_stragglers_are_marked_missing_at_deadline(monkeypatch):
+    """Plants still outstanding at the deadline should be returned as missing."""
+
+    async def fetch_with_straggler(session, semaphore, plant_id, hedge_after=None):
+        await asyncio.sleep(10 if plant_id == 2 else 0)
+        return PlantReading(plant_id=plant_id)
+
+    monkeypatch.setattr(async_extract, "fetch_changing_plant_details",
+                        fetch_with_straggler)
+    result = asyncio.run(extract_plant_details_concurrently(
+        [0, 1, 2], 10, deadline=0.1))
+
+    assert result[0] == PlantReading(plant_id=0)
+    assert result[2] == PlantReading(plant_id=2, error=DEADLINE_ERROR)
+    assert async_extract.cycle_stats["missed_deadline"] == 1
+
+
+def test_hedged_request_returns_first_answer(monkeypatch):
+    """A slow request should be duplicated and the faster answer used."""
+
+    calls = []
+
+    async def slow_then_fast(session, plant_id):
+        calls.append(plant_id)
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return {"name": f"attempt {len(calls)}"}
+
+    monkeypatch.setattr(async_extract, "request_plant_details", slow_then_fast)
+    result = asyncio.run(async_extract.request_with_hedge(None, 4, 0.01))
+
+    assert result == {"name": "attempt 2"}
+    assert calls == [4, 4]
+
+
+def test_hedge_delay_needs_enough_samples(monkeypatch):
+    """Hedging should only start once the p95 latency can be estimated."""
+
+    monkeypatch.setattr(async_extract, "latency_history", deque([0.1] * 5))
+    assert async_extract.get_hedge_delay() is None
+
+    monkeypatch.setattr(async_extract, "latency_history",
+                        deque([0.1] * 95 + [2.0] * 5))
+    assert 0.1 < async_extract.get_hedge_delay() <= 2.0
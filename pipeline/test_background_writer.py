@@ -0,0 +1,131 @@
+"""
+Testing suite for the background writer, which loads queued batches on
+its own thread for the concurrent pipeline mode.
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+from background_writer import BackgroundWriter
+from metrics import PipelineMetrics
+
+
+def make_batch(plant_ids: list[int]) -> pd.DataFrame:
+    """Returns a minimal batch of transformed readings."""
+
+    return pd.DataFrame({"plant_id": plant_ids})
+
+
+def test_batches_are_loaded_in_order():
+    """Every submitted batch should be loaded, in the order it was queued."""
+
+    loaded = []
+    writer = BackgroundWriter(None, load=lambda _, batch: loaded.append(batch) or len(batch))
+    writer.start()
+
+    for plant_id in range(3):
+        writer.submit(make_batch([plant_id, plant_id]))
+    assert writer.stop()
+
+    assert [list(batch["plant_id"]) for batch in loaded] == [[0, 0], [1, 1], [2, 2]]
+    assert writer.get_stats()["rows_inserted"] == 6
+
+
+def test_submit_blocks_while_queue_is_full():
+    """A slow database should hold back the caller once max_batches are queued."""
+
+    release = threading.Event()
+
+    def slow_load(_, batch):
+        release.wait()
+        return len(batch)
+
+    writer = BackgroundWriter(None, max_batches=1, load=slow_load)
+    writer.start()
+    writer.submit(make_batch([0]))
+    # Wait until the writer has taken the first batch and is stuck loading it
+    while writer.batches.qsize():
+        time.sleep(0.01)
+    writer.submit(make_batch([1]))
+
+    submitter = threading.Thread(target=writer.submit, args=(make_batch([2]),))
+    submitter.start()
+    submitter.join(0.2)
+    assert submitter.is_alive()
+
+    release.set()
+    submitter.join(1)
+    assert not submitter.is_alive()
+    assert writer.stop()
+    assert writer.get_stats()["batches_written"] == 3
+
+
+def test_failed_batch_does_not_stop_the_writer():
+    """A batch whose load raises is counted and the next batch still loads."""
+
+    def flaky_load(_, batch):
+        if batch["plant_id"].iloc[0] == 0:
+            raise ConnectionError("database unavailable")
+        return len(batch)
+
+    writer = BackgroundWriter(None, load=flaky_load)
+    writer.start()
+    writer.submit(make_batch([0, 0]))
+    writer.submit(make_batch([1]))
+    writer.stop()
+
+    stats = writer.get_stats()
+    assert stats["batches_failed"] == 1
+    assert stats["rows_failed"] == 2
+    assert stats["rows_inserted"] == 1
+
+
+def test_stop_gives_up_after_timeout():
+    """Shutdown should not hang forever on a load that never returns."""
+
+    release = threading.Event()
+    writer = BackgroundWriter(None, max_batches=1,
+                              load=lambda _, batch: release.wait() and len(batch))
+    writer.start()
+    writer.submit(make_batch([0]))
+    writer.submit(make_batch([1]))
+
+    assert not writer.stop(timeout=0.1)
+    release.set()
+
+
+def test_empty_batches_are_not_queued():
+    """A cycle where every reading was dropped should not reach the writer."""
+
+    writer = BackgroundWriter(None)
+    writer.submit(make_batch([]))
+
+    assert writer.get_stats()["queued_batches"] == 0
+
+
+def test_rows_are_reported_in_the_cycle_they_were_written():
+    """Rows loaded after a cycle was logged should count towards the next cycle and the totals."""
+
+    metrics = PipelineMetrics()
+    writer = BackgroundWriter(None, load=lambda _, batch: len(batch))
+    writer.start()
+
+    metrics.start_cycle()
+    writer.report_cycle(metrics)
+    assert metrics.end_cycle()["rows_inserted"] == 0
+
+    writer.submit(make_batch([0, 1, 2]))
+    assert writer.stop()
+    metrics.start_cycle()
+    writer.report_cycle(metrics)
+    cycle_metrics = metrics.end_cycle()
+
+    assert cycle_metrics["rows_inserted"] == 3
+    assert "load" in cycle_metrics["stages"]
+    assert "plant_pipeline_rows_inserted_total 3" in metrics.to_prometheus()
+
+    metrics.start_cycle()
+    writer.report_cycle(metrics)
+    assert metrics.end_cycle()["rows_inserted"] == 0
@@ -0,0 +1,75 @@
+"""
+Testing suite for the transform benchmark's synthetic data and regression check.
+"""
+
+from benchmark_transform import make_readings, find_regressions, run_benchmark, PLANTS
+from timestamps import RECORDING_TAKEN_CACHE
+from transform_readings import READING_COLUMNS
+
+
+def test_synthetic_readings_have_extract_columns():
+    """Flattened synthetic readings should carry the columns the transform expects."""
+
+    readings = make_readings(PLANTS * 10)
+
+    assert sorted(readings.columns) == sorted(READING_COLUMNS)
+    assert readings["plant_id"].nunique() == PLANTS
+    assert readings["recording_taken"].nunique() == 10
+
+
+def test_synthetic_readings_include_bad_rows():
+    """Errors, missing and out-of-range values should appear at roughly their shares."""
+
+    readings = make_readings(50_000, null_share=0.1, out_of_range_share=0.1,
+                             error_share=0.1)
+    errors = readings["error"].notnull()
+
+    assert 0.08 < errors.mean() < 0.12
+    assert readings.loc[errors, "botanist_name"].isnull().all()
+    assert 0.08 < readings.loc[~errors, "temperature"].isnull().mean() < 0.12
+    assert 0.03 < (readings["temperature"] < 0).mean() < 0.07
+
+
+def test_nested_readings_have_botanist_dicts():
+    """Nested synthetic readings should keep the raw API's botanist dicts."""
+
+    readings = make_readings(PLANTS, nested=True, error_share=0)
+
+    assert set(readings["botanist"][0]) == {"email", "name", "phone"}
+
+
+def test_benchmark_reports_time_and_memory():
+    """A benchmark run should report its timing and peak memory."""
+
+    result = run_benchmark(make_readings(PLANTS), "pandas", repeats=2, min_seconds=0)
+
+    assert result["rows"] == PLANTS
+    assert result["runs"] == 2
+    assert result["seconds"] > 0
+    assert result["peak_mb"] > 0
+
+
+def test_every_benchmark_run_parses_cold():
+    """Each run should parse its timestamps rather than reuse the previous run's."""
+
+    readings = make_readings(PLANTS, error_share=0)
+    misses = RECORDING_TAKEN_CACHE.misses
+
+    run_benchmark(readings, "pandas", repeats=2, min_seconds=0)
+
+    # Two timed runs and the memory run, each missing the one recording time
+    assert RECORDING_TAKEN_CACHE.misses - misses == 3
+
+
+def test_regressions_beyond_threshold_are_reported():
+    """Only metrics worse than the baseline by more than the threshold should fail."""
+
+    baseline = {"pandas:day": {"seconds": 1.0, "peak_mb": 10.0}}
+    results = {"pandas:day": {"seconds": 1.2, "peak_mb": 12.0},
+               "pandas:year": {"seconds": 100.0, "peak_mb": 100.0}}
+
+    regressions = find_regressions(results, baseline, time_threshold=0.25,
+                                   memory_threshold=0.1)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("pandas:day peak_mb")
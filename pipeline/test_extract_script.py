@@ -3,12 +3,13 @@ Testing suite for the extract script, including base and edge cases in the scrip
 """
 
 import io
+import pickle
 import unittest
 from unittest.mock import patch, MagicMock
 
 import requests
 
-from multi_extract import extract_changing_plant_details
+from multi_extract import extract_changing_plant_details, parse_changing_plant_details
 
 sample_data = {
     "botanist": {
@@ -42,7 +43,7 @@ sample_data = {
 class TestTransientDataFunction(unittest.TestCase):
     """Tests involving extract_changing_plant_details()."""
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_returns_only_essential_values(self, mock_requests_get):
         """Tests that the function only returns the transient data."""
 
@@ -52,10 +53,10 @@ class TestTransientDataFunction(unittest.TestCase):
         fake_plant_id = sample_data["plant_id"]
         result = extract_changing_plant_details(fake_plant_id)
 
-        assert result["recording_taken"] == sample_data["recording_taken"]
+        assert result.recording_taken == sample_data["recording_taken"]
 
     @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_json_error_handling(self, mock_requests_get, mock_stdout):
         """
         Tests that nothing is returned if the JSONDecodeError exception is raised
@@ -70,11 +71,11 @@ class TestTransientDataFunction(unittest.TestCase):
         result = extract_changing_plant_details(fake_plant_id)
         console_output = mock_stdout.getvalue()
 
-        self.assertEqual(len(result), 0)
+        self.assertIsNone(result)
         assert "Error, Plant not found: " in console_output
 
     @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_http_error_handling(self, mock_requests_get, mock_stdout):
         """
         Tests that nothing is returned if the HTTPError exception is raised
@@ -88,11 +89,11 @@ class TestTransientDataFunction(unittest.TestCase):
         result = extract_changing_plant_details(fake_plant_id)
         console_output = mock_stdout.getvalue()
 
-        self.assertEqual(len(result), 0)
+        self.assertIsNone(result)
         assert "An Http Error occurred: " in console_output
 
     @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_connection_error_handling(self, mock_requests_get, mock_stdout):
         """
         Tests that nothing is returned if the ConnectionError exception is raised
@@ -106,11 +107,11 @@ class TestTransientDataFunction(unittest.TestCase):
         result = extract_changing_plant_details(fake_plant_id)
         console_output = mock_stdout.getvalue()
 
-        self.assertEqual(len(result), 0)
+        self.assertIsNone(result)
         assert "An Error Connecting to the API occurred: " in console_output
 
     @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_timeout_error_handling(self, mock_requests_get, mock_stdout):
         """
         Tests that nothing is returned if the Timeout exception is raised
@@ -124,11 +125,11 @@ class TestTransientDataFunction(unittest.TestCase):
         result = extract_changing_plant_details(fake_plant_id)
         console_output = mock_stdout.getvalue()
 
-        self.assertEqual(len(result), 0)
+        self.assertIsNone(result)
         assert "A Timeout Error occurred: " in console_output
 
     @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_request_error_handling(self, mock_requests_get, mock_stdout):
         """
         Tests that nothing is returned if the RequestException is raised
@@ -142,5 +143,25 @@ class TestTransientDataFunction(unittest.TestCase):
         result = extract_changing_plant_details(fake_plant_id)
         console_output = mock_stdout.getvalue()
 
-        self.assertEqual(len(result), 0)
+        self.assertIsNone(result)
         assert "An Unknown Error occurred: " in console_output
+
+
+class TestPlantReadingRecord(unittest.TestCase):
+    """Tests involving the PlantReading record returned to the Pool."""
+
+    def test_botanist_is_flattened(self):
+        """Tests that the botanist fields are flattened as the record is built."""
+
+        result = parse_changing_plant_details(0, sample_data)
+
+        assert result.botanist_name == sample_data["botanist"]["name"]
+        assert result.botanist_mobile == sample_data["botanist"]["phone"]
+        assert result.botanist_email == sample_data["botanist"]["email"]
+
+    def test_pickle_round_trip(self):
+        """Tests that a record survives crossing the process boundary unchanged."""
+
+        result = parse_changing_plant_details(0, sample_data)
+
+        self.assertEqual(pickle.loads(pickle.dumps(result)), result)
@@ -0,0 +1,122 @@
+"""
+Testing suite for the shared HTTP client layer, using a local keep-alive
+server in place of the plant API.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from time import sleep
+
+import pytest
+
+import http_client
+import multi_extract
+
+
+class PlantHandler(BaseHTTPRequestHandler):
+    """Serves a minimal plant payload over HTTP/1.1 keep-alive."""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0
+
+    def do_GET(self):
+        """Responds with the plant id taken from the path, after the delay."""
+        sleep(self.delay)
+        body = json.dumps(
+            {"plant_id": int(self.path.rsplit("/", 1)[-1])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="plant_server")
+def local_plant_server(monkeypatch):
+    """Starts a local plant server and points the client layer at it."""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PlantHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(http_client, "BASE_URL",
+                        f"http://127.0.0.1:{server.server_port}/plants/")
+    monkeypatch.setattr(http_client, "_local", threading.local())
+    monkeypatch.setattr(http_client, "_sessions", [])
+    monkeypatch.setattr(http_client, "_worker_stats", {})
+    monkeypatch.setattr(http_client, "_async_counters",
+                        {"requests": 0, "new_connections": 0, "reused_connections": 0})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_is_reused_within_worker(plant_server):
+    """The same worker should always get the same session."""
+
+    assert http_client.get_session() is http_client.get_session()
+
+
+def test_connections_are_reused(plant_server):
+    """Repeated plant requests should only open one connection."""
+
+    for plant_id in range(5):
+        assert http_client.get_plant(plant_id).json()["plant_id"] == plant_id
+
+    stats = http_client.get_connection_stats()
+
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 4
+
+
+def test_pool_workers_reuse_connections_across_cycles(plant_server):
+    """Pool workers should outlive a cycle, and their connections be counted."""
+
+    extract_pool = multi_extract.ExtractPool(workers=2)
+    try:
+        for _ in range(2):
+            readings = multi_extract.extract_all_plant_details(
+                list(range(10)), extract_pool=extract_pool)
+            assert list(readings["plant_id"]) == list(range(10))
+    finally:
+        extract_pool.close()
+
+    stats = http_client.get_connection_stats()
+
+    assert stats["requests"] == 20
+    assert stats["new_connections"] <= 2
+    assert stats["reused_connections"] >= 18
+
+
+def test_pool_is_restarted_after_missed_deadline(plant_server, monkeypatch):
+    """Plants outstanding at the deadline should not spill into the next cycle."""
+
+    monkeypatch.setattr(PlantHandler, "delay", 1)
+    extract_pool = multi_extract.ExtractPool(workers=1)
+    try:
+        readings = multi_extract.extract_all_plant_details(
+            list(range(5)), deadline=0.2, extract_pool=extract_pool)
+        assert set(readings["error"]) == {multi_extract.DEADLINE_ERROR}
+        assert extract_pool.pool is None
+
+        monkeypatch.setattr(PlantHandler, "delay", 0)
+        readings = multi_extract.extract_all_plant_details(
+            list(range(5)), extract_pool=extract_pool)
+        assert list(readings["plant_id"]) == list(range(5))
+        assert readings["error"].isna().all()
+    finally:
+        extract_pool.close()
+
+
+def test_gzip_header_is_configurable(monkeypatch):
+    """Requests should only ask for gzip when it is enabled."""
+
+    monkeypatch.setattr(http_client, "USE_GZIP", True)
+    assert "gzip" in http_client.get_headers()["Accept-Encoding"]
+
+    monkeypatch.setattr(http_client, "USE_GZIP", False)
+    assert http_client.get_headers()["Accept-Encoding"] == "identity"
@@ -0,0 +1,71 @@
+"""
+Testing suite for the last seen index, which drops readings the API has
+not refreshed since the previous poll.
+"""
+
+import pandas as pd
+import pytest
+
+from last_seen import LastSeenIndex
+from plant_reading import PlantReading
+
+
+@pytest.fixture(name="readings")
+def cycle_readings():
+    """Fixture with two refreshed samples, one repeated sample and an error."""
+
+    return pd.DataFrame([
+        {"plant_id": 1, "recording_taken": "2023-12-21 10:21:34", "error": None},
+        {"plant_id": 2, "recording_taken": "2023-12-21 10:20:34", "error": None},
+        {"plant_id": 3, "recording_taken": "2023-12-21 10:21:40", "error": None},
+        {"plant_id": 7, "recording_taken": None, "error": "plant not found"},
+    ])
+
+
+@pytest.fixture(name="index")
+def warmed_index():
+    """Fixture with the samples stored in the database after the previous cycle."""
+
+    return LastSeenIndex({1: pd.Timestamp("2023-12-21 10:20:34"),
+                          2: pd.Timestamp("2023-12-21 10:20:34")})
+
+
+def test_unchanged_readings_are_dropped(index, readings):
+    """A reading with the same recording_taken as last time should be dropped."""
+
+    result = index.drop_unchanged_readings(readings)
+
+    assert list(result["plant_id"]) == [1, 3, 7]
+    assert index.suppressed_last_cycle == 1
+
+
+def test_index_is_updated_with_new_readings(index, readings):
+    """Polling the same samples again should suppress all of them."""
+
+    index.drop_unchanged_readings(readings)
+    result = index.drop_unchanged_readings(readings)
+
+    assert list(result["plant_id"]) == [7]
+    assert index.get_stats() == {"indexed_plants": 3,
+                                 "suppressed_last_cycle": 3,
+                                 "suppressed_total": 4}
+
+
+def test_streamed_readings_are_checked_one_at_a_time(index):
+    """The streaming check should agree with the DataFrame check."""
+
+    index.start_cycle()
+    repeated = PlantReading(plant_id=2, recording_taken="2023-12-21 10:20:34")
+    refreshed = PlantReading(plant_id=2, recording_taken="2023-12-21 10:21:34")
+
+    assert not index.is_new_reading(repeated)
+    assert index.is_new_reading(refreshed)
+    assert not index.is_new_reading(refreshed)
+    assert index.suppressed_last_cycle == 2
+
+
+def test_readings_without_recording_time_are_kept(index):
+    """Errors and failed requests should always be passed on."""
+
+    assert index.is_new_reading(None)
+    assert index.is_new_reading(PlantReading(plant_id=7, error="plant not found"))
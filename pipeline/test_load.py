@@ -0,0 +1,266 @@
+"""
+Testing suite for the bulk load of readings, run against the SQLite
+stand-in for the plants database.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import event, sql
+from sqlalchemy.exc import DataError
+
+from benchmark_load import make_transformed_readings
+from load import get_last_recordings, update_reading, DimensionCache, BOTANIST_CACHE
+from sqlite_standin import create_standin_engine
+
+
+@pytest.fixture(name="engine")
+def standin_engine():
+    """Fixture with an empty reading table, three botanists and 51 plants."""
+
+    # The shared cache would otherwise hold ids from another test's database
+    BOTANIST_CACHE.clear()
+    return create_standin_engine()
+
+
+def fetch_readings(engine) -> list:
+    """Returns every stored reading, ordered by plant then recording time."""
+
+    with engine.connect() as conn:
+        return conn.execute(sql.text(
+            """SELECT plant_id, botanist_id, soil_moisture, temperature,
+            recording_taken, last_watered FROM s_gamma.reading
+            ORDER BY plant_id, recording_taken""")).fetchall()
+
+
+def test_all_readings_are_inserted(engine):
+    """Every valid reading should be stored with its botanist's id."""
+
+    assert update_reading(engine, make_transformed_readings(102)) == 102
+
+    stored = fetch_readings(engine)
+    assert len(stored) == 102
+    assert stored[0][:4] == (0, 1, 55.25, 12.5)
+    assert stored[1][1] == 3
+    assert get_last_recordings(engine)[0] == pd.Timestamp("2023-12-21 10:01:00")
+
+
+def test_batches_smaller_than_the_cycle(engine):
+    """The result should not depend on how the cycle is split into batches."""
+
+    assert update_reading(engine, make_transformed_readings(51), batch_size=7) == 51
+    assert len(fetch_readings(engine)) == 51
+
+
+def test_error_and_missing_botanist_readings_are_skipped(engine):
+    """Readings with an API error or without a botanist are not stored."""
+
+    readings = make_transformed_readings(4)
+    readings["error"] = [None, "plant not found", None, None]
+    readings["botanist_name"] = readings["botanist_name"].astype(object)
+    readings.loc[2, "botanist_name"] = None
+
+    assert update_reading(engine, readings) == 2
+    assert [row[0] for row in fetch_readings(engine)] == [0, 3]
+
+
+def test_failing_row_is_isolated(engine):
+    """A reading the database rejects should not stop the rest of its batch."""
+
+    readings = make_transformed_readings(10)
+    # There is no plant 999, so the foreign key rejects this row
+    readings.loc[4, "plant_id"] = 999
+
+    assert update_reading(engine, readings, batch_size=5) == 9
+    assert 999 not in [row[0] for row in fetch_readings(engine)]
+
+
+def test_missing_values_are_stored_as_null(engine):
+    """NaN measurements and NaT timestamps should be inserted as NULL."""
+
+    readings = make_transformed_readings(2)
+    readings.loc[0, "soil_moisture"] = np.nan
+    readings.loc[0, "last_watered"] = pd.NaT
+
+    assert update_reading(engine, readings) == 2
+    first = fetch_readings(engine)[0]
+    assert first[2] is None
+    assert first[5] is None
+
+
+def test_empty_cycle_inserts_nothing(engine):
+    """A cycle with no readings should not open a transaction."""
+
+    assert update_reading(engine, make_transformed_readings(0)) == 0
+
+
+def test_unknown_botanists_are_inserted(engine):
+    """A botanist missing from the table should be added once, with their details."""
+
+    readings = make_transformed_readings(3)
+    readings["botanist_name"] = ["Carl Linnaeus", "New Botanist", "New Botanist"]
+    readings["botanist_mobile"] = [None, "0123", "0123"]
+    readings["botanist_email"] = [None, "new@lnhm.co.uk", "new@lnhm.co.uk"]
+
+    assert update_reading(engine, readings) == 3
+
+    with engine.connect() as conn:
+        botanists = conn.execute(sql.text(
+            "SELECT botanist_id, botanist_phone, botanist_email FROM s_gamma.botanist "
+            "WHERE botanist_name = 'New Botanist'")).fetchall()
+    assert botanists == [(4, "0123", "new@lnhm.co.uk")]
+    assert [row[1] for row in fetch_readings(engine)] == [1, 4, 4]
+
+
+def test_concurrent_loads_insert_a_new_botanist_once(engine):
+    """Loads on several threads, like the background writer and spool replayer,
+    should not each insert the same new botanist."""
+
+    def load_plant(plant_id):
+        readings = make_transformed_readings(2)
+        readings["plant_id"] = [plant_id, plant_id + 10]
+        readings["botanist_name"] = ["New Botanist", "New Botanist"]
+        barrier.wait()
+        results.append(update_reading(engine, readings))
+
+    barrier = threading.Barrier(4)
+    results = []
+    threads = [threading.Thread(target=load_plant, args=(plant_id,)) for plant_id in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with engine.connect() as conn:
+        new_botanists = conn.execute(sql.text(
+            "SELECT COUNT(*) FROM s_gamma.botanist WHERE botanist_name = 'New Botanist'")).scalar()
+    assert results == [2, 2, 2, 2]
+    assert new_botanists == 1
+
+
+def test_cache_only_reads_the_table_on_a_miss(engine):
+    """Known botanists should be served from memory in later cycles."""
+
+    cache = DimensionCache("s_gamma.botanist", "botanist_name", "botanist_id")
+    readings = make_transformed_readings(51)
+
+    update_reading(engine, readings, botanist_cache=cache)
+    update_reading(engine, readings, botanist_cache=cache)
+
+    assert cache.get_stats() == {"cached_keys": 3, "hits": 102, "misses": 0, "refreshes": 1}
+
+
+def test_cache_refreshes_for_botanists_added_elsewhere(engine):
+    """A botanist added to the table after the cache was loaded should be found."""
+
+    cache = DimensionCache("s_gamma.botanist", "botanist_name", "botanist_id")
+    readings = make_transformed_readings(2)
+    with engine.connect() as conn:
+        cache.refresh(conn)
+    with engine.begin() as conn:
+        conn.execute(sql.text("INSERT INTO s_gamma.botanist (botanist_name) "
+                              "VALUES ('Added Botanist')"))
+
+    readings["botanist_name"] = ["Added Botanist", "Carl Linnaeus"]
+    with engine.connect() as conn:
+        botanist_ids = cache.resolve(conn, readings)
+
+    assert list(botanist_ids) == [4, 1]
+    assert cache.get_stats()["misses"] == 1
+    assert cache.get_stats()["refreshes"] == 2
+
+
+def test_cache_without_insert_columns_leaves_unknown_keys_unresolved(engine):
+    """Without insert_columns, unknown keys resolve to NaN instead of being added."""
+
+    cache = DimensionCache("s_gamma.botanist", "botanist_name", "botanist_id")
+    readings = make_transformed_readings(2)
+    readings["botanist_name"] = ["Nobody", "Eliza Andrews"]
+
+    with engine.connect() as conn:
+        botanist_ids = cache.resolve(conn, readings)
+
+    assert botanist_ids.isna().tolist() == [True, False]
+    assert update_reading(engine, readings, botanist_cache=cache) == 1
+
+
+def test_batch_size_is_capped_by_the_parameter_limit(engine):
+    """Batches larger than SQL Server's parameter limit allows should be split."""
+
+    assert update_reading(engine, make_transformed_readings(800), batch_size=5000) == 800
+    assert len(fetch_readings(engine)) == 800
+
+
+def test_upsert_skips_readings_already_stored(engine):
+    """Loading the same cycle twice in upsert mode should store it once."""
+
+    readings = make_transformed_readings(102)
+
+    assert update_reading(engine, readings, load_mode="upsert") == 102
+    assert update_reading(engine, readings, load_mode="upsert") == 0
+    assert len(fetch_readings(engine)) == 102
+
+
+def test_upsert_inserts_only_new_readings_of_overlapping_cycles(engine):
+    """A cycle overlapping the previous one should only add its new readings."""
+
+    readings = make_transformed_readings(153)
+    update_reading(engine, readings.iloc[:102], load_mode="upsert")
+
+    assert update_reading(engine, readings.iloc[51:], load_mode="upsert") == 51
+    assert len(fetch_readings(engine)) == 153
+
+
+def test_upsert_keeps_first_of_repeated_readings(engine):
+    """A reading repeated within one cycle should be stored once."""
+
+    readings = make_transformed_readings(2)
+    repeated = pd.concat([readings, readings.iloc[[0]]], ignore_index=True)
+
+    assert update_reading(engine, repeated, load_mode="upsert") == 2
+
+
+def test_upsert_isolates_failing_rows(engine):
+    """A reading the database rejects should not stop the merge of the rest."""
+
+    readings = make_transformed_readings(10)
+    update_reading(engine, readings.iloc[:3], load_mode="upsert")
+    readings.loc[5, "plant_id"] = 999
+
+    assert update_reading(engine, readings, load_mode="upsert") == 6
+    assert len(fetch_readings(engine)) == 9
+
+
+def test_upsert_skips_readings_the_staging_table_rejects(engine):
+    """A value overflowing a staging column should only skip its own reading."""
+
+    def reject_overflow(conn, cursor, statement, parameters, *_):
+        # SQL Server rejects 100 in DECIMAL(4,2), which SQLite does not enforce
+        if "reading_staging" in statement and 100 in parameters:
+            raise DataError(statement, parameters, ValueError("arithmetic overflow"))
+
+    event.listen(engine, "before_cursor_execute", reject_overflow)
+    readings = make_transformed_readings(10)
+    readings.loc[3, "soil_moisture"] = 100
+
+    assert update_reading(engine, readings, load_mode="upsert") == 9
+    assert len(fetch_readings(engine)) == 9
+
+
+def test_append_mode_skips_duplicates_through_the_unique_index(engine):
+    """In append mode a stored reading fails its batch, then is skipped row by row."""
+
+    readings = make_transformed_readings(4)
+    update_reading(engine, readings.iloc[:1])
+
+    assert update_reading(engine, readings) == 3
+    assert len(fetch_readings(engine)) == 4
+
+
+def test_unknown_load_mode_raises(engine):
+    """A misspelt LOAD_MODE should fail rather than silently append."""
+
+    with pytest.raises(ValueError):
+        update_reading(engine, make_transformed_readings(1), load_mode="merge")
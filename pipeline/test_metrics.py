@@ -0,0 +1,88 @@
+"""
+Testing suite for the pipeline metrics, including the cycle JSON log line
+and the Prometheus text output.
+"""
+
+import json
+
+import metrics
+from metrics import PipelineMetrics, log_cycle
+
+
+def test_stage_durations_are_recorded():
+    """Time spent in a stage should be recorded against the stage name."""
+
+    pipeline_metrics = PipelineMetrics()
+    pipeline_metrics.start_cycle()
+    with pipeline_metrics.time_stage("transform"):
+        pass
+
+    assert "transform" in pipeline_metrics.end_cycle()["stages"]
+
+
+def test_latencies_are_bucketed():
+    """Request latencies should fall into the first bucket they fit."""
+
+    pipeline_metrics = PipelineMetrics()
+    pipeline_metrics.start_cycle()
+    pipeline_metrics.observe_latencies([0.01, 0.07, 0.07, 30])
+    latency = pipeline_metrics.end_cycle()["latency"]
+
+    assert latency["le_0.05"] == 1
+    assert latency["le_0.1"] == 2
+    assert latency["le_inf"] == 1
+    assert latency["max"] == 30
+
+
+def test_overruns_are_counted(monkeypatch):
+    """Cycles longer than the cycle budget should be counted as overruns."""
+
+    pipeline_metrics = PipelineMetrics()
+    monkeypatch.setattr(metrics, "CYCLE_SECONDS", -1)
+    pipeline_metrics.start_cycle()
+    pipeline_metrics.end_cycle()
+    pipeline_metrics.start_cycle()
+    cycle_metrics = pipeline_metrics.end_cycle()
+
+    assert cycle_metrics["overrun"]
+    assert cycle_metrics["cycle_overruns_total"] == 2
+
+
+def test_counters_are_totalled_for_prometheus():
+    """Row counts should add up across cycles in the Prometheus output."""
+
+    pipeline_metrics = PipelineMetrics()
+    for _ in range(2):
+        pipeline_metrics.start_cycle()
+        pipeline_metrics.count("rows_inserted", 40)
+        pipeline_metrics.observe_latencies([0.2])
+        pipeline_metrics.end_cycle()
+    text = pipeline_metrics.to_prometheus()
+
+    assert "plant_pipeline_rows_inserted_total 80" in text
+    assert 'plant_pipeline_request_latency_seconds_bucket{le="0.25"} 2' in text
+    assert "plant_pipeline_request_latency_seconds_count 2" in text
+
+
+def test_cycle_is_logged_as_one_json_line(capsys):
+    """Each cycle should be written as a single parseable JSON line."""
+
+    pipeline_metrics = PipelineMetrics()
+    pipeline_metrics.start_cycle()
+    log_cycle(pipeline_metrics.end_cycle())
+    lines = capsys.readouterr().out.splitlines()
+
+    assert len(lines) == 1
+    assert json.loads(lines[0])["event"] == "pipeline_cycle"
+
+
+def test_ended_cycle_is_a_copy():
+    """Stages recorded after a cycle ends should not change the logged cycle."""
+
+    pipeline_metrics = PipelineMetrics()
+    pipeline_metrics.start_cycle()
+    pipeline_metrics.add_stage_seconds("load", 1.0)
+    cycle_metrics = pipeline_metrics.end_cycle()
+    pipeline_metrics.add_stage_seconds("load", 1.0)
+
+    assert cycle_metrics["stages"] == {"load": 1.0}
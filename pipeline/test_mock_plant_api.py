@@ -0,0 +1,100 @@
+"""
+Testing suite for the local mock plant API, running the asyncio extractor
+against it end to end.
+"""
+
+import random
+import socket
+
+import pytest
+import requests
+
+import async_extract
+import http_client
+from mock_plant_api import MockConfig, MockPlantAPI, make_plant_payload, start_in_thread
+
+
+def get_free_port() -> int:
+    """Returns a local port nobody is listening on."""
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(name="mock_api")
+def running_mock_api(monkeypatch):
+    """Starts a fast mock API with malformed responses and errors, pointing the extractor at it."""
+
+    api = MockPlantAPI(MockConfig(plants=30, latency_median=0.001,
+                                  error_rate=0.2, malformed_rate=0.2))
+    port = get_free_port()
+    stop_server = start_in_thread(api, port)
+    monkeypatch.setattr(async_extract, "BASE_URL",
+                        f"http://127.0.0.1:{port}/plants/")
+    yield api
+    stop_server.set()
+
+
+@pytest.fixture(name="extract_session")
+def persistent_extract_session(monkeypatch):
+    """Fixture with its own persistent event loop and session, and fresh counters."""
+
+    monkeypatch.setattr(http_client, "_async_counters",
+                        {"requests": 0, "new_connections": 0, "reused_connections": 0})
+    extract_session = async_extract.ExtractSession()
+    yield extract_session
+    extract_session.close()
+
+
+def test_payload_matches_documented_shape():
+    """Generated plants should carry the keys of the documented example response."""
+
+    payload = make_plant_payload(5, random.Random(0))
+
+    assert set(payload) == {"botanist", "images", "last_watered", "name",
+                            "origin_location", "plant_id", "recording_taken",
+                            "scientific_name", "soil_moisture", "temperature"}
+    assert "images" not in make_plant_payload(3, random.Random(0))
+
+
+def test_timed_out_requests_are_not_malformed():
+    """A slow response should still carry a plant when no malformed bodies are configured."""
+
+    api = MockPlantAPI(MockConfig(plants=5, timeout_rate=1, timeout_seconds=0.01,
+                                  malformed_rate=0, error_rate=0))
+    port = get_free_port()
+    stop_server = start_in_thread(api, port)
+    try:
+        responses = [requests.get(f"http://127.0.0.1:{port}/plants/{plant_id}", timeout=5)
+                     for plant_id in range(5)]
+    finally:
+        stop_server.set()
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert [response.json()["plant_id"] for response in responses] == list(range(5))
+
+
+def test_extractor_survives_error_mix(mock_api, extract_session):
+    """Every plant should be requested once and errors should become rows or be dropped."""
+
+    readings = async_extract.extract_all_plant_details(
+        list(range(35)), extract_session=extract_session)
+
+    assert len(mock_api.request_log) == 35
+    assert set(readings["plant_id"]) <= set(range(35))
+    assert (readings.loc[readings["plant_id"] >= 30, "error"] == "plant not found").all()
+    assert readings["error"].isnull().sum() > 0
+
+
+def test_connections_are_reused_across_cycles(mock_api, extract_session):
+    """A second cycle should reuse the keep-alive connections of the first."""
+
+    for _ in range(2):
+        async_extract.extract_all_plant_details(list(range(30)), concurrency=10,
+                                                extract_session=extract_session)
+    stats = http_client.get_connection_stats()
+
+    assert stats["requests"] == 60
+    assert stats["new_connections"] <= 10
+    assert stats["reused_connections"] >= 50
@@ -0,0 +1,105 @@
+"""
+Testing suite for the errored plant cache, including backoff per error class
+and skip counting.
+"""
+
+import pandas as pd
+import pytest
+
+from negative_cache import NegativeCache
+from multi_extract import DEADLINE_ERROR
+
+
+@pytest.fixture(name="error_readings")
+def readings_with_errors():
+    """Fixture with the three steady-state errors from the API and a valid plant."""
+
+    return pd.DataFrame([
+        {"plant_id": 7, "error": "plant not found"},
+        {"plant_id": 15, "error": "plant sensor fault"},
+        {"plant_id": 43, "error": "plant on loan to another museum"},
+        {"plant_id": 1, "error": None, "temperature": 12.0},
+    ])
+
+
+def test_errored_plants_are_skipped(error_readings):
+    """Plants that just returned an error should not be polled next cycle."""
+
+    cache = NegativeCache()
+    cache.record_readings(error_readings, now=0)
+
+    assert cache.filter_plant_ids([1, 7, 15, 43], now=60) == [1]
+    assert cache.skipped_last_cycle == 3
+
+
+def test_sensor_fault_retries_before_not_found(error_readings):
+    """Sensor faults should back off for minutes, missing plants for hours."""
+
+    cache = NegativeCache()
+    cache.record_readings(error_readings, now=0)
+
+    assert cache.filter_plant_ids([7, 15], now=3 * 60) == [15]
+    assert cache.filter_plant_ids([7, 15], now=60 * 60) == [7, 15]
+
+
+def test_backoff_doubles_on_repeated_errors():
+    """Each consecutive error of the same class should double the backoff."""
+
+    cache = NegativeCache()
+    cache.record_error(15, "plant sensor fault", now=0)
+    cache.record_error(15, "plant sensor fault", now=0)
+
+    assert cache.entries[15]["retry_at"] == 4 * 60
+
+
+def test_backoff_is_capped():
+    """The backoff should never exceed the class maximum."""
+
+    cache = NegativeCache()
+    for _ in range(20):
+        cache.record_error(15, "plant sensor fault", now=0)
+
+    assert cache.entries[15]["retry_at"] == 30 * 60
+
+
+def test_recovered_plant_is_cleared(error_readings):
+    """A plant answering without an error should be polled every cycle again."""
+
+    cache = NegativeCache()
+    cache.record_readings(error_readings, now=0)
+    cache.record_readings(pd.DataFrame(
+        [{"plant_id": 15, "error": None}]), now=200)
+
+    assert 15 not in cache.entries
+
+
+def test_failed_requests_are_not_cached():
+    """Rows without a plant id (failed requests) should not be cached."""
+
+    cache = NegativeCache()
+    cache.record_readings(pd.DataFrame([{}, {"plant_id": 2, "error": None}]))
+
+    assert not cache.entries
+
+
+def test_skips_are_counted_across_cycles(error_readings):
+    """The total skip count should add up over cycles."""
+
+    cache = NegativeCache()
+    cache.record_readings(error_readings, now=0)
+    cache.filter_plant_ids([1, 7, 15, 43], now=60)
+    cache.filter_plant_ids([1, 7, 15, 43], now=100)
+
+    assert cache.get_stats() == {"cached_plants": 3,
+                                 "skipped_last_cycle": 3,
+                                 "skipped_total": 6}
+
+
+def test_deadline_misses_are_not_cached():
+    """Plants that missed the cycle deadline should be polled again next cycle."""
+
+    cache = NegativeCache()
+    cache.record_readings(pd.DataFrame(
+        [{"plant_id": 2, "error": DEADLINE_ERROR}]), now=0)
+
+    assert cache.filter_plant_ids([2], now=1) == [2]
@@ -0,0 +1,194 @@
+"""
+Testing suite for the pipeline script, using fake extract and load stages
+so no API or database is needed.
+"""
+
+import asyncio
+
+from sqlalchemy.exc import OperationalError
+
+import pipeline
+from plant_reading import PlantReading, readings_to_frame
+from negative_cache import NegativeCache
+from rolling_stats import RollingStats
+from spool import Spool
+
+
+def fake_reading(plant_id: int, temperature: float = 12.0) -> PlantReading:
+    """Returns an extracted reading in the shape produced by the extract scripts."""
+
+    return PlantReading(
+        plant_id=plant_id,
+        plant_name=f"fake_flower_{plant_id}",
+        soil_moisture=30.0,
+        temperature=temperature,
+        last_watered="Wed, 20 Dec 2023 14:10:54 GMT",
+        recording_taken="2023-12-21 10:20:34",
+        botanist_name="fake_name",
+        botanist_mobile="fake_phone",
+        botanist_email="fake_email")
+
+
+def use_fake_stages(monkeypatch, readings: list[PlantReading]) -> list:
+    """Replaces the extract and load stages, returning the list of loaded batches."""
+
+    loaded_batches = []
+
+    async def fake_stream(plant_ids, **_):
+        for plant_id, reading in zip(plant_ids, readings):
+            yield plant_id, reading
+
+    def fake_update_reading(connection, new_data):
+        loaded_batches.append(new_data)
+        return len(new_data)
+
+    monkeypatch.setattr(pipeline, "stream_plant_details", fake_stream)
+    monkeypatch.setattr(pipeline, "update_reading", fake_update_reading)
+    return loaded_batches
+
+
+def test_stream_cycle_loads_micro_batches(monkeypatch):
+    """Readings should be loaded in batches of MICRO_BATCH_SIZE plus a final flush."""
+
+    loaded_batches = use_fake_stages(
+        monkeypatch, [fake_reading(plant_id) for plant_id in range(5)])
+    monkeypatch.setattr(pipeline, "MICRO_BATCH_SIZE", 2)
+
+    asyncio.run(pipeline.stream_cycle(None, list(range(5))))
+
+    assert [len(batch) for batch in loaded_batches] == [2, 2, 1]
+    assert list(loaded_batches[0].columns) == pipeline.READING_COLUMNS
+
+
+def test_stream_cycle_flushes_partial_batch_on_time(monkeypatch):
+    """A partial batch should be loaded after MICRO_BATCH_SECONDS, without
+    waiting for the next response to arrive."""
+
+    loaded_batches = use_fake_stages(monkeypatch, [])
+    batches_before_second_reading = []
+
+    async def slow_stream(plant_ids, **_):
+        yield 0, fake_reading(0)
+        await asyncio.sleep(0.3)
+        batches_before_second_reading.append(len(loaded_batches))
+        yield 1, fake_reading(1)
+
+    monkeypatch.setattr(pipeline, "stream_plant_details", slow_stream)
+    monkeypatch.setattr(pipeline, "MICRO_BATCH_SECONDS", 0.05)
+
+    asyncio.run(pipeline.stream_cycle(None, [0, 1]))
+
+    assert batches_before_second_reading == [1]
+    assert [list(batch["plant_id"]) for batch in loaded_batches] == [[0], [1]]
+
+
+def test_stream_cycle_drops_invalid_readings(monkeypatch):
+    """Readings failing validation should never reach the load stage."""
+
+    loaded_batches = use_fake_stages(
+        monkeypatch, [fake_reading(0), fake_reading(1, temperature=-5), None])
+
+    asyncio.run(pipeline.stream_cycle(None, [0, 1, 2]))
+
+    assert len(loaded_batches) == 1
+    assert list(loaded_batches[0]["plant_id"]) == [0]
+
+
+def test_stream_cycle_updates_error_cache(monkeypatch):
+    """Errored readings seen while streaming should be recorded in the cache."""
+
+    use_fake_stages(monkeypatch, [fake_reading(0),
+                                  PlantReading(plant_id=7, error="plant not found")])
+    error_cache = NegativeCache()
+
+    asyncio.run(pipeline.stream_cycle(None, [0, 7], error_cache))
+
+    assert list(error_cache.entries) == [7]
+
+
+def test_main_returns_cycle_metrics(monkeypatch):
+    """A batch cycle should report its stage durations and row counts."""
+
+    readings = [fake_reading(0), fake_reading(1, temperature=-5),
+                PlantReading(plant_id=7, error="plant not found")]
+    monkeypatch.setattr(pipeline, "extract_all_plant_details",
+                        lambda plant_ids: readings_to_frame(readings))
+    loaded_batches = use_fake_stages(monkeypatch, [])
+
+    cycle_metrics = pipeline.main(None, [0, 1, 7])
+
+    assert set(cycle_metrics["stages"]) == {"extract", "transform", "load"}
+    assert cycle_metrics["rows_extracted"] == 3
+    assert cycle_metrics["rows_errored"] == 1
+    assert cycle_metrics["rows_dropped_validation"] == 1
+    assert cycle_metrics["rows_inserted"] == len(loaded_batches[0])
+
+
+def test_stream_cycle_adds_rolling_stats(monkeypatch):
+    """Loaded readings should carry z-scores and anomaly flags when statistics are kept."""
+
+    loaded_batches = use_fake_stages(monkeypatch, [fake_reading(0), fake_reading(1)])
+    rolling_stats = RollingStats()
+
+    asyncio.run(pipeline.stream_cycle(None, [0, 1], rolling_stats=rolling_stats))
+
+    assert "soil_moisture_z_score" in loaded_batches[0].columns
+    assert not loaded_batches[0]["temperature_anomaly"].any()
+    assert rolling_stats.get_plant_stats(1)["temperature"]["count"] == 1
+
+
+def test_main_queues_load_on_background_writer(monkeypatch):
+    """With a writer, main should queue the cleaned readings instead of loading them."""
+
+    loaded_batches = use_fake_stages(monkeypatch, [])
+    monkeypatch.setattr(pipeline, "extract_all_plant_details",
+                        lambda plant_ids: readings_to_frame([fake_reading(0), fake_reading(1)]))
+
+    class FakeWriter:
+        """Records submitted batches in place of a writer thread."""
+
+        def __init__(self):
+            self.batches = []
+
+        def submit(self, batch):
+            self.batches.append(batch)
+
+        def report_cycle(self, metrics):
+            metrics.count("rows_inserted", 7)
+
+        def get_stats(self):
+            return {"queued_batches": len(self.batches)}
+
+    writer = FakeWriter()
+    cycle_metrics = pipeline.main(None, [0, 1], writer=writer)
+
+    assert not loaded_batches
+    assert list(writer.batches[0]["plant_id"]) == [0, 1]
+    assert cycle_metrics["writer"] == {"queued_batches": 1}
+    assert cycle_metrics["rows_inserted"] == 7
+
+
+def test_next_start_keeps_fixed_schedule():
+    """Cycles should start every period from the first, skipping missed slots."""
+
+    assert pipeline.get_next_start(100, 130, period=60) == 160
+    assert pipeline.get_next_start(100, 170, period=60) == 220
+    assert pipeline.get_next_start(100, 160, period=60) == 160
+
+
+def test_main_spools_readings_when_load_fails(monkeypatch, tmp_path):
+    """With a spool, readings the database could not take should be kept for replay."""
+
+    def unavailable_database(connection, new_data):
+        raise OperationalError("INSERT", {}, ConnectionError("database unavailable"))
+
+    monkeypatch.setattr(pipeline, "update_reading", unavailable_database)
+    monkeypatch.setattr(pipeline, "extract_all_plant_details",
+                        lambda plant_ids: readings_to_frame([fake_reading(0), fake_reading(1)]))
+    spool = Spool(str(tmp_path / "spool"))
+
+    cycle_metrics = pipeline.main(None, [0, 1], spool=spool)
+
+    assert cycle_metrics["rows_inserted"] == 0
+    assert cycle_metrics["spool"]["segments"] == 1
+    assert cycle_metrics["spool"]["rows_spooled"] == 2
@@ -0,0 +1,107 @@
+"""
+Testing suite for plant id discovery and the persisted plant registry,
+using a fake probe in place of the plant API.
+"""
+
+import requests
+
+from plant_registry import (discover_plant_ids, load_registry, save_registry,
+                            refresh_registry, probe_gaps)
+
+
+class FakeProbe:
+    """Answers True for a fixed set of plant ids and records every probe."""
+
+    def __init__(self, plant_ids):
+        self.plant_ids = set(plant_ids)
+        self.probed = []
+
+    def __call__(self, plant_id):
+        self.probed.append(plant_id)
+        return plant_id in self.plant_ids
+
+
+def test_discovers_plants_from_empty_registry():
+    """All plants should be found, skipping ids the API does not know."""
+
+    real_ids = set(range(51)) - {7}
+    probe = FakeProbe(real_ids)
+
+    assert discover_plant_ids(set(), probe, max_misses=5) == real_ids
+
+
+def test_discovers_plants_past_a_gap():
+    """Plants after a short gap of missing ids should still be found."""
+
+    probe = FakeProbe(set(range(10)) | {13, 14})
+
+    assert discover_plant_ids(set(range(10)), probe, max_misses=3) == \
+        set(range(10)) | {13, 14}
+
+
+def test_stops_after_consecutive_misses():
+    """Discovery should stop after max_misses probes past the last plant."""
+
+    probe = FakeProbe(range(51))
+    discover_plant_ids(set(range(51)), probe, max_misses=4)
+
+    assert probe.probed == [51, 52, 54, 58]
+
+
+def test_thousands_of_plants_are_found_with_few_sequential_probes():
+    """A large block of new plants should be found by galloping."""
+
+    probe = FakeProbe(range(5000))
+    found = discover_plant_ids(set(range(51)), probe, max_misses=10)
+
+    assert found == set(range(5000))
+    assert len(probe.probed) < 5000 + 200
+
+
+def test_registry_round_trip(tmp_path):
+    """Saved plant ids should be loaded back unchanged."""
+
+    path = str(tmp_path / "registry.json")
+    save_registry({3, 1, 2}, path)
+
+    assert load_registry(path) == {1, 2, 3}
+
+
+def test_missing_registry_is_empty(tmp_path):
+    """A registry that has never been saved should be empty."""
+
+    assert load_registry(str(tmp_path / "missing.json")) == set()
+
+
+def test_refresh_keeps_registry_when_api_unreachable(tmp_path):
+    """A failed discovery should not shrink the registry."""
+
+    path = str(tmp_path / "registry.json")
+    save_registry({0, 1, 2}, path)
+
+    def unreachable_probe(plant_id):
+        raise requests.exceptions.ConnectionError()
+
+    assert refresh_registry(path, unreachable_probe) == [0, 1, 2]
+    assert load_registry(path) == {0, 1, 2}
+
+
+def test_gaps_below_highest_plant_are_reprobed():
+    """Only the unregistered ids below the highest known plant should be probed."""
+
+    probe = FakeProbe({3, 7})
+
+    assert probe_gaps({0, 1, 2, 5, 8}, probe) == {3, 7}
+    assert sorted(probe.probed) == [3, 4, 6, 7]
+
+
+def test_refresh_registers_plants_found_in_gaps(tmp_path):
+    """A plant that was not found when passed over should be registered on a re-probe."""
+
+    path = str(tmp_path / "registry.json")
+    save_registry({0, 1, 3}, path)
+    probe = FakeProbe({0, 1, 2, 3})
+
+    assert refresh_registry(path, probe) == [0, 1, 3]
+    assert refresh_registry(path, probe, reprobe_gaps=True) == [0, 1, 2, 3]
+    assert load_registry(path) == {0, 1, 2, 3}
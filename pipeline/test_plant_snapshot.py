@@ -0,0 +1,78 @@
+"""
+Testing suite for the plant payload snapshot used to seed the static
+tables, using a fake fetch in place of the plant API.
+"""
+
+import json
+import os
+
+import pytest
+
+from plant_snapshot import PlantSnapshot, get_plant_payloads
+
+
+class FakeFetch:
+    """Serves a fixed payload per plant id and records every fetch."""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.fetched = []
+
+    def __call__(self, plant_id):
+        self.fetched.append(plant_id)
+        payload = self.payloads.get(plant_id)
+        return None if payload is None else json.dumps(payload).encode("utf-8")
+
+
+@pytest.fixture(name="fetch")
+def fake_fetch():
+    """Fixture with two plants and one id whose response is not JSON."""
+
+    return FakeFetch({0: {"plant_id": 0, "name": "Epipremnum Aureum"},
+                      1: {"plant_id": 1, "name": "Venus flytrap"}})
+
+
+def test_each_plant_is_fetched_once(tmp_path, fetch):
+    """A second read of the snapshot should not call the API again."""
+
+    first = get_plant_payloads([0, 1], str(tmp_path), fetch)
+    second = get_plant_payloads([0, 1], str(tmp_path), fetch)
+
+    assert first == second == {0: {"plant_id": 0, "name": "Epipremnum Aureum"},
+                               1: {"plant_id": 1, "name": "Venus flytrap"}}
+    assert sorted(fetch.fetched) == [0, 1]
+
+
+def test_plants_without_json_are_left_out(tmp_path, fetch):
+    """An id the API answers without JSON should not appear in the snapshot."""
+
+    payloads = get_plant_payloads([0, 1, 2], str(tmp_path), fetch)
+
+    assert list(payloads) == [0, 1]
+
+
+def test_refresh_reports_only_changed_payloads(tmp_path, fetch):
+    """Refetching should count only payloads whose hash changed."""
+
+    snapshot = PlantSnapshot(str(tmp_path))
+    snapshot.update([0, 1], fetch)
+    fetch.payloads[1] = {"plant_id": 1, "name": "Venus flytrap", "images": None}
+
+    counts = snapshot.update([0, 1], fetch, refresh=True)
+
+    assert counts == {"fetched": 2, "changed": 1}
+    assert PlantSnapshot(str(tmp_path)).get_payloads()[1]["images"] is None
+
+
+def test_damaged_payload_is_fetched_again(tmp_path, fetch):
+    """A cached payload that no longer matches its hash should be refetched."""
+
+    PlantSnapshot(str(tmp_path)).update([0, 1], fetch)
+    with open(os.path.join(str(tmp_path), "0.json"), "wb") as payload_file:
+        payload_file.write(b'{"plant_id": 0, "na')
+    fetch.fetched.clear()
+
+    payloads = get_plant_payloads([0, 1], str(tmp_path), fetch)
+
+    assert fetch.fetched == [0]
+    assert payloads[0]["name"] == "Epipremnum Aureum"
@@ -0,0 +1,111 @@
+"""
+Testing suite for the shared reading queries, run against the SQLite
+stand-in for the plants database.
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import sql
+
+from reading_queries import (build_readings_query, delete_readings_before, get_day_range,
+                             get_latest_recordings, get_readings, get_readings_for_day,
+                             get_readings_since)
+from sqlite_standin import create_standin_engine
+
+
+RECORDING_TIMES = [datetime(2023, 12, 20, 23, 59, 59), datetime(2023, 12, 21, 0, 0, 0),
+                   datetime(2023, 12, 21, 13, 30, 0), datetime(2023, 12, 22, 0, 0, 0)]
+
+
+@pytest.fixture(name="engine")
+def standin_engine():
+    """Fixture with one reading of plants 0 and 1 at each of RECORDING_TIMES."""
+
+    engine = create_standin_engine()
+    with engine.begin() as conn:
+        conn.execute(sql.text(
+            """INSERT INTO s_gamma.reading (plant_id, botanist_id, soil_moisture,
+            temperature, recording_taken, last_watered)
+            VALUES (:plant_id, 1, 50, 12, :recording_taken, NULL)"""),
+            [{"plant_id": plant_id, "recording_taken": recording_taken}
+             for plant_id in (0, 1) for recording_taken in RECORDING_TIMES])
+    return engine
+
+
+def test_day_range_is_half_open():
+    """A day should run from its midnight up to, not including, the next."""
+
+    assert get_day_range(date(2023, 12, 21)) == (datetime(2023, 12, 21),
+                                                 datetime(2023, 12, 22))
+
+
+def test_readings_for_day_include_only_that_day(engine):
+    """Readings at the start of the day are included and at the next midnight are not."""
+
+    with engine.connect() as conn:
+        readings = get_readings_for_day(conn, date(2023, 12, 21))
+
+    assert len(readings) == 4
+    assert sorted(readings["recording_taken"].astype(str).unique()) == [
+        "2023-12-21 00:00:00", "2023-12-21 13:30:00"]
+
+
+def test_readings_can_be_limited_to_plants(engine):
+    """Passing plant_ids should return only those plants' readings."""
+
+    with engine.connect() as conn:
+        readings = get_readings(conn, datetime(2023, 12, 20), datetime(2023, 12, 23), [1])
+
+    assert readings["plant_id"].tolist() == [1, 1, 1, 1]
+    assert list(readings.columns) == ["reading_id", "plant_id", "botanist_id", "soil_moisture",
+                                      "temperature", "recording_taken", "last_watered"]
+
+
+def test_readings_since_have_no_upper_bound(engine):
+    """Without an end, readings recorded after now should still be returned."""
+
+    with engine.begin() as conn:
+        conn.execute(sql.text(
+            """INSERT INTO s_gamma.reading (plant_id, botanist_id, recording_taken)
+            VALUES (0, 1, :recording_taken)"""),
+            {"recording_taken": datetime.now() + timedelta(hours=1)})
+        readings = get_readings_since(conn, datetime(2023, 12, 22))
+
+    assert len(readings) == 3
+
+
+def test_latest_recordings_per_plant(engine):
+    """Each plant's latest recording_taken should be returned."""
+
+    with engine.connect() as conn:
+        latest = dict(get_latest_recordings(conn))
+
+    assert latest == {0: "2023-12-22 00:00:00", 1: "2023-12-22 00:00:00"}
+
+
+def test_delete_readings_before_keeps_later_readings(engine):
+    """Deleting before a time should keep readings recorded at or after it."""
+
+    with engine.begin() as conn:
+        deleted = delete_readings_before(conn, datetime(2023, 12, 22))
+        remaining = conn.execute(sql.text("SELECT COUNT(*) FROM s_gamma.reading")).scalar()
+
+    assert deleted == 6
+    assert remaining == 2
+
+
+@pytest.mark.parametrize("plant_ids, index", [(None, "ix_reading_recording"),
+                                              ([0], "ix_reading_plant_recording")])
+def test_range_queries_use_covering_indexes(engine, plant_ids, index):
+    """Range queries should be answered from an index without reading the table."""
+
+    query = str(build_readings_query()).replace(":start", "'2023-12-21'") \
+        .replace(":end", "'2023-12-22'")
+    if plant_ids is not None:
+        query = query.replace(";", "AND plant_id = 0;")
+    with engine.connect() as conn:
+        plan = " ".join(str(row[-1]) for row in
+                        conn.exec_driver_sql("EXPLAIN QUERY PLAN " + query).fetchall())
+
+    assert f"USING COVERING INDEX {index}" in plan
@@ -0,0 +1,149 @@
+"""
+Testing suite for the per-plant rolling statistics and anomaly flags.
+"""
+
+import numpy as np
+import pandas as pd
+
+from rolling_stats import RollingStats
+
+
+def make_readings(plant_ids, soil_moisture, temperature=None) -> pd.DataFrame:
+    """Returns cleaned readings with the given measurements."""
+
+    if temperature is None:
+        temperature = [20.0] * len(plant_ids)
+    return pd.DataFrame({"plant_id": plant_ids, "soil_moisture": soil_moisture,
+                         "temperature": temperature})
+
+
+def test_ewma_matches_pandas():
+    """The incremental mean and variance should match pandas' exponentially weighted ones."""
+
+    values = np.random.default_rng(0).normal(50, 5, 200)
+    stats = RollingStats(alpha=0.1)
+    for value in values:
+        stats.update(make_readings([3], [value]))
+
+    expected = pd.Series(values).ewm(alpha=0.1, adjust=False)
+    plant_stats = stats.get_plant_stats(3)["soil_moisture"]
+
+    assert np.isclose(plant_stats["mean"], expected.mean().iloc[-1])
+    assert np.isclose(plant_stats["std"] ** 2, expected.var(bias=True).iloc[-1])
+
+
+def test_spike_is_flagged_after_warm_up():
+    """A reading far outside a plant's usual range should be flagged once it has history."""
+
+    stats = RollingStats(min_samples=10, z_score_threshold=4)
+    rng = np.random.default_rng(1)
+    first = stats.update(make_readings([1], [50.0]))
+    for _ in range(20):
+        stats.update(make_readings([1, 2], rng.normal(50, 1, 2)))
+
+    result = stats.update(make_readings([1, 2], [10.0, 50.0]))
+
+    assert not first["soil_moisture_anomaly"].any()
+    assert result["soil_moisture_anomaly"].tolist() == [True, False]
+    assert result["soil_moisture_z_score"][0] < -4
+    assert stats.anomalies_last_cycle == 1
+
+
+def test_no_flags_before_enough_samples():
+    """New plants should not be flagged until their statistics have warmed up."""
+
+    stats = RollingStats(min_samples=10)
+    for value in [50.0, 51.0, 49.0, 90.0]:
+        result = stats.update(make_readings([1], [value]))
+
+    assert not result["soil_moisture_anomaly"].any()
+
+
+def test_repeated_plant_in_one_frame_is_applied_in_order():
+    """Several readings of a plant in one frame should equal updating one at a time."""
+
+    values = [50.0, 52.0, 47.0, 55.0]
+    batched = RollingStats()
+    batched.update(make_readings([4, 4, 9, 4, 4, 9], [50.0, 52.0, 1.0, 47.0, 55.0, 2.0]))
+    sequential = RollingStats()
+    for value in values:
+        sequential.update(make_readings([4], [value]))
+
+    assert batched.get_plant_stats(4) == sequential.get_plant_stats(4)
+    assert batched.get_plant_stats(9)["soil_moisture"]["count"] == 2
+
+
+def test_window_min_max_cover_last_readings():
+    """The sliding min and max should only cover the last window of readings."""
+
+    stats = RollingStats(window=3)
+    for value in [10.0, 60.0, 50.0, 40.0, 55.0]:
+        stats.update(make_readings([1], [value]))
+
+    plant_stats = stats.get_plant_stats(1)["soil_moisture"]
+
+    assert plant_stats["window_min"] == 40.0
+    assert plant_stats["window_max"] == 55.0
+
+
+def test_missing_values_do_not_update():
+    """Missing measurements and error rows should leave the statistics unchanged."""
+
+    stats = RollingStats()
+    stats.update(make_readings([1], [50.0]))
+    result = stats.update(make_readings([1, None], [np.nan, 20.0]))
+
+    assert stats.get_plant_stats(1)["soil_moisture"]["count"] == 1
+    assert result["soil_moisture_z_score"].isnull().all()
+
+
+def test_arrays_grow_for_new_plant_ids():
+    """Plant ids beyond the current capacity should be added without losing state."""
+
+    stats = RollingStats()
+    stats.update(make_readings([1], [50.0]))
+    stats.update(make_readings([1000], [30.0]))
+
+    assert stats.capacity >= 1001
+    assert stats.get_plant_stats(1)["soil_moisture"]["mean"] == 50.0
+
+
+def test_checkpoint_round_trip(tmp_path):
+    """Statistics should be restored from a checkpoint after a restart."""
+
+    checkpoint_path = str(tmp_path / "rolling_stats.npz")
+    stats = RollingStats()
+    for value in [50.0, 52.0, 47.0]:
+        stats.update(make_readings([1, 200], [value, value + 1]))
+    stats.save(checkpoint_path)
+
+    restored = RollingStats()
+    restored.load(checkpoint_path)
+
+    assert restored.get_plant_stats(200) == stats.get_plant_stats(200)
+
+
+def test_checkpoint_with_other_window_keeps_means(tmp_path):
+    """A changed window size should drop the windows but keep the means."""
+
+    checkpoint_path = str(tmp_path / "rolling_stats.npz")
+    stats = RollingStats(window=5)
+    stats.update(make_readings([100], [50.0]))
+    stats.save(checkpoint_path)
+
+    restored = RollingStats(window=10)
+    restored.load(checkpoint_path)
+    restored.update(make_readings([100], [40.0]))
+
+    plant_stats = restored.get_plant_stats(100)["soil_moisture"]
+    assert plant_stats["count"] == 2
+    assert plant_stats["window_min"] == plant_stats["window_max"] == 40.0
+
+
+def test_missing_checkpoint_starts_empty(tmp_path):
+    """Without a checkpoint the statistics should start empty."""
+
+    stats = RollingStats()
+    stats.load(str(tmp_path / "missing.npz"))
+
+    assert stats.get_plant_stats(1) == {}
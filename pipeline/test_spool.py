@@ -0,0 +1,245 @@
+"""
+Testing suite for the write-ahead spool, using the SQLite stand-in as the
+database and a load that fails to simulate an outage.
+"""
+
+import os
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy.exc import DataError, OperationalError
+
+from benchmark_load import make_transformed_readings
+from load import BOTANIST_CACHE, update_reading
+from spool import (Spool, SpoolReplayer, decode_batch, encode_batch, read_segment,
+                   RECORD_HEADER, UNREADABLE_DIR)
+from sqlite_standin import create_standin_engine
+from test_load import fetch_readings
+
+
+def failing_load(connection, readings):
+    """Stands in for update_reading while the database is unreachable."""
+
+    raise OperationalError("INSERT", {}, ConnectionError("database unavailable"))
+
+
+@pytest.fixture(name="engine")
+def standin_engine():
+    """Fixture with an empty reading table, three botanists and 51 plants."""
+
+    BOTANIST_CACHE.clear()
+    return create_standin_engine()
+
+
+@pytest.fixture(name="spool")
+def empty_spool(tmp_path):
+    """Fixture with an empty spool in a temporary directory."""
+
+    return Spool(str(tmp_path / "spool"))
+
+
+def test_batches_survive_encoding():
+    """Decoding a record should give back the load columns, missing values included."""
+
+    readings = make_transformed_readings(4)
+    readings.loc[0, "soil_moisture"] = np.nan
+    readings.loc[1, "last_watered"] = pd.NaT
+    readings["botanist_name"] = readings["botanist_name"].astype(object)
+    readings.loc[2, "botanist_name"] = None
+
+    decoded = decode_batch(encode_batch(readings))
+
+    for column in ("plant_id", "soil_moisture", "temperature"):
+        pd.testing.assert_series_equal(decoded[column], readings[column], check_dtype=False)
+    for column in ("last_watered", "recording_taken"):
+        pd.testing.assert_series_equal(decoded[column],
+                                       readings[column].astype("datetime64[ns]"))
+    assert decoded["botanist_name"].tolist() == ["Carl Linnaeus", "Eliza Andrews",
+                                                 None, "Eliza Andrews"]
+    assert decoded["error"].isna().all()
+
+
+def test_torn_record_is_ignored(spool):
+    """A segment cut short by a crash should yield only its complete records."""
+
+    segment_path = spool.append(make_transformed_readings(3))
+    with open(segment_path, "rb+") as segment_file:
+        segment_file.truncate(os.path.getsize(segment_path) - 5)
+
+    assert not read_segment(segment_path)
+
+
+def test_loaded_batch_leaves_nothing_spooled(engine, spool):
+    """A batch written to the database should be removed from the spool."""
+
+    assert spool.load(engine, make_transformed_readings(51)) == 51
+
+    assert spool.get_stats()["segments"] == 0
+    assert not os.listdir(spool.directory)
+
+
+def test_failed_batch_is_kept_and_replayed(engine, spool):
+    """A batch the database rejected should be written once it is back."""
+
+    assert spool.load(engine, make_transformed_readings(51), failing_load) == 0
+    assert spool.get_stats()["segments"] == 1
+
+    assert spool.replay(engine) == 51
+    assert len(fetch_readings(engine)) == 51
+    stats = spool.get_stats()
+    assert stats["segments"] == 0
+    assert stats["rows_replayed"] == 51
+    assert stats["replay_rows_per_second"] > 0
+
+
+def test_batches_wait_behind_a_backlog(engine, spool):
+    """While older batches wait for replay, new ones are spooled in order
+    without trying the database."""
+
+    readings = make_transformed_readings(102)
+    spool.load(engine, readings.iloc[:51], failing_load)
+
+    assert spool.load(engine, readings.iloc[51:]) == 0
+    assert spool.get_stats()["segments"] == 2
+    assert not fetch_readings(engine)
+
+    assert spool.replay(engine) == 102
+    assert len(fetch_readings(engine)) == 102
+
+
+def test_replay_stops_while_database_is_down(engine, spool):
+    """A failed replay should keep every segment for the next attempt."""
+
+    spool.load(engine, make_transformed_readings(51), failing_load)
+
+    assert spool.replay(engine, failing_load) == 0
+    assert spool.get_stats()["segments"] == 1
+    assert spool.get_stats()["last_replay_error"] == "OperationalError"
+
+
+def test_replay_does_not_duplicate_stored_readings(engine, spool):
+    """Readings both spooled and stored, e.g. after a crash, are upserted once."""
+
+    readings = make_transformed_readings(51)
+    update_reading(engine, readings)
+    spool.load(engine, readings, failing_load)
+
+    spool.replay(engine)
+
+    assert len(fetch_readings(engine)) == 51
+
+
+def test_replay_merges_segments_into_large_batches(engine, tmp_path):
+    """Segments should be combined until replay_rows readings per write."""
+
+    spool = Spool(str(tmp_path / "spool"), replay_rows=100)
+    readings = make_transformed_readings(153)
+    for start in range(0, 153, 51):
+        spool.load(engine, readings.iloc[start:start + 51], failing_load)
+
+    batch_sizes = []
+    spool.replay(engine, lambda connection, batch: batch_sizes.append(len(batch)))
+
+    assert batch_sizes == [102, 51]
+
+
+def test_oldest_segments_are_dropped_over_the_size_bound(engine, tmp_path):
+    """A spool over max_bytes should drop its oldest batches first."""
+
+    spool = Spool(str(tmp_path / "spool"), max_bytes=3000)
+    readings = make_transformed_readings(102)
+    spool.load(engine, readings.iloc[:51], failing_load)
+    spool.load(engine, readings.iloc[51:], failing_load)
+
+    assert spool.get_stats()["segments"] == 1
+    assert spool.get_stats()["rows_evicted"] == 51
+    spool.replay(engine)
+    assert {row[4] for row in fetch_readings(engine)} == {"2023-12-21 10:01:00"}
+
+
+def test_pending_segments_are_recovered(engine, tmp_path):
+    """A batch pending when the pipeline died should be replayed after a restart."""
+
+    spool = Spool(str(tmp_path / "spool"))
+    spool.append(make_transformed_readings(51))
+
+    restarted = Spool(str(tmp_path / "spool"))
+
+    assert restarted.replay(engine) == 51
+
+
+def test_unreadable_segment_is_set_aside(engine, spool):
+    """A segment that cannot be decoded should be moved aside, not block the replay."""
+
+    readings = make_transformed_readings(102)
+    spool.load(engine, readings.iloc[:51], failing_load)
+    spool.load(engine, readings.iloc[51:], failing_load)
+    unreadable_path = spool.get_segments()[-1]
+    payload = encode_batch(readings.iloc[51:]).replace(b"RDSP", b"XXXX", 1)
+    with open(unreadable_path, "wb") as segment_file:
+        segment_file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+
+    assert spool.replay(engine) == 51
+    assert spool.get_stats()["segments"] == 0
+    assert spool.get_stats()["segments_unreadable"] == 1
+    assert os.listdir(os.path.join(spool.directory, UNREADABLE_DIR)) == \
+        [os.path.basename(unreadable_path)]
+
+
+def test_segment_rejected_on_its_own_is_set_aside(engine, tmp_path):
+    """A segment the database keeps rejecting should be moved aside after
+    max_replay_attempts, without holding back the segments around it."""
+
+    def rejecting_load(connection, readings):
+        """Rejects any write holding the bad segment's readings."""
+        if (readings["temperature"] == 99).any():
+            raise DataError("INSERT", {}, ValueError("arithmetic overflow"))
+        return update_reading(connection, readings, load_mode="upsert")
+
+    spool = Spool(str(tmp_path / "spool"), max_replay_attempts=2)
+    readings = make_transformed_readings(153)
+    readings.loc[51:101, "temperature"] = 99
+    for start in range(0, 153, 51):
+        spool.load(engine, readings.iloc[start:start + 51], failing_load)
+
+    assert spool.replay(engine, rejecting_load) == 0
+    assert spool.get_stats()["segments"] == 3
+
+    assert spool.replay(engine, rejecting_load) == 102
+    assert spool.get_stats()["segments"] == 0
+    assert spool.get_stats()["segments_unreadable"] == 1
+    assert len(os.listdir(os.path.join(spool.directory, UNREADABLE_DIR))) == 1
+    assert len(fetch_readings(engine)) == 102
+
+
+def test_replayer_survives_unexpected_errors():
+    """An error other than a database error should be logged, not stop the thread."""
+
+    class FlakySpool:
+        """Raises on its first replay, then counts replays."""
+
+        def __init__(self):
+            self.replays = 0
+            self.last_replay_error = None
+
+        def replay(self, connection):
+            """Fails the first time it is called."""
+            self.replays += 1
+            if self.replays == 1:
+                raise RuntimeError("unexpected")
+            return 0
+
+    flaky_spool = FlakySpool()
+    replayer = SpoolReplayer(flaky_spool, None, interval=0.01)
+    replayer.start()
+    deadline = time.time() + 5
+    while flaky_spool.replays < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    replayer.stop()
+
+    assert flaky_spool.replays >= 3
+    assert flaky_spool.last_replay_error == "RuntimeError"
+    assert not replayer.thread.is_alive()
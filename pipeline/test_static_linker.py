@@ -0,0 +1,158 @@
+"""
+Testing suite for the set-based linking of the static tables, run against
+the SQLite stand-in and compared with the previous row-by-row procedure.
+"""
+
+import pytest
+from sqlalchemy import sql
+
+from sqlite_standin import create_standin_engine
+from static_linker import get_link_rows, link_static_tables
+
+
+PAYLOADS = {
+    0: {"plant_id": 0, "name": "Epipremnum Aureum",
+        "origin_location": ["-19.32556", "-41.25528", "Resplendor", "BR", "America/Sao_Paulo"],
+        "images": {"license_name": "CC BY-SA 3.0", "medium_url": "https://img/0/medium.jpg"}},
+    1: {"plant_id": 1, "name": "Venus flytrap",
+        "origin_location": ["33.95015", "-118.03917", "South Whittier", "US", "America/Los_Angeles"],
+        "images": {"license_name": "CC BY 2.0", "medium_url": "https://img/1/medium.jpg"}},
+    # An image without a license is not linked, nor is a plant without images
+    2: {"plant_id": 2, "name": "Corpse flower",
+        "origin_location": ["7.65649", "4.92235", "Efon-Alaaye", "NG", "Africa/Lagos"],
+        "images": {"medium_url": "https://img/2/medium.jpg"}},
+    3: {"plant_id": 3, "name": "Rafflesia arnoldii", "images": None,
+        "origin_location": ["33.95015", "-118.03917", "South Whittier", "US", "America/Los_Angeles"]},
+    # A license name the license table does not hold, and no origin
+    4: {"plant_id": 4, "name": "Black bat flower",
+        "images": {"license_name": "Unknown", "medium_url": "https://img/4/medium.jpg"}},
+}
+
+
+def seed_static_tables():
+    """Returns a stand-in seeded as by populate_db_table, before linking."""
+
+    origins = {tuple(details["origin_location"]) for details in PAYLOADS.values()
+               if "origin_location" in details}
+    engine = create_standin_engine(plant_count=0)
+    with engine.begin() as conn:
+        conn.execute(sql.text("""INSERT INTO s_gamma.license (license_name, license_url, license)
+                              VALUES (:name, :url, 1)"""),
+                     [{"name": "CC BY-SA 3.0", "url": "https://cc/by-sa/3.0"},
+                      {"name": "CC BY 2.0", "url": "https://cc/by/2.0"},
+                      # Seeded twice with different urls
+                      {"name": "CC BY 2.0", "url": "https://cc/by/2.0/deed"}])
+        conn.execute(sql.text("INSERT INTO s_gamma.image (medium_url) VALUES (:url)"),
+                     [{"url": f"https://img/{plant_id}/medium.jpg"} for plant_id in (0, 1, 2, 4)])
+        conn.execute(sql.text("""INSERT INTO s_gamma.origin
+                              (country_code, latitude, longitude, location, region)
+                              VALUES (:code, :latitude, :longitude, :location, :region)"""),
+                     [{"code": code, "latitude": latitude, "longitude": longitude,
+                       "location": location, "region": region}
+                      for latitude, longitude, location, code, region in sorted(origins)])
+        conn.execute(sql.text("""INSERT INTO s_gamma.plant (plant_id, plant_name)
+                              VALUES (:plant_id, :name)"""),
+                     [{"plant_id": plant_id, "name": details["name"]}
+                      for plant_id, details in PAYLOADS.items()])
+    return engine
+
+
+@pytest.fixture(name="engine")
+def seeded_engine():
+    """Fixture with the static tables seeded, before linking."""
+
+    return seed_static_tables()
+
+
+def link_row_by_row(engine, payloads: dict[int, dict]) -> None:
+    """The previous procedure of load_static_data.py: a SELECT per pair,
+    then an UPDATE and commit per match, for each relationship."""
+
+    license_pairs, image_pairs, origin_triples = set(), set(), set()
+    for details in payloads.values():
+        images = details.get("images")
+        if isinstance(images, dict) and "license_name" in images and "medium_url" in images:
+            license_pairs.add((images["license_name"], images["medium_url"]))
+            image_pairs.add((details["name"], images["medium_url"]))
+        origin = details.get("origin_location", [None, None])
+        origin_triples.add((details.get("name"), origin[0], origin[1]))
+
+    with engine.connect() as conn:
+        for license_name, medium_url in license_pairs:
+            for row in conn.execute(sql.text(
+                    "select license_id from s_gamma.license where license_name = :value"),
+                    {"value": license_name}):
+                conn.execute(sql.text("""update s_gamma.image set license_id = :new_value
+                                      where medium_url = :condition_value"""),
+                             {"new_value": row[0], "condition_value": medium_url})
+                conn.commit()
+        for plant_name, medium_url in image_pairs:
+            for row in conn.execute(sql.text(
+                    "select image_id from s_gamma.image where medium_url = :value"),
+                    {"value": medium_url}):
+                conn.execute(sql.text("""update s_gamma.plant set image_id = :new_value
+                                      where plant_name = :condition_value"""),
+                             {"new_value": row[0], "condition_value": plant_name})
+                conn.commit()
+        for plant_name, latitude, longitude in origin_triples:
+            for row in conn.execute(sql.text(
+                    """select origin_id from s_gamma.origin
+                    where latitude = :value1 and longitude = :value2"""),
+                    {"value1": latitude, "value2": longitude}):
+                conn.execute(sql.text("""update s_gamma.plant set origin_id = :new_value
+                                      where plant_name = :condition_value"""),
+                             {"new_value": row[0], "condition_value": plant_name})
+                conn.commit()
+
+
+def fetch_links(engine) -> tuple[list, list]:
+    """Returns the foreign keys of every image and plant."""
+
+    with engine.connect() as conn:
+        images = conn.execute(sql.text(
+            "SELECT image_id, license_id FROM s_gamma.image ORDER BY image_id")).fetchall()
+        plants = conn.execute(sql.text(
+            "SELECT plant_id, image_id, origin_id FROM s_gamma.plant ORDER BY plant_id")).fetchall()
+    return images, plants
+
+
+def test_links_match_row_by_row_procedure(engine):
+    """The set-based linker should leave the same foreign keys as the previous procedure."""
+
+    expected_engine = seed_static_tables()
+    link_row_by_row(expected_engine, PAYLOADS)
+
+    link_static_tables(engine, PAYLOADS)
+
+    assert fetch_links(engine) == fetch_links(expected_engine)
+
+
+def test_links_resolve_expected_ids(engine):
+    """Each plant should be linked to its image and origin, and each image to its license."""
+
+    updated = link_static_tables(engine, PAYLOADS)
+    images, plants = fetch_links(engine)
+
+    assert updated == {"image.license_id": 2, "plant.image_id": 3, "plant.origin_id": 4}
+    # Image 2 has no license name and image 4's license is not in the table
+    assert images == [(1, 1), (2, 3), (3, None), (4, None)]
+    assert plants == [(0, 1, 1), (1, 2, 2), (2, None, 3), (3, None, 2), (4, 4, None)]
+
+
+def test_link_rows_leave_out_images_without_license():
+    """Only images with both a license name and a url should be staged."""
+
+    rows = {row["plant_name"]: row for row in get_link_rows(PAYLOADS)}
+
+    assert rows["Corpse flower"]["medium_url"] is None
+    assert rows["Rafflesia arnoldii"]["license_name"] is None
+    assert rows["Black bat flower"]["latitude"] is None
+
+
+def test_no_payloads_leave_tables_unchanged(engine):
+    """Linking without payloads should not touch the tables."""
+
+    before = fetch_links(engine)
+
+    assert link_static_tables(engine, {}) == {}
+    assert fetch_links(engine) == before
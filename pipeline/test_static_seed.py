@@ -0,0 +1,107 @@
+"""
+Testing suite for the bulk seeding of the static tables, run against the
+SQLite stand-in for the plants database.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import event, sql
+
+from sqlite_standin import create_standin_engine
+from static_seed import StaticSeeder, get_seed_rows
+
+
+@pytest.fixture(name="master_plant")
+def fake_master_plant():
+    """Fixture shaped like master_plant.csv, with a repeated and an empty plant."""
+
+    return pd.DataFrame({
+        "country_code": ["BR", "US", "US", np.nan],
+        "latitude": [-19.32556, 33.95015, 33.95015, np.nan],
+        "longitude": [-41.25528, -118.03917, -118.03917, np.nan],
+        "location": ["Resplendor", "South Whittier", "South Whittier", np.nan],
+        "region": ["America/Sao_Paulo", "America/Los_Angeles", "America/Los_Angeles", np.nan],
+        "botanist_name": ["Ada Hayden", "Ada Hayden", "Ynes Mexia", np.nan],
+        "botanist_phone": ["001-555-0100", "001-555-0100", np.nan, np.nan],
+        "botanist_email": ["ada.hayden@lnhm.co.uk", "ada.hayden@lnhm.co.uk",
+                           "ynes.mexia@lnhm.co.uk", np.nan],
+        "license_name": ["CC BY-SA 3.0", "CC BY 2.0", "CC BY 2.0", np.nan],
+        "license_url": ["https://cc/by-sa/3.0", "https://cc/by/2.0", "https://cc/by/2.0", np.nan],
+        "license": [5, 4, 4, np.nan],
+        "medium_url": ["https://img/0/medium.jpg", "https://img/1/medium.jpg",
+                       "https://img/2/medium.jpg", np.nan],
+        "regular_url": ["https://img/0/regular.jpg", "https://img/1/regular.jpg",
+                        np.nan, np.nan],
+        "original_url": [np.nan] * 4,
+        "small_url": [np.nan] * 4,
+        "thumbnail": [np.nan] * 4,
+    })
+
+
+@pytest.fixture(name="seeder")
+def standin_seeder():
+    """Fixture seeding a stand-in with its three sample botanists and no plants."""
+
+    return StaticSeeder(create_standin_engine(plant_count=0),
+                        tables=["origin", "botanist", "license", "image"])
+
+
+def count_rows(seeder, table: str) -> int:
+    """Returns the number of rows in a table of the seeded database."""
+
+    with seeder.engine.connect() as conn:
+        return conn.execute(sql.text(f"SELECT COUNT(*) FROM s_gamma.{table}")).scalar()
+
+
+def test_seed_rows_are_distinct_and_valid(master_plant):
+    """Repeated rows and rows without any text should be left out."""
+
+    rows = get_seed_rows(master_plant, ["license_name", "license_url", "license"])
+
+    assert rows == [{"license_name": "CC BY-SA 3.0", "license_url": "https://cc/by-sa/3.0",
+                     "license": 5.0},
+                    {"license_name": "CC BY 2.0", "license_url": "https://cc/by/2.0",
+                     "license": 4.0}]
+
+
+def test_missing_values_become_none(master_plant):
+    """NaN should be inserted as NULL, not as a float."""
+
+    rows = get_seed_rows(master_plant, ["botanist_name", "botanist_phone"])
+
+    assert rows[-1] == {"botanist_name": "Ynes Mexia", "botanist_phone": None}
+
+
+def test_dimensions_are_seeded(seeder, master_plant):
+    """Each dimension table should hold the distinct rows of its columns."""
+
+    # The stand-in's connection is shared, so its transactions cannot overlap
+    counts = seeder.seed_dimensions(master_plant, workers=1)
+
+    assert counts == {"origin": 2, "botanist": 2, "license": 2, "image": 3}
+    assert seeder.get_stats() == counts
+    assert count_rows(seeder, "botanist") == 5
+    assert count_rows(seeder, "image") == 3
+
+
+def test_each_table_is_one_insert(seeder):
+    """A table within the parameter limit should be filled by a single INSERT."""
+
+    statements = []
+    event.listen(seeder.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *_: statements.append(statement))
+    rows = [{"medium_url": f"https://img/{index}/medium.jpg", "regular_url": None}
+            for index in range(500)]
+
+    assert seeder.seed_table("image", rows) == 500
+    assert len([statement for statement in statements if statement.startswith("INSERT")]) == 1
+    assert count_rows(seeder, "image") == 500
+
+
+def test_tables_are_reflected_once(seeder):
+    """The metadata should hold one reflected table, reused by every seed."""
+
+    assert seeder.get_table("image") is seeder.get_table("image")
+    assert sorted(seeder.metadata.tables) == ["s_gamma.botanist", "s_gamma.image",
+                                              "s_gamma.license", "s_gamma.origin"]
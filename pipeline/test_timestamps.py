@@ -0,0 +1,66 @@
+"""
+Testing suite for the memoised timestamp parsing.
+"""
+
+import numpy as np
+import pandas as pd
+
+from timestamps import TimestampCache, RECORDING_TAKEN_FORMAT, LAST_WATERED_FORMAT
+
+
+def test_parse_matches_to_datetime():
+    """Parsed columns should equal pandas' own parsing, with missing values as NaT."""
+
+    values = np.array(["2023-12-21 10:20:34", None, "2023-12-21 10:21:34",
+                       "2023-12-21 10:20:34"], dtype=object)
+
+    parsed = TimestampCache(RECORDING_TAKEN_FORMAT).parse(values)
+
+    assert parsed.dtype == "datetime64[ns]"
+    np.testing.assert_array_equal(
+        parsed, pd.to_datetime(values, format=RECORDING_TAKEN_FORMAT).to_numpy())
+
+
+def test_only_unique_values_are_parsed():
+    """Repeated strings should be parsed once, and served from the cache next cycle."""
+
+    cache = TimestampCache(LAST_WATERED_FORMAT)
+    values = np.array(["Wed, 20 Dec 2023 14:10:54 GMT"] * 50
+                      + ["Wed, 20 Dec 2023 15:10:54 GMT"] * 50, dtype=object)
+
+    cache.parse(values)
+    assert cache.get_stats() == {"cached_timestamps": 2, "hits": 0, "misses": 2}
+
+    cache.parse(values)
+    assert cache.get_stats() == {"cached_timestamps": 2, "hits": 2, "misses": 2}
+
+
+def test_least_recently_used_is_evicted():
+    """The cache should stay within its size, keeping the most recently used strings."""
+
+    cache = TimestampCache(RECORDING_TAKEN_FORMAT, max_size=2)
+    cache.parse_value("2023-12-21 10:00:00")
+    cache.parse_value("2023-12-21 10:01:00")
+    cache.parse_value("2023-12-21 10:00:00")
+    cache.parse_value("2023-12-21 10:02:00")
+
+    assert list(cache.parsed) == ["2023-12-21 10:00:00", "2023-12-21 10:02:00"]
+
+
+def test_parse_value_handles_missing():
+    """A single missing timestamp should stay None, and present ones become Timestamps."""
+
+    cache = TimestampCache(RECORDING_TAKEN_FORMAT)
+
+    assert cache.parse_value(None) is None
+    assert cache.parse_value("2023-12-21 10:20:34") == pd.Timestamp("2023-12-21 10:20:34")
+
+
+def test_parsed_columns_are_passed_through():
+    """Columns that are already datetimes should not be parsed again."""
+
+    values = pd.to_datetime(["2023-12-21 10:20:34"]).to_numpy()
+    cache = TimestampCache(RECORDING_TAKEN_FORMAT)
+
+    np.testing.assert_array_equal(cache.parse(values), values)
+    assert cache.misses == 0
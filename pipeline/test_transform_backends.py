@@ -0,0 +1,77 @@
+"""
+Parity tests for the transform backends: the polars backend should clean
+every fixture of the transform test suite exactly like the pandas backend.
+"""
+
+import pandas as pd
+import pytest
+
+from transform_readings import clean_reading_data, get_transform_backend
+from validation_rules import ValidationRules
+# pylint: disable=unused-import
+from test_transform_readings import (df, df_negative_soil_temp, df_zero_soil_temp,
+                                     df_high_soil_temp, df_error, to_plant_reading)
+from plant_reading import readings_to_frame
+
+pytest.importorskip("polars")
+
+FIXTURE_NAMES = ["fake_df", "fake_df_negative_soil_temp", "fake_df_zero_soil_temp",
+                 "fake_df_high_soil_temp", "fake_df_error"]
+
+
+@pytest.mark.parametrize("fixture_name", FIXTURE_NAMES)
+def test_polars_matches_pandas(fixture_name, request):
+    """Both backends should return identical frames, including dtypes and index."""
+
+    raw_df = request.getfixturevalue(fixture_name)
+
+    expected_df = clean_reading_data(raw_df.copy(), backend="pandas")
+    result_df = clean_reading_data(raw_df.copy(), backend="polars")
+
+    pd.testing.assert_frame_equal(result_df, expected_df)
+
+
+@pytest.mark.parametrize("fixture_name", FIXTURE_NAMES)
+def test_polars_matches_pandas_on_flattened_frames(fixture_name, request):
+    """Frames already flattened by the extract should also clean identically."""
+
+    raw_df = request.getfixturevalue(fixture_name)
+    flat_df = readings_to_frame([to_plant_reading(reading)
+                                 for reading in raw_df.to_dict("records")])
+
+    pd.testing.assert_frame_equal(clean_reading_data(flat_df, backend="polars"),
+                                  clean_reading_data(flat_df, backend="pandas"))
+
+
+def test_backends_count_the_same_rejections(fake_df_high_soil_temp):
+    """Per-rule rejection counts should not depend on the backend."""
+
+    counts = {}
+    for backend in ("pandas", "polars"):
+        rules = ValidationRules({"temperature": (0, 40), "soil_moisture": (0, 100)},
+                                [("species", "fake_flower_2", "temperature", 0, 5)])
+        clean_reading_data(fake_df_high_soil_temp, rules, backend=backend)
+        counts[backend] = rules.get_rejection_counts()
+
+    assert counts["polars"] == counts["pandas"] == {
+        "default:temperature": 1, "default:soil_moisture": 1,
+        "species:fake_flower_2:temperature": 1}
+
+
+def test_unknown_backend_raises():
+    """A misspelt TRANSFORM_BACKEND should fail rather than silently use pandas."""
+
+    with pytest.raises(ValueError):
+        get_transform_backend("spark")
+
+
+def test_polars_frames_are_cleaned_without_pandas_input(fake_df_high_soil_temp):
+    """Backfills can pass a polars frame straight in, skipping the pandas conversion."""
+
+    polars = pytest.importorskip("polars")
+    flat_df = readings_to_frame([to_plant_reading(reading)
+                                 for reading in fake_df_high_soil_temp.to_dict("records")])
+
+    pd.testing.assert_frame_equal(
+        clean_reading_data(polars.from_pandas(flat_df), backend="polars"),
+        clean_reading_data(flat_df, backend="pandas"))
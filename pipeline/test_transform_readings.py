@@ -6,7 +6,9 @@ and mocking for all functions in the script.
 import pandas as pd
 import pytest
 
-from transform_readings import clean_reading_data
+from transform_readings import (clean_reading_data, clean_reading_record,
+                                READING_COLUMNS, BOTANIST_COLUMNS)
+from plant_reading import PlantReading, readings_to_frame
 
 
 @pytest.fixture(name="fake_df")
@@ -191,6 +193,14 @@ def test_last_watered_datetime(fake_df):
     assert result_df['last_watered'].dtype == 'datetime64[ns]'
 
 
+def test_recording_taken_datetime(fake_df):
+    """The values in the recording_taken column should be converted to a datetime64[ns] type."""
+
+    result_df = clean_reading_data(fake_df)
+    assert result_df['recording_taken'].dtype == 'datetime64[ns]'
+    assert result_df['recording_taken'][0] == pd.Timestamp("2023-12-21 10:20:34")
+
+
 def test_soil_moisture_rounded(fake_df):
     """The values in the soil_moisture column should be rounded to 2 d.p."""
 
@@ -319,3 +329,76 @@ def test_error_reading(fake_df_error):
 
     assert test_value
     assert result_df["soil_moisture"][1] == 30.92
+
+
+CATEGORY_COLUMNS = ["plant_name", *BOTANIST_COLUMNS]
+
+
+def to_plant_reading(reading: dict) -> PlantReading:
+    """Builds the flattened record the extract produces from a fixture row."""
+
+    botanist = reading["botanist"] if isinstance(reading["botanist"], dict) else {}
+    return PlantReading(
+        plant_id=reading["plant_id"],
+        plant_name=reading["plant_name"],
+        soil_moisture=reading["soil_moisture"],
+        temperature=reading["temperature"],
+        last_watered=reading["last_watered"],
+        recording_taken=reading["recording_taken"],
+        botanist_name=botanist.get("name"),
+        botanist_mobile=botanist.get("phone"),
+        botanist_email=botanist.get("email"),
+        error=reading["error"])
+
+
+@pytest.mark.parametrize("fixture_name", ["fake_df", "fake_df_negative_soil_temp",
+                                          "fake_df_zero_soil_temp",
+                                          "fake_df_high_soil_temp", "fake_df_error"])
+def test_record_cleaning_matches_frame_cleaning(fixture_name, request):
+    """Cleaning readings one at a time should give the same rows as cleaning the frame."""
+
+    raw_df = request.getfixturevalue(fixture_name)
+    expected_df = clean_reading_data(raw_df.copy()).reset_index(drop=True)
+
+    cleaned = [clean_reading_record(to_plant_reading(reading))
+               for reading in raw_df.to_dict("records")]
+    result_df = pd.DataFrame([reading for reading in cleaned if reading is not None],
+                             columns=READING_COLUMNS)
+    # Only the frame path stores the name columns as categoricals
+    result_df = result_df.astype({column: "category" for column in CATEGORY_COLUMNS})
+
+    pd.testing.assert_frame_equal(result_df, expected_df, check_dtype=False)
+
+
+def test_failed_request_is_dropped():
+    """A failed request (no reading) should not be streamed to the database."""
+
+    assert clean_reading_record(None) is None
+
+
+def test_flattened_frame_is_cleaned(fake_df):
+    """Frames built from PlantReading records should clean the same as nested ones."""
+
+    expected_df = clean_reading_data(fake_df.copy())
+    flat_df = readings_to_frame([to_plant_reading(reading)
+                                 for reading in fake_df.to_dict("records")])
+
+    pd.testing.assert_frame_equal(clean_reading_data(flat_df), expected_df)
+
+
+def test_name_columns_are_categorical(fake_df):
+    """Plant and botanist names repeat every cycle, so they should be stored as categoricals."""
+
+    result_df = clean_reading_data(fake_df)
+
+    for column in CATEGORY_COLUMNS:
+        assert isinstance(result_df[column].dtype, pd.CategoricalDtype)
+
+
+def test_input_frame_is_not_modified(fake_df):
+    """Cleaning should build a new frame rather than writing into the extracted one."""
+
+    original_df = fake_df.copy()
+    clean_reading_data(fake_df)
+
+    pd.testing.assert_frame_equal(fake_df, original_df)
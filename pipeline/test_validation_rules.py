@@ -0,0 +1,145 @@
+"""
+Testing suite for the per-plant and per-species validation rules.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from validation_rules import ValidationRules, load_validation_rules
+from transform_readings import clean_reading_data
+
+
+DEFAULTS = {"temperature": (0, 40), "soil_moisture": (0, 100)}
+
+
+def make_rules(rules=()) -> ValidationRules:
+    """Returns rules with the transform's default ranges."""
+
+    return ValidationRules(DEFAULTS, rules)
+
+
+def check(rules: ValidationRules, plant_ids, plant_names, temperature, soil_moisture):
+    """Runs get_valid_mask on plain lists."""
+
+    return rules.get_valid_mask(np.array(plant_ids), np.array(plant_names, dtype=object),
+                                {"temperature": np.array(temperature, dtype=float),
+                                 "soil_moisture": np.array(soil_moisture, dtype=float)})
+
+
+def test_defaults_match_fixed_ranges():
+    """Without rules every plant should use the default range, and missing values pass."""
+
+    rules = make_rules()
+    valid = check(rules, [1, 2, 3, 4], ["a", "b", "c", "d"],
+                  [-1, 41, 20, np.nan], [50, 50, 101, np.nan])
+
+    assert valid.tolist() == [False, False, False, True]
+    assert rules.get_rejection_counts() == {"default:temperature": 2,
+                                            "default:soil_moisture": 1}
+
+
+def test_species_rule_matches_plant_name():
+    """A species rule should apply to every plant of that name, ignoring case."""
+
+    rules = make_rules([("species", "Cactus", "soil_moisture", 0, 20)])
+    valid = check(rules, [1, 2], ["cactus ", "Fern"], [20, 20], [50, 50])
+
+    assert valid.tolist() == [False, True]
+    assert rules.get_rejection_counts() == {"species:cactus:soil_moisture": 1}
+
+
+def test_plant_rule_beats_species_rule():
+    """A rule for a plant_id should take precedence over its species' rule."""
+
+    rules = make_rules([("species", "Cactus", "soil_moisture", 0, 20),
+                        ("plant", "2", "soil_moisture", 0, 60)])
+    valid = check(rules, [1, 2], ["Cactus", "Cactus"], [20, 20], [50, 50])
+
+    assert valid.tolist() == [False, True]
+
+
+def test_unknown_plant_uses_default():
+    """Plant ids outside the compiled range or missing should fall back to the default."""
+
+    rules = make_rules([("plant", "1", "temperature", 10, 20)])
+    valid = check(rules, [1, 500, np.nan], ["a", "b", None], [5, 5, 5], [50, 50, 50])
+
+    assert valid.tolist() == [False, True, True]
+
+
+def test_rules_recompile_for_new_plants():
+    """Plants first seen in a later cycle should pick up their species rule."""
+
+    rules = make_rules([("species", "Cactus", "soil_moisture", 0, 20)])
+    check(rules, [1], ["Fern"], [20], [50])
+    valid = check(rules, [1, 9], ["Fern", "Cactus"], [20, 20], [50, 50])
+
+    assert valid.tolist() == [True, False]
+
+
+def test_cycle_counts_reset():
+    """start_cycle should clear the cycle counts but keep the running totals."""
+
+    rules = make_rules()
+    check(rules, [1], ["a"], [-1], [50])
+    rules.start_cycle()
+
+    assert rules.get_rejection_counts() == {}
+    assert rules.rejected_total.sum() == 1
+
+
+def test_single_reading_matches_mask():
+    """is_valid_reading should apply the same precedence as get_valid_mask."""
+
+    rules = make_rules([("species", "Cactus", "soil_moisture", 0, 20),
+                        ("plant", "2", "soil_moisture", 0, 60)])
+
+    assert not rules.is_valid_reading(1, "Cactus", {"temperature": 20, "soil_moisture": 50})
+    assert rules.is_valid_reading(2, "Cactus", {"temperature": 20, "soil_moisture": 50})
+    assert rules.is_valid_reading(3, None, {"temperature": None, "soil_moisture": None})
+
+
+def test_unknown_scope_raises():
+    """Rules for an unknown scope or measurement should be rejected when loaded."""
+
+    with pytest.raises(ValueError):
+        make_rules([("genus", "Cactus", "soil_moisture", 0, 20)])
+    with pytest.raises(ValueError):
+        make_rules([("plant", "1", "humidity", 0, 20)])
+
+
+def test_load_rules_from_csv(tmp_path):
+    """Rules should be read from the CSV file, with blank bounds left open."""
+
+    rules_path = tmp_path / "rules.csv"
+    rules_path.write_text("scope,target,measurement,minimum,maximum\n"
+                          "plant,1,temperature,,10\n", encoding="utf-8")
+    rules = load_validation_rules(DEFAULTS, str(rules_path))
+
+    assert check(rules, [1, 1], ["a", "a"], [-50, 11], [50, 50]).tolist() == [True, False]
+
+
+def test_missing_file_uses_defaults(tmp_path):
+    """With no rules file only the default ranges should apply."""
+
+    rules = load_validation_rules(DEFAULTS, str(tmp_path / "missing.csv"))
+
+    assert rules.rule_names == ["default:temperature", "default:soil_moisture"]
+
+
+def test_transform_applies_rules():
+    """clean_reading_data should drop rows rejected by the given rules."""
+
+    readings = pd.DataFrame({
+        "plant_id": [1, 2], "plant_name": ["Cactus", "Fern"],
+        "soil_moisture": [50.0, 50.0], "temperature": [20.0, 20.0],
+        "last_watered": ["Wed, 20 Dec 2023 14:10:54 GMT"] * 2,
+        "recording_taken": ["2023-12-21 10:20:34"] * 2,
+        "botanist_name": ["a", "b"], "botanist_mobile": ["1", "2"],
+        "botanist_email": ["a@b", "b@c"], "error": [None, None]})
+    rules = make_rules([("species", "cactus", "soil_moisture", 0, 20)])
+
+    result_df = clean_reading_data(readings, rules)
+
+    assert result_df["plant_id"].tolist() == [2]
@@ -0,0 +1,89 @@
+'''Timestamp parsing for the API's last_watered and recording_taken strings.
+Only the distinct strings in a column are parsed, and parsed values are
+kept in a bounded LRU cache across cycles, as most plants share a few
+watering times and recording times repeat between cycles and in archives.'''
+
+from collections import OrderedDict
+from os import environ
+
+import numpy as np
+import pandas as pd
+
+
+LAST_WATERED_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
+RECORDING_TAKEN_FORMAT = '%Y-%m-%d %H:%M:%S'
+TIMESTAMP_CACHE_SIZE = int(environ.get("TIMESTAMP_CACHE_SIZE", 100_000))
+
+
+class TimestampCache:
+    """LRU cache of timestamp strings in one format, parsed to datetime64[ns]."""
+
+    def __init__(self, timestamp_format: str, max_size: int = TIMESTAMP_CACHE_SIZE):
+        self.timestamp_format = timestamp_format
+        self.max_size = max_size
+        self.parsed = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def parse_unique(self, values: np.ndarray) -> np.ndarray:
+        """Returns the datetime64[ns] of each distinct string, parsing only
+        those not already cached and evicting the least recently used."""
+
+        parsed = np.empty(len(values), dtype='datetime64[ns]')
+        missing = []
+        for index, value in enumerate(values):
+            timestamp = self.parsed.get(value)
+            if timestamp is None:
+                missing.append(index)
+            else:
+                self.parsed.move_to_end(value)
+                parsed[index] = timestamp
+
+        self.hits += len(values) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            parsed[missing] = pd.to_datetime(values[missing], format=self.timestamp_format)
+            self.parsed.update(zip(values[missing], parsed[missing]))
+            while len(self.parsed) > self.max_size:
+                self.parsed.popitem(last=False)
+
+        return parsed
+
+    def parse(self, values) -> np.ndarray:
+        """Parses a column of timestamp strings into a datetime64[ns] array,
+        with missing values as NaT."""
+
+        if np.asarray(values).dtype.kind == 'M':
+            return np.asarray(values, dtype='datetime64[ns]')
+
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        # Code -1 (missing) indexes the appended NaT
+        parsed = np.append(self.parse_unique(np.asarray(uniques, dtype=object)),
+                           np.datetime64('NaT', 'ns'))
+        return parsed[codes]
+
+    def parse_value(self, value: str | None) -> pd.Timestamp | None:
+        """Parses a single timestamp string, returning None if it is missing."""
+
+        if value is None or pd.isnull(value):
+            return None
+        return pd.Timestamp(self.parse_unique(np.array([value], dtype=object))[0])
+
+    def clear(self) -> None:
+        """Forgets every parsed string, so the next parse starts cold."""
+
+        self.parsed.clear()
+
+    def get_stats(self) -> dict:
+        """Returns the hit and miss counters and the number of cached strings."""
+
+        return {
+            "cached_timestamps": len(self.parsed),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Shared by every stage, so strings parsed once are reused by later cycles
+LAST_WATERED_CACHE = TimestampCache(LAST_WATERED_FORMAT)
+RECORDING_TAKEN_CACHE = TimestampCache(RECORDING_TAKEN_FORMAT)
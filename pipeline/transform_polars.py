@@ -0,0 +1,84 @@
+'''Polars backend for the transform, selected with TRANSFORM_BACKEND=polars.
+Applies the same cleaning rules as transform_readings.clean_reading_data
+on Arrow-backed columns, for backfills of millions of rows, and returns
+a pandas DataFrame with the identical schema for the load script.
+
+Converting pandas object columns to Arrow costs more than the cleaning
+itself, so backfills should read their input straight into a polars
+DataFrame (pl.read_csv, pl.read_parquet, ...) and pass that in.
+
+Needs the optional polars and pyarrow packages.'''
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from timestamps import LAST_WATERED_FORMAT, RECORDING_TAKEN_FORMAT
+from transform_readings import READING_COLUMNS, BOTANIST_COLUMNS, BOTANIST_KEYS
+from validation_rules import ValidationRules
+
+
+def get_botanist_expressions(readings: pl.DataFrame) -> list[pl.Expr]:
+    """Returns the botanist columns, unnested from the botanist struct if present."""
+
+    if 'botanist' not in readings.columns:
+        return [pl.col(column).cast(pl.String) for column in BOTANIST_COLUMNS]
+
+    botanist_fields = {field.name for field in readings.schema['botanist'].fields} \
+        if isinstance(readings.schema['botanist'], pl.Struct) else set()
+    return [pl.col('botanist').struct.field(key).alias(column)
+            if key in botanist_fields else pl.lit(None, dtype=pl.String).alias(column)
+            for key, column in zip(BOTANIST_KEYS, BOTANIST_COLUMNS)]
+
+
+def parse_timestamp(readings: pl.DataFrame, column: str,
+                    timestamp_format: str) -> pl.Expr:
+    """Returns the column as Datetime('ns'), parsing it if it holds strings."""
+
+    if isinstance(readings.schema[column], pl.Datetime):
+        return pl.col(column).cast(pl.Datetime('ns'))
+    return pl.col(column).cast(pl.String).str.strptime(pl.Datetime('ns'), timestamp_format)
+
+
+def to_sorted_enum(column: pl.Series) -> pl.Series:
+    """Casts a string column to an Enum of its sorted values, which converts
+    to the same pandas categorical as the pandas backend produces."""
+
+    return column.cast(pl.Enum(column.drop_nulls().unique().sort()))
+
+
+def clean_reading_data(df: pd.DataFrame | pl.DataFrame,
+                       rules: ValidationRules) -> pd.DataFrame:
+    '''Cleans the extracted readings with the same rules as the pandas backend.
+    Accepts a polars DataFrame as well, in which case the result is indexed
+    by row position.'''
+
+    readings = df if isinstance(df, pl.DataFrame) else pl.from_pandas(df)
+    temperature = readings['temperature'].cast(pl.Float64)
+    soil_moisture = readings['soil_moisture'].cast(pl.Float64)
+
+    # Remove any records where temperature or soil moisture invalid
+    valid = rules.get_valid_mask(
+        readings['plant_id'].to_numpy(), readings['plant_name'].to_numpy(),
+        {'temperature': temperature.to_numpy(), 'soil_moisture': soil_moisture.to_numpy()})
+
+    cleaned = readings.filter(pl.Series(valid)).select(
+        pl.col('plant_id'),
+        pl.col('plant_name').cast(pl.String),
+        pl.col('soil_moisture').cast(pl.Float64).round(2),
+        pl.col('temperature').cast(pl.Float64).round(2),
+        parse_timestamp(readings, 'last_watered', LAST_WATERED_FORMAT),
+        parse_timestamp(readings, 'recording_taken', RECORDING_TAKEN_FORMAT),
+        *get_botanist_expressions(readings),
+        pl.col('error')
+    )
+    cleaned = cleaned.with_columns(
+        to_sorted_enum(cleaned[column]) for column in ['plant_name', *BOTANIST_COLUMNS])
+
+    result = cleaned.to_pandas()[READING_COLUMNS]
+    result.index = df.index[valid] if isinstance(df, pd.DataFrame) \
+        else pd.Index(np.flatnonzero(valid))
+    # Enums convert to ordered categoricals; only the metadata changes here
+    for column in ['plant_name', *BOTANIST_COLUMNS]:
+        result[column] = result[column].cat.as_unordered()
+    return result
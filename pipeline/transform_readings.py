@@ -4,53 +4,158 @@ This script cleans data pulled from the plant API,
 and puts it into an order ready to load into the database.
 """
 
+from operator import itemgetter
+from os import environ
+
+import numpy as np
 import pandas as pd
 
+from plant_reading import PlantReading
+from timestamps import LAST_WATERED_CACHE, RECORDING_TAKEN_CACHE
+from validation_rules import ValidationRules, load_validation_rules
+
 MIN_TEMPERATURE = 0
 MIN_SOIL_MOISTURE = 0
 MAX_TEMPERATURE = 40
 MAX_SOIL_MOISTURE = 100
+TRANSFORM_BACKEND = environ.get('TRANSFORM_BACKEND', 'pandas')
+
+# Column order expected by the load script
+READING_COLUMNS = ['plant_id', 'plant_name', 'soil_moisture', 'temperature',
+                   'last_watered', 'recording_taken', 'botanist_name',
+                   'botanist_mobile', 'botanist_email', 'error']
+BOTANIST_COLUMNS = ['botanist_name', 'botanist_mobile', 'botanist_email']
+BOTANIST_KEYS = ('name', 'phone', 'email')
+
+get_botanist_fields = itemgetter(*BOTANIST_KEYS)
+
+# Per-plant and per-species ranges, falling back to the constants above
+VALIDATION_RULES = load_validation_rules(
+    {'temperature': (MIN_TEMPERATURE, MAX_TEMPERATURE),
+     'soil_moisture': (MIN_SOIL_MOISTURE, MAX_SOIL_MOISTURE)})
+
+
+def flatten_botanist(botanists: np.ndarray) -> list[pd.Categorical]:
+    '''Flattens the nested botanist dicts into categorical name, mobile and
+    email columns in one pass. Each row is read once into a (name, phone,
+    email) tuple; only the handful of distinct botanists are then split
+    into columns, and every row is mapped to them by code.'''
+
+    present = np.flatnonzero(pd.notna(botanists))
+    present_botanists = botanists[present]
+    try:
+        fields = list(map(get_botanist_fields, present_botanists))
+    except KeyError:
+        fields = [tuple(botanist.get(key) for key in BOTANIST_KEYS)
+                  for botanist in present_botanists]
 
+    distinct_fields = {field: code for code, field in enumerate(dict.fromkeys(fields))}
+    codes = np.full(len(botanists), -1, dtype=np.intp)
+    codes[present] = np.fromiter(map(distinct_fields.__getitem__, fields),
+                                 dtype=np.intp, count=len(fields))
 
-def clean_reading_data(df: pd.DataFrame) -> pd.DataFrame:
+    columns = []
+    for index in range(len(BOTANIST_KEYS)):
+        column_codes, categories = pd.factorize(
+            np.array([field[index] for field in distinct_fields], dtype=object), sort=True)
+        # Code -1 (no botanist) indexes the appended -1, which is NaN
+        column_codes = np.append(column_codes, -1)
+        columns.append(pd.Categorical.from_codes(column_codes[codes], categories))
+    return columns
+
+
+def get_transform_backend(backend: str):
+    '''Returns the clean_reading_data implementation for the backend name.
+    The polars backend is imported only when selected, as it is optional.'''
+
+    if backend == 'pandas':
+        return clean_reading_data_pandas
+    if backend == 'polars':
+        import transform_polars  # pylint: disable=import-outside-toplevel
+        return transform_polars.clean_reading_data
+    raise ValueError(f"Unknown transform backend: {backend}")
+
+
+def clean_reading_data(df: pd.DataFrame, rules: ValidationRules = None,
+                       backend: str = None) -> pd.DataFrame:
     '''Loads in the extracted data in the form of a pandas DataFrame,
     cleans the data and returns the new dataset as a pandas DataFrame.
-    Columns in the DataFrame are grouped by which database table they are in.'''
+    Columns in the DataFrame are grouped by which database table they are in.
+    Runs on TRANSFORM_BACKEND unless another backend is given.'''
 
-    # Convert the date format
-    df['last_watered'] = pd.to_datetime(
-        df['last_watered'], format='%a, %d %b %Y %H:%M:%S GMT')
+    if rules is None:
+        rules = VALIDATION_RULES
 
-    # Remove any records where temperature or soil moisture invalid
-    bool_negative_temp = df['temperature'] >= MIN_TEMPERATURE
-    bool_max_temp = df['temperature'] <= MAX_TEMPERATURE
-    bool_null_temp = df['temperature'].isnull()
-    bool_negative_moist = df['soil_moisture'] >= MIN_SOIL_MOISTURE
-    bool_max_moist = df['soil_moisture'] <= MAX_SOIL_MOISTURE
-    bool_null_moist = df['soil_moisture'].isnull()
-
-    df = df[(bool_negative_temp & bool_max_temp) | bool_null_temp]
-    df = df[(bool_negative_moist & bool_max_moist) | bool_null_moist]
-
-    # Columns for 'reading' table
-    df['soil_moisture'] = df['soil_moisture'].round(2)
-    df['temperature'] = df['temperature'].round(2)
-
-    # Columns for 'botanist' table
-    df['botanist_email'] = df['botanist'].apply(
-        lambda x: x.get('email', None) if x is not None else x)
-    df['botanist_name'] = df['botanist'].apply(
-        lambda x: x.get('name', None) if x is not None else x)
-    df['botanist_mobile'] = df['botanist'].apply(
-        lambda x: x.get('phone', None) if x is not None else x)
-    df.drop('botanist', axis=1, inplace=True)
-
-    # Reordering columns
-    order = ['plant_id', 'plant_name', 'soil_moisture', 'temperature',
-             'last_watered', 'recording_taken', 'botanist_name',
-             'botanist_mobile', 'botanist_email', 'error']
-
-    df = df[order]
+    clean_with_backend = get_transform_backend(backend or TRANSFORM_BACKEND)
+    df = clean_with_backend(df, rules)
 
     print("Transformed extracted data.")
     return df
+
+
+def clean_reading_data_pandas(df: pd.DataFrame, rules: ValidationRules) -> pd.DataFrame:
+    '''Cleans the extracted readings with numpy masks over pandas columns.'''
+
+    temperature = df['temperature'].to_numpy(dtype=float, na_value=np.nan)
+    soil_moisture = df['soil_moisture'].to_numpy(dtype=float, na_value=np.nan)
+
+    # Remove any records where temperature or soil moisture invalid
+    valid = rules.get_valid_mask(df['plant_id'].to_numpy(), df['plant_name'].to_numpy(),
+                                 {'temperature': temperature,
+                                  'soil_moisture': soil_moisture})
+
+    # Columns for 'botanist' table, unless already flattened by the extract
+    if 'botanist' in df.columns:
+        botanists = flatten_botanist(df['botanist'].to_numpy()[valid])
+    else:
+        botanists = [pd.Categorical(df[column].to_numpy()[valid])
+                     for column in BOTANIST_COLUMNS]
+
+    # Build the output once, in the column order expected by the load script
+    df = pd.DataFrame({
+        'plant_id': df['plant_id'].to_numpy()[valid],
+        'plant_name': pd.Categorical(df['plant_name'].to_numpy()[valid]),
+        'soil_moisture': np.round(soil_moisture[valid], 2),
+        'temperature': np.round(temperature[valid], 2),
+        'last_watered': LAST_WATERED_CACHE.parse(df['last_watered'].to_numpy()[valid]),
+        'recording_taken': RECORDING_TAKEN_CACHE.parse(
+            df['recording_taken'].to_numpy()[valid]),
+        **dict(zip(BOTANIST_COLUMNS, botanists)),
+        'error': df['error'].to_numpy()[valid]
+    }, index=df.index[valid], columns=READING_COLUMNS)
+
+    return df
+
+
+def clean_reading_record(reading: PlantReading | None,
+                         rules: ValidationRules = None) -> dict | None:
+    '''Cleans a single extracted reading with the same rules as clean_reading_data,
+    so readings can be streamed to the database as they arrive. Returns None
+    for failed requests and for readings that clean_reading_data would remove.'''
+
+    if reading is None:
+        return None
+    if rules is None:
+        rules = VALIDATION_RULES
+
+    temperature = reading.temperature
+    soil_moisture = reading.soil_moisture
+
+    # Remove any records where temperature or soil moisture invalid
+    if not rules.is_valid_reading(reading.plant_id, reading.plant_name,
+                                  {'temperature': temperature,
+                                   'soil_moisture': soil_moisture}):
+        return None
+
+    return {
+        'plant_id': reading.plant_id,
+        'plant_name': reading.plant_name,
+        'soil_moisture': None if pd.isnull(soil_moisture) else np.round(soil_moisture, 2),
+        'temperature': None if pd.isnull(temperature) else np.round(temperature, 2),
+        'last_watered': LAST_WATERED_CACHE.parse_value(reading.last_watered),
+        'recording_taken': RECORDING_TAKEN_CACHE.parse_value(reading.recording_taken),
+        'botanist_name': reading.botanist_name,
+        'botanist_mobile': reading.botanist_mobile,
+        'botanist_email': reading.botanist_email,
+        'error': reading.error
+    }
@@ -0,0 +1,204 @@
+'''Validation rules for the transform: a valid range for each measurement,
+which can be overridden for a species (matched on plant_name) or for a
+single plant_id. A plant rule beats a species rule, which beats the default.
+
+Rules are loaded from a CSV file at VALIDATION_RULES_PATH with the columns
+    scope,target,measurement,minimum,maximum
+for example
+    species,Venus flytrap,soil_moisture,60,100
+    plant,8,temperature,5,30
+A blank minimum or maximum leaves that side unbounded.
+
+The rules are compiled into one array per bound, indexed by plant_id, so
+checking a frame costs one array lookup per measurement however many
+rules there are. Each row rejected is counted against the rule it broke.'''
+
+from os import environ, path
+import csv
+
+import numpy as np
+import pandas as pd
+
+
+VALIDATION_RULES_PATH = environ.get("VALIDATION_RULES_PATH", "validation_rules.csv")
+MEASUREMENTS = ("temperature", "soil_moisture")
+
+
+def get_species_key(plant_name: str) -> str:
+    """Normalises a plant name so species rules match regardless of case and spacing."""
+
+    return str(plant_name).strip().casefold()
+
+
+class ValidationRules:
+    """Range rules per measurement, compiled into arrays indexed by plant_id."""
+
+    def __init__(self, defaults: dict[str, tuple[float, float]],
+                 rules: list[tuple[str, str, str, float, float]] = ()):
+        self.rule_names = []
+        self.rule_ranges = []
+        self.default_rules = {}
+        self.species_rules = {}
+        self.plant_rules = {}
+
+        for measurement in MEASUREMENTS:
+            self.default_rules[measurement] = self.add_rule(
+                f"default:{measurement}", *defaults[measurement])
+
+        for scope, target, measurement, minimum, maximum in rules:
+            if measurement not in MEASUREMENTS:
+                raise ValueError(f"Unknown measurement in validation rule: {measurement}")
+            if scope == "plant":
+                key = (int(target), measurement)
+                self.plant_rules[key] = self.add_rule(
+                    f"plant:{int(target)}:{measurement}", minimum, maximum)
+            elif scope == "species":
+                key = (get_species_key(target), measurement)
+                self.species_rules[key] = self.add_rule(
+                    f"species:{get_species_key(target)}:{measurement}", minimum, maximum)
+            else:
+                raise ValueError(f"Unknown scope in validation rule: {scope}")
+
+        self.plant_names = {}
+        self.compiled = {}
+        self.compile()
+        self.rejected_last_cycle = np.zeros(len(self.rule_names), dtype=np.int64)
+        self.rejected_total = np.zeros(len(self.rule_names), dtype=np.int64)
+
+    def add_rule(self, name: str, minimum: float, maximum: float) -> int:
+        """Registers a rule and returns its index for the rejection counts."""
+
+        self.rule_names.append(name)
+        self.rule_ranges.append((-np.inf if pd.isnull(minimum) else float(minimum),
+                                 np.inf if pd.isnull(maximum) else float(maximum)))
+        return len(self.rule_names) - 1
+
+    def get_rule_index(self, plant_id: int, plant_name: str | None,
+                       measurement: str) -> int:
+        """Returns the rule that applies to a plant: plant, then species, then default."""
+
+        if (plant_id, measurement) in self.plant_rules:
+            return self.plant_rules[(plant_id, measurement)]
+        if plant_name is not None:
+            species_rule = self.species_rules.get((get_species_key(plant_name), measurement))
+            if species_rule is not None:
+                return species_rule
+        return self.default_rules[measurement]
+
+    def compile(self) -> None:
+        """
+        Resolves the rule for every known plant_id into one rule-index array
+        per measurement. The last slot holds the default rule and is used
+        for plant ids that are missing or not yet known.
+        """
+
+        plant_ids = set(self.plant_names) | {plant_id for plant_id, _ in self.plant_rules}
+        size = max(plant_ids, default=-1) + 1
+        rule_minimum = np.array([minimum for minimum, _ in self.rule_ranges])
+        rule_maximum = np.array([maximum for _, maximum in self.rule_ranges])
+
+        for measurement in MEASUREMENTS:
+            rule_indexes = np.full(size + 1, self.default_rules[measurement], dtype=np.intp)
+            for plant_id in plant_ids:
+                rule_indexes[plant_id] = self.get_rule_index(
+                    plant_id, self.plant_names.get(plant_id), measurement)
+            self.compiled[measurement] = (rule_indexes, rule_minimum[rule_indexes],
+                                          rule_maximum[rule_indexes])
+
+    def update_plant_names(self, plant_ids: np.ndarray, plant_names: np.ndarray) -> None:
+        """Recompiles the rules if the frame has plants or names not seen before,
+        so species rules can be joined by plant_id."""
+
+        if not self.species_rules:
+            return
+
+        # Hash-based, so this stays linear in the number of rows
+        first_ids = pd.Series(plant_ids).drop_duplicates()
+        changed = False
+        for plant_id, plant_name in zip(first_ids.tolist(), plant_names[first_ids.index]):
+            if plant_id < 0 or pd.isnull(plant_name):
+                continue
+            if self.plant_names.get(plant_id) != plant_name:
+                self.plant_names[plant_id] = plant_name
+                changed = True
+        if changed:
+            self.compile()
+
+    def start_cycle(self) -> None:
+        """Resets the per-cycle rejection counts."""
+
+        self.rejected_last_cycle[:] = 0
+
+    def get_valid_mask(self, plant_ids: np.ndarray, plant_names: np.ndarray,
+                       values: dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Returns a mask of the rows whose measurements are missing or within
+        the range of the rule that applies to their plant, counting the
+        rows each rule rejected. Missing values compare False, so they pass.
+        """
+
+        plant_ids = np.nan_to_num(np.asarray(plant_ids, dtype=float), nan=-1).astype(np.intp)
+        self.update_plant_names(plant_ids, np.asarray(plant_names, dtype=object))
+
+        valid = np.ones(len(plant_ids), dtype=bool)
+        for measurement, measurement_values in values.items():
+            rule_indexes, minimum, maximum = self.compiled[measurement]
+            default_slot = len(rule_indexes) - 1
+            lookup = np.where((plant_ids >= 0) & (plant_ids < default_slot),
+                              plant_ids, default_slot)
+
+            rejected = (measurement_values < minimum[lookup]) \
+                | (measurement_values > maximum[lookup])
+            self.count_rejections(np.bincount(rule_indexes[lookup][rejected],
+                                              minlength=len(self.rule_names)))
+            valid &= ~rejected
+
+        return valid
+
+    def is_valid_reading(self, plant_id: int, plant_name: str | None,
+                         values: dict[str, float]) -> bool:
+        """Checks a single reading against the same rules as get_valid_mask."""
+
+        rejections = np.zeros(len(self.rule_names), dtype=np.int64)
+        for measurement, value in values.items():
+            rule_index = self.get_rule_index(plant_id, plant_name, measurement)
+            minimum, maximum = self.rule_ranges[rule_index]
+            if not pd.isnull(value) and not minimum <= value <= maximum:
+                rejections[rule_index] += 1
+
+        self.count_rejections(rejections)
+        return not rejections.any()
+
+    def count_rejections(self, rejections: np.ndarray) -> None:
+        """Adds rejected rows per rule to the cycle and running totals."""
+
+        self.rejected_last_cycle += rejections
+        self.rejected_total += rejections
+
+    def get_rejection_counts(self) -> dict:
+        """Returns the rows rejected by each rule this cycle, leaving out rules with none."""
+
+        return {self.rule_names[index]: int(count)
+                for index, count in enumerate(self.rejected_last_cycle) if count}
+
+
+def read_rules_file(rules_path: str) -> list[tuple[str, str, str, float, float]]:
+    """Reads range rules from a CSV file with scope, target, measurement,
+    minimum and maximum columns. Blank bounds are returned as NaN."""
+
+    with open(rules_path, encoding="utf-8", newline="") as rules_file:
+        return [(row["scope"].strip(), row["target"].strip(), row["measurement"].strip(),
+                 float(row["minimum"] or "nan"), float(row["maximum"] or "nan"))
+                for row in csv.DictReader(rules_file)]
+
+
+def load_validation_rules(defaults: dict[str, tuple[float, float]],
+                          rules_path: str = VALIDATION_RULES_PATH) -> ValidationRules:
+    """Returns the rules in the file, or only the defaults if there is no file."""
+
+    if not path.exists(rules_path):
+        return ValidationRules(defaults)
+
+    rules = read_rules_file(rules_path)
+    print(f"Loaded {len(rules)} validation rules from {rules_path}.")
+    return ValidationRules(defaults, rules)